@@ -1,16 +1,24 @@
 from django.contrib import admin
 from .models import Group, Post
+from .search import filter_matching
 
 
 class PostAdmin(admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    list_select_related = ('author', 'group')
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Ищем по полнотекстовому индексу вместо LIKE по text."""
+        if not search_term:
+            return queryset, False
+        return filter_matching(queryset, search_term), False
+
 
 class GroupAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'title', 'description', 'slug')
+    list_display = ('pk', 'title', 'description', 'slug', 'posts_count')
     search_fields = ('title', 'description',)
     empty_value_display = '-пусто-'
 
@@ -0,0 +1,254 @@
+"""JSON API лент и постов.
+
+Ответы не зависят от пользователя и меняются только вместе с
+поколениями лент page_cache, поэтому тело ответа кешируется по пути
+запроса вместе с поколениями, а ETag считается по ним же. Последние
+ответы держим еще и в процессе. Повторный запрос ApiCacheMiddleware
+отдает до сессий и аутентификации: одно чтение поколений из кеша и ни
+одного обращения к базе. Поиск группы или автора, сборка
+PostChain и разбор курсора выполняются только при промахе.
+"""
+import collections
+import functools
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from . import archive, lookups, page_cache
+from .models import ArchivedPost, Post
+from .page_cache import AUTHOR_FEED, GLOBAL_FEED, GROUP_FEED
+from .paginators import POSTS_PER_PAGE, CursorPaginator
+
+# Публичное имя поля -> путь в ORM для values()
+FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'edited': 'edited',
+    'author': 'author__username',
+    'author_first_name': 'author__first_name',
+    'author_last_name': 'author__last_name',
+    'group': 'group__slug',
+    'group_title': 'group__title',
+}
+DEFAULT_FIELDS = ('id', 'text', 'pub_date', 'author', 'group')
+# Без этих полей не посчитать курсор страницы
+CURSOR_FIELDS = ('id', 'pub_date')
+
+
+class FieldError(ValueError):
+    pass
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, encoder=DjangoJSONEncoder,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def requested_fields(request):
+    raw = request.GET.get('fields')
+    if not raw:
+        return DEFAULT_FIELDS
+    fields = tuple(name.strip() for name in raw.split(',') if name.strip())
+    unknown = [name for name in fields if name not in FIELDS]
+    if unknown or not fields:
+        raise FieldError(f'Неизвестные поля: {", ".join(unknown)}')
+    return fields
+
+
+def project(queryset, fields):
+    """values() только нужных колонок: модели не создаются."""
+    paths = {FIELDS[name]: name for name in (*fields, *CURSOR_FIELDS)}
+    return queryset.values(*paths), paths
+
+
+def rename(row, paths, fields):
+    return {name: row[path] for path, name in paths.items()
+            if name in fields}
+
+
+def feed_response(request, queryset):
+    try:
+        fields = requested_fields(request)
+    except FieldError as e:
+        return json_response({'error': str(e)}, status=400)
+    rows, paths = project(queryset, fields)
+    page = CursorPaginator(rows, POSTS_PER_PAGE).get_page(
+        request.GET.get('cursor')
+    )
+    return json_response({
+        'results': [rename(row, paths, fields) for row in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+def response_key(path):
+    return f'api:{hashlib.md5(path.encode()).hexdigest()}'
+
+
+def make_etag(path, generations):
+    return quote_etag(hashlib.md5(
+        repr((path, generations)).encode()
+    ).hexdigest())
+
+
+def not_modified_or(request, etag, body):
+    """304 на совпавший If-None-Match, иначе ответ с телом body."""
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    return response
+
+
+class LocalResponses:
+    """LRU последних ответов процесса. Запись проверяется по поколениям
+    из общего кеша при каждой выдаче, поэтому сдвиг в другом процессе
+    виден сразу."""
+
+    def __init__(self):
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None:
+                self.entries.move_to_end(path)
+        return entry
+
+    def set(self, path, entry):
+        with self.lock:
+            self.entries[path] = entry
+            self.entries.move_to_end(path)
+            while len(self.entries) > settings.API_LOCAL_CACHE_SIZE:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local_responses = LocalResponses()
+
+
+def serve_cached(request):
+    """Ответ из кеша, если поколения его лент не сдвигались, иначе
+    None."""
+    path = request.get_full_path()
+    entry = local_responses.get(path)
+    if entry is None:
+        entry = cache.get(response_key(path))
+        if entry is None:
+            return None
+        local_responses.set(path, entry)
+    feeds, generations, etag, body = entry
+    if page_cache.get_generations(feeds) != generations:
+        return None
+    return not_modified_or(request, etag, body)
+
+
+def cached_feed(*feeds):
+    """Кешируем тело ответа по поколениям лент feeds (шаблоны имен
+    заполняются аргументами view, как в cache_for_anonymous).
+
+    Поколения читаются до выполнения view: запись, сдвинувшая их во
+    время ответа, не даст ему найтись из кеша.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            response = serve_cached(request)
+            if response is not None:
+                return response
+            names = [feed.format(**kwargs) for feed in feeds]
+            path = request.get_full_path()
+            generations = page_cache.get_generations(names)
+            etag = make_etag(path, generations)
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                entry = (names, generations, etag, response.content)
+                cache.set(response_key(path), entry,
+                          settings.FEED_PAGE_CACHE_TIMEOUT)
+                local_responses.set(path, entry)
+            response['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
+
+
+class ApiCacheMiddleware:
+    """Отдаем закешированные ответы API раньше остальных middleware:
+    сессия, пользователь и реплики им не нужны."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = None
+
+    def __call__(self, request):
+        if self.prefix is None:
+            self.prefix = reverse('api_index')
+        if request.method == 'GET' and request.path.startswith(self.prefix):
+            response = serve_cached(request)
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+
+@cached_feed(GLOBAL_FEED)
+def index(request):
+    return feed_response(request, archive.chain(
+        lambda model: model.objects.all()
+    ))
+
+
+@cached_feed(GROUP_FEED)
+def group_posts(request, slug):
+    try:
+        group = lookups.group_by_slug(slug)
+    except Http404 as e:
+        return json_response({'error': str(e)}, status=404)
+    return feed_response(request, archive.chain(
+        lambda model: model.objects.filter(group_id=group.pk)
+    ))
+
+
+@cached_feed(AUTHOR_FEED)
+def profile(request, username):
+    try:
+        author = lookups.user_by_username(username)
+    except Http404 as e:
+        return json_response({'error': str(e)}, status=404)
+    return feed_response(request, archive.chain(
+        lambda model: model.objects.filter(author_id=author.pk)
+    ))
+
+
+@cached_feed(AUTHOR_FEED)
+def post_view(request, username, post_id):
+    try:
+        fields = requested_fields(request)
+    except FieldError as e:
+        return json_response({'error': str(e)}, status=400)
+    for model in (Post, ArchivedPost):
+        rows, paths = project(
+            model.objects.filter(id=post_id, author__username=username),
+            fields,
+        )
+        rows = rows.order_by()[:1]
+        if rows:
+            return json_response(rename(rows[0], paths, fields))
+    return json_response({'error': 'Запись не найдена'}, status=404)
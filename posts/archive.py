@@ -0,0 +1,218 @@
+"""Архив старых постов: горячая таблица posts_post остается маленькой.
+
+move() переносит посты старше ARCHIVE_AFTER_DAYS в posts_archivedpost
+с теми же id. Почти все чтение приходится на последние недели, и
+горячая таблица с индексами помещается в кеш страниц. Ленты читают
+обе таблицы через PostChain: горячие посты всегда новее архивных,
+поэтому архив продолжает горячую выборку и первые страницы его не
+трогают. Страница поста ищет пост в архиве, если его нет в горячей
+таблице. Счетчики, поиск и кеш страниц учитывают обе таблицы, так что
+перенос ничего не меняет для читателя и ничего не сбрасывает.
+"""
+import datetime as dt
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Func, IntegerField, Max, Subquery
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from yatube.sqlite.retry import retry_on_lock
+
+from .models import ArchivedPost, Post, TimelineEntry
+
+COLUMNS = ('id, text, pub_date, edited, author_id, group_id, image, '
+           'thumbnails')
+
+
+class PostChain:
+    """Горячие и архивные посты одной выборкой для Paginator,
+    CursorPaginator и выгрузки.
+
+    Выборки строятся одинаково для обеих моделей; срез читает архив,
+    только если горячих строк на него не хватило. Это верно, пока
+    горячие посты новее архивных: move() переносит самые старые,
+    а после импорта старых постов порядок восстанавливает
+    restore_order(). Известное число постов в обеих таблицах (total,
+    из счетчиков) избавляет и от этого запроса на последней странице,
+    когда архив пуст.
+    """
+
+    def __init__(self, hot, cold, total=None):
+        self.hot = hot
+        self.cold = cold
+        self.total = total
+
+    def _both(self, method, *args, **kwargs):
+        return PostChain(getattr(self.hot, method)(*args, **kwargs),
+                         getattr(self.cold, method)(*args, **kwargs),
+                         self.total)
+
+    def filter(self, *args, **kwargs):
+        filtered = self._both('filter', *args, **kwargs)
+        filtered.total = None
+        return filtered
+
+    def order_by(self, *fields):
+        return self._both('order_by', *fields)
+
+    def select_related(self, *fields):
+        return self._both('select_related', *fields)
+
+    def values(self, *fields):
+        return self._both('values', *fields)
+
+    def values_list(self, *fields, **kwargs):
+        return self._both('values_list', *fields, **kwargs)
+
+    def count(self):
+        if self.total is not None:
+            return self.total
+        # Оба COUNT одним запросом
+        cold = self.cold.order_by().annotate(
+            total=Func(F('pk'), function='COUNT')
+        ).values('total')
+        return self.hot.order_by().aggregate(
+            total=Count('pk') + Subquery(cold, output_field=IntegerField())
+        )['total']
+
+    def parts(self):
+        """Выборки в порядке выдачи: от новых к старым горячая первой."""
+        order = self.hot.query.order_by or Post._meta.ordering
+        if str(order[0]).startswith('-'):
+            return self.hot, self.cold
+        return self.cold, self.hot
+
+    def __iter__(self):
+        for part in self.parts():
+            yield from part
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ChainSlice(self, index.start or 0, index.stop)
+        rows = self.rows(index, index + 1)
+        if not rows:
+            raise IndexError(index)
+        return rows[0]
+
+    def rows(self, start, stop):
+        first, second = self.parts()
+        rows = list(first[start:stop])
+        if stop is not None and len(rows) == stop - start:
+            return rows
+        if self.total is not None and start + len(rows) >= self.total:
+            return rows
+        # Первая выборка кончилась: сколько строк в ней было до конца
+        skipped = start + len(rows) if rows else (
+            first.count() if start else 0
+        )
+        rest = second[max(start - skipped, 0):]
+        if stop is not None:
+            rest = second[max(start - skipped, 0):stop - skipped]
+        return rows + list(rest)
+
+
+class ChainSlice:
+    """Срез PostChain читается при первом обращении, как срез QuerySet:
+    Paginator режет выборку, даже если страницу потом подменят."""
+
+    def __init__(self, chain, start, stop):
+        self.chain = chain
+        self.start = start
+        self.stop = stop
+
+    @cached_property
+    def object_list(self):
+        return self.chain.rows(self.start, self.stop)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+
+def chain(build, total=None):
+    """PostChain из выборок build(Post) и build(ArchivedPost)."""
+    return PostChain(build(Post), build(ArchivedPost), total)
+
+
+def find(build):
+    """Пост из build(Post), иначе из build(ArchivedPost)."""
+    for model in (Post, ArchivedPost):
+        # Без ORDER BY: пост ищется по первичному ключу
+        found = list(build(model).order_by()[:1])
+        if found:
+            return found[0]
+    return None
+
+
+def cutoff(days=None):
+    days = settings.ARCHIVE_AFTER_DAYS if days is None else days
+    return timezone.now() - dt.timedelta(days=days)
+
+
+@retry_on_lock
+def move_batch(before, batch_size):
+    """Переносим до batch_size самых старых постов до before, возвращаем
+    число перенесенных."""
+    batch = ('SELECT id FROM posts_post WHERE pub_date < %s '
+             'ORDER BY pub_date, id LIMIT %s')
+    params = [connection.ops.adapt_datetimefield_value(before), batch_size]
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Все три запроса видят одну пачку: запись заблокирована до
+        # конца транзакции
+        cursor.execute(
+            f'INSERT INTO {ArchivedPost._meta.db_table} ({COLUMNS}) '
+            f'SELECT {COLUMNS} FROM posts_post WHERE id IN ({batch})',
+            params,
+        )
+        moved = cursor.rowcount
+        cursor.execute(
+            f'DELETE FROM {TimelineEntry._meta.db_table} '
+            f'WHERE post_id IN ({batch})', params
+        )
+        cursor.execute(f'DELETE FROM posts_post WHERE id IN ({batch})',
+                       params)
+    return moved
+
+
+def move(days=None, batch_size=None, progress=None):
+    """Переносим в архив все посты старше days дней.
+
+    Пачки идут отдельными транзакциями, чтобы не держать запись
+    надолго. Записи лент подписок на перенесенные посты удаляются:
+    ленты хранят только свежие посты.
+    """
+    return move_before(cutoff(days), batch_size, progress)
+
+
+def restore_order(batch_size=None):
+    """Переносим в архив горячие посты не новее самого нового
+    архивного.
+
+    Импорт и генерация данных пишут старые посты в горячую таблицу;
+    без переноса PostChain показал бы их раньше более свежих архивных.
+    """
+    newest = ArchivedPost.objects.aggregate(newest=Max('pub_date'))[
+        'newest'
+    ]
+    if newest is None:
+        return 0
+    return move_before(newest + dt.timedelta(microseconds=1), batch_size)
+
+
+def move_before(before, batch_size=None, progress=None):
+    """Переносим в архив все посты до before."""
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    total = 0
+    while True:
+        moved = move_batch(before, batch_size)
+        total += moved
+        if progress and moved:
+            progress(total)
+        if moved < batch_size:
+            return total
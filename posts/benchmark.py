@@ -0,0 +1,270 @@
+"""Бенчмарк всех страниц проекта на данных разного объема.
+
+Каждый объем данных живет в своем файле базы, созданном как тестовая
+база Django, так что рабочая база не затрагивается, а засеянный файл
+переиспользуется между запусками. Запросы идут через Client, то есть
+через полный стек middleware и обработчика запросов.
+"""
+import functools
+import json
+import platform
+import sqlite3
+import statistics
+import time
+import tracemalloc
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.flatpages.models import FlatPage
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import renderer, synthetic, timeline
+from .cards import CARD_TEMPLATE
+from .models import Group, Post
+from .paginators import POSTS_PER_PAGE, encode_cursor
+
+FLATPAGES = {'/about-author/': 'Об авторе', '/about-spec/': 'Технологии'}
+
+# Метрики, рост которых больше порога считается регрессией
+LATENCY_METRICS = ('p50_ms', 'p95_ms', 'p99_ms')
+# HTML-страница -> ее JSON-аналог и во сколько раз API должен быть быстрее
+API_PAIRS = {'index': 'api_index', 'group': 'api_group',
+             'profile': 'api_profile', 'post': 'api_post'}
+API_SPEEDUP_TARGET = 5
+
+
+def seed(size, seed=0):
+    """Засеиваем базу size постами генератором synthetic."""
+    synthetic.Generator(size, seed=seed).run()
+
+
+def prepare(size):
+    """Засеиваем базу, если нужно, и готовим участников бенчмарка."""
+    # Посты, созданные прошлыми прогонами new_post, не в счет
+    existing = Post.objects.count()
+    if existing < size:
+        seed(size - existing)
+    user = get_user_model()
+    admin = user.objects.filter(username='bench-admin').first()
+    if admin is None:
+        admin = user.objects.create_superuser(
+            username='bench-admin', email='admin@example.com',
+            password='bench-admin',
+        )
+    site = Site.objects.get_current()
+    for url, title in FLATPAGES.items():
+        page, _ = FlatPage.objects.get_or_create(
+            url=url, defaults={'title': title, 'content': title}
+        )
+        page.sites.add(site)
+    authors = user.objects.filter(post_counter__posts_count__gt=0).order_by(
+        '-post_counter__posts_count'
+    )
+    author = authors.first()
+    for followed in authors[1:21]:
+        timeline.follow(admin, followed)
+    return {
+        'admin': admin,
+        'author': author,
+        'group': Group.objects.order_by('-posts_count').first(),
+        'post': author.posts.first(),
+        'deep': Post.objects.all()[size // 2],
+    }
+
+
+def routes(data):
+    """(имя, клиент, метод, путь, данные) для каждой страницы."""
+    author, post = data['author'], data['post']
+    username = author.username
+    edit = reverse('post_edit', args=(username, post.pk))
+    return [
+        ('index', 'anonymous', 'get', reverse('index'), None),
+        ('index_page_50', 'anonymous', 'get', reverse('index'),
+         {'page': 50}),
+        ('index_cursor_deep', 'anonymous', 'get', reverse('index'),
+         {'cursor': encode_cursor(data['deep'])}),
+        ('index_logged_in', 'author', 'get', reverse('index'), None),
+        ('group', 'anonymous', 'get',
+         reverse('group', args=(data['group'].slug,)), None),
+        ('profile', 'anonymous', 'get',
+         reverse('profile', args=(username,)), None),
+        ('post', 'anonymous', 'get',
+         reverse('post', args=(username, post.pk)), None),
+        ('new_get', 'author', 'get', reverse('new_post'), None),
+        ('new_post', 'author', 'post', reverse('new_post'),
+         {'text': 'Пост из бенчмарка'}),
+        ('edit_get', 'author', 'get', edit, None),
+        ('edit_post', 'author', 'post', edit,
+         {'text': 'Пост изменен бенчмарком'}),
+        ('follow_index', 'admin', 'get', reverse('follow_index'), None),
+        ('profile_follow', 'admin', 'get',
+         reverse('profile_follow', args=(username,)), None),
+        ('profile_unfollow', 'admin', 'get',
+         reverse('profile_unfollow', args=(username,)), None),
+        ('search', 'anonymous', 'get', reverse('search'),
+         {'q': 'музыка кофе'}),
+        ('export', 'author', 'get',
+         reverse('profile_export', args=(username,)), None),
+        ('api_index', 'anonymous', 'get', reverse('api_index'), None),
+        ('api_group', 'anonymous', 'get',
+         reverse('api_group', args=(data['group'].slug,)), None),
+        ('api_profile', 'anonymous', 'get',
+         reverse('api_profile', args=(username,)), None),
+        ('api_post', 'anonymous', 'get',
+         reverse('api_post', args=(username, post.pk)), None),
+        ('signup', 'anonymous', 'get', reverse('signup'), None),
+        ('login', 'anonymous', 'get', reverse('login'), None),
+        ('about_author', 'anonymous', 'get', reverse('about_author'),
+         None),
+        ('about_spec', 'anonymous', 'get', reverse('about_spec'), None),
+        ('admin_changelist', 'admin', 'get',
+         reverse('admin:posts_post_changelist'), None),
+    ]
+
+
+class QueryCounter:
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def request(client, method, path, data):
+    response = getattr(client, method)(path, data)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+def measure(call, requests, cold=False):
+    """Задержки, запросы к базе и пиковая память одного вызова."""
+    call()
+    latencies, queries = [], []
+    for _ in range(requests):
+        if cold:
+            cache.clear()
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            response = call()
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(counter.count)
+    if cold:
+        cache.clear()
+    tracemalloc.start()
+    call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'status': getattr(response, 'status_code', None),
+        'p50_ms': round(percentile(latencies, 0.5), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'mean_ms': round(statistics.mean(latencies), 3),
+        'queries': max(queries),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def renderers():
+    """Страница карточек через include шаблона и за один проход."""
+    posts = list(Post.objects.select_related('author')[:POSTS_PER_PAGE])
+    return {
+        'cards_include': lambda: [
+            render_to_string(CARD_TEMPLATE, {'post': post})
+            for post in posts
+        ],
+        'cards_single_pass': lambda: renderer.render_cards(posts),
+    }
+
+
+def run(size, requests=50, cold=False, only=None, progress=None):
+    """Меряем все страницы на текущей базе с size постами."""
+    data = prepare(size)
+    clients = {'anonymous': Client(), 'author': Client(), 'admin': Client()}
+    clients['author'].force_login(data['author'])
+    clients['admin'].force_login(data['admin'])
+    calls = {
+        name: functools.partial(request, clients[who], method, path, params)
+        for name, who, method, path, params in routes(data)
+    }
+    calls.update(renderers())
+    results = {}
+    # Меряем сами записи, а не быстрый отказ 429 после исчерпания ведра
+    with override_settings(WRITE_THROTTLE_RATES={}):
+        for name, call in calls.items():
+            if only and name not in only:
+                continue
+            results[name] = measure(call, requests, cold)
+            if progress:
+                progress(name, results[name])
+    return results
+
+
+def api_speedups(results):
+    """Во сколько раз JSON API быстрее HTML-страницы: отношение
+    медианных задержек, то есть запросов в секунду одного клиента.
+    Медиана, а не среднее: одна сборка мусора среди сотни запросов по
+    0,2 мс меняет среднее вдвое."""
+    return {
+        api: round(results[html]['p50_ms'] / results[api]['p50_ms'], 1)
+        for html, api in API_PAIRS.items()
+        if html in results and api in results
+    }
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'machine': platform.machine(),
+        'created': timezone.now().isoformat(),
+    }
+
+
+def compare(base, new, threshold=0.2):
+    """Регрессии new относительно base: рост задержек и памяти больше
+    threshold и любой рост числа запросов."""
+    regressions = []
+    for size, routes_ in new['results'].items():
+        for name, metrics in routes_.items():
+            old = base['results'].get(size, {}).get(name)
+            if old is None:
+                continue
+            for metric in LATENCY_METRICS + ('peak_kib',):
+                if metrics[metric] > old[metric] * (1 + threshold):
+                    regressions.append(
+                        f'{size} {name}: {metric} '
+                        f'{old[metric]} -> {metrics[metric]}'
+                    )
+            if metrics['queries'] > old['queries']:
+                regressions.append(
+                    f'{size} {name}: queries '
+                    f'{old["queries"]} -> {metrics["queries"]}'
+                )
+    return regressions
+
+
+def save(results, path):
+    with open(path, 'w', encoding='utf-8') as stream:
+        json.dump(results, stream, ensure_ascii=False, indent=2)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as stream:
+        return json.load(stream)
@@ -0,0 +1,65 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from yatube.timing import timed_block
+
+from . import renderer
+
+CARD_TEMPLATE = 'post_main.html'
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def card_key(post, size='feed'):
+    """Ключ карточки: id поста и все, от чего зависит ее разметка.
+
+    Дата изменения сдвигается при любом save() поста (view, админка,
+    ORM) и при готовности миниатюр, имя автора — при смене профиля,
+    так что старая карточка больше не находится и просто истекает
+    по таймауту.
+    """
+    return make_template_fragment_key('post_card', (
+        size,
+        post.pk,
+        post.edited.timestamp(),
+        post.author.username,
+        post.author.get_full_name(),
+    ))
+
+
+def render_cards(posts, size='feed'):
+    """Возвращаем HTML карточек, собирая их по возможности из кеша."""
+    posts = list(posts)
+    keys = [card_key(post, size) for post in posts]
+    cached = cache.get_many(keys)
+    missing = [(key, post) for key, post in zip(keys, posts)
+               if key not in cached]
+    rendered = {}
+    if missing:
+        # Промахи рендерим за один проход, а не include на каждый пост
+        with timed_block(CARD_TEMPLATE):
+            rendered = dict(zip(
+                (key for key, _ in missing),
+                renderer.render_cards((post for _, post in missing), size),
+            ))
+    cards = [cached.get(key) or rendered[key] for key in keys]
+    if rendered:
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+    with _stats_lock:
+        _stats['hits'] += len(posts) - len(rendered)
+        _stats['misses'] += len(rendered)
+    return cards
+
+
+def stats():
+    """Попадания и промахи кеша карточек в текущем процессе."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
@@ -0,0 +1,120 @@
+import functools
+import hashlib
+import time
+
+from django.contrib.auth import get_user_model
+from django.db.models import OuterRef, Subquery
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from . import page_cache
+from .models import ArchivedPost, Group, Post
+
+User = get_user_model()
+
+# Счетчики автора, которые видны в его карточке
+COUNTER_FIELDS = ('post_counter__posts_count',
+                  'post_counter__followers_count',
+                  'post_counter__following_count')
+
+
+def _newest(**filters):
+    """Подзапрос: время последнего изменения поста ленты (по индексу)."""
+    return Subquery(
+        Post.objects.filter(**filters).order_by('-edited').values(
+            'edited'
+        )[:1]
+    )
+
+
+def index_state():
+    newest = Post.objects.order_by('-edited').values_list(
+        'edited', flat=True
+    ).first()
+    return newest, None, [page_cache.GLOBAL_FEED]
+
+
+def group_state(slug):
+    state = Group.objects.filter(slug=slug).annotate(
+        newest=_newest(group=OuterRef('pk'))
+    ).values_list('newest', 'posts_count').first()
+    if state is None:
+        return None
+    newest, count = state
+    return newest, count, [page_cache.GROUP_FEED.format(slug=slug)]
+
+
+def author_state(username):
+    state = User.objects.filter(username=username).annotate(
+        newest=_newest(author=OuterRef('pk'))
+    ).values_list('newest', *COUNTER_FIELDS).first()
+    if state is None:
+        return None
+    newest, *counts = state
+    # Правку архивного поста видно только по поколению ленты автора
+    return newest, counts, [page_cache.AUTHOR_FEED.format(username=username)]
+
+
+def post_state(username, post_id):
+    for model in (Post, ArchivedPost):
+        # Без ORDER BY: пост ищется по первичному ключу
+        state = model.objects.filter(
+            id=post_id, author__username=username
+        ).order_by().values_list(
+            'edited', *(f'author__{field}' for field in COUNTER_FIELDS)
+        )[:1]
+        if state:
+            edited, *counts = state[0]
+            # Смену имени автора видно только по поколению его ленты
+            return edited, counts, [
+                page_cache.AUTHOR_FEED.format(username=username)
+            ]
+    return None
+
+
+def conditional_feed(state):
+    """Отвечаем 304 на условный GET, не рендеря страницу.
+
+    state(**kwargs view) одним индексным запросом возвращает
+    (время последнего изменения поста, счетчики, ленты страницы) или
+    None, если объекта нет — тогда ответ целиком формирует view.
+    Last-Modified — позднее из времени поста и последнего сдвига
+    поколений лент: удаление, перенос поста, правка архивного и смена
+    имени автора времени поста не меняют. Для авторизованных
+    пользователей страница зависит от пользователя, поэтому им
+    отдается только ETag с его id, без Last-Modified.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            current = state(**kwargs)
+            if current is None:
+                return view(request, *args, **kwargs)
+            newest, counts, feeds = current
+            generations, changed = page_cache.get_state(feeds)
+            etag = quote_etag(hashlib.md5(repr((
+                request.get_full_path(), request.user.pk, newest, counts,
+                generations,
+            )).encode()).hexdigest())
+            if newest is not None:
+                changed = max(changed, newest.timestamp())
+            last_modified = int(changed)
+            # Last-Modified с точностью до секунды: правку в ту же
+            # секунду клиент с If-Modified-Since не заметил бы
+            if (request.user.is_authenticated
+                    or last_modified >= int(time.time())):
+                last_modified = None
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                if last_modified is not None:
+                    response['Last-Modified'] = http_date(last_modified)
+            return response
+        return wrapper
+    return decorator
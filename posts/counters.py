@@ -0,0 +1,148 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F
+
+from . import lookups
+from .models import ArchivedPost, AuthorCounter, Follow, Group, Post
+
+User = get_user_model()
+
+AUTHOR_FIELDS = ('posts_count', 'followers_count', 'following_count')
+
+
+def _grouped(queryset, field):
+    return dict(queryset.order_by().values(field).annotate(
+        total=Count('pk')
+    ).values_list(field, 'total'))
+
+
+def _posts_grouped(field, **filters):
+    """Число постов по field в горячей таблице и архиве вместе."""
+    totals = _grouped(Post.objects.filter(**filters), field)
+    archived = _grouped(ArchivedPost.objects.filter(**filters), field)
+    for key, total in archived.items():
+        totals[key] = totals.get(key, 0) + total
+    return totals
+
+
+def actual_author_counts(author_ids=None):
+    """Реальные значения счетчиков авторов: {id: (записи, подписчики,
+    подписки)}."""
+    follows = Follow.objects.all()
+    if author_ids is not None:
+        by_posts = _posts_grouped('author', author_id__in=author_ids)
+        follows_in = follows.filter(author_id__in=author_ids)
+        follows_out = follows.filter(user_id__in=author_ids)
+    else:
+        by_posts = _posts_grouped('author')
+        follows_in = follows_out = follows
+    by_followers = _grouped(follows_in, 'author')
+    by_following = _grouped(follows_out, 'user')
+    ids = author_ids if author_ids is not None else User.objects.values_list(
+        'pk', flat=True
+    ).iterator()
+    return {
+        pk: (by_posts.get(pk, 0), by_followers.get(pk, 0),
+             by_following.get(pk, 0))
+        for pk in ids
+    }
+
+
+def shift_author(author_id, delta, field='posts_count'):
+    """Сдвигаем счетчик автора, недостающий счетчик создаем по факту."""
+    updated = AuthorCounter.objects.filter(author_id=author_id).update(
+        **{field: F(field) + delta}
+    )
+    if not updated and delta > 0:
+        actual = actual_author_counts([author_id])[author_id]
+        AuthorCounter.objects.create(
+            author_id=author_id, **dict(zip(AUTHOR_FIELDS, actual))
+        )
+    lookups.forget_user(author_id)
+
+
+def shift_group(group_id, delta):
+    if group_id is not None:
+        Group.objects.filter(pk=group_id).update(
+            posts_count=F('posts_count') + delta
+        )
+        lookups.forget_group(group_id)
+
+
+def post_saved(post, created):
+    author_id, group_id = (
+        (None, None) if created
+        else getattr(post, '_counted_relations', (None, None))
+    )
+    if author_id != post.author_id:
+        if author_id is not None:
+            shift_author(author_id, -1)
+        shift_author(post.author_id, 1)
+    if group_id != post.group_id:
+        shift_group(group_id, -1)
+        shift_group(post.group_id, 1)
+    post.remember_relations()
+
+
+def post_deleted(post):
+    # Удаление автора каскадом удаляет и его счетчик, поэтому только update
+    AuthorCounter.objects.filter(author_id=post.author_id).update(
+        posts_count=F('posts_count') - 1
+    )
+    lookups.forget_user(post.author_id)
+    shift_group(post.group_id, -1)
+
+
+def follow_changed(follow, delta):
+    if delta > 0:
+        shift_author(follow.author_id, delta, 'followers_count')
+        shift_author(follow.user_id, delta, 'following_count')
+        return
+    AuthorCounter.objects.filter(author_id=follow.author_id).update(
+        followers_count=F('followers_count') + delta
+    )
+    AuthorCounter.objects.filter(author_id=follow.user_id).update(
+        following_count=F('following_count') + delta
+    )
+    lookups.forget_user(follow.author_id)
+    lookups.forget_user(follow.user_id)
+
+
+def find_mismatches():
+    """Возвращаем расхождения счетчиков с реальными значениями.
+
+    Результат — список (объект, записано, на самом деле).
+    """
+    mismatches = []
+    stored = {
+        row[0]: row[1:] for row in AuthorCounter.objects.values_list(
+            'author_id', *AUTHOR_FIELDS
+        )
+    }
+    for pk, actual in actual_author_counts().items():
+        current = stored.get(pk, (0, 0, 0))
+        if current != actual:
+            mismatches.append((User(pk=pk), current, actual))
+    by_group = _posts_grouped('group', group__isnull=False)
+    for group in Group.objects.all():
+        actual = by_group.get(group.pk, 0)
+        if group.posts_count != actual:
+            mismatches.append((group, group.posts_count, actual))
+    return mismatches
+
+
+def rebuild():
+    """Пересчитываем счетчики, возвращаем число исправленных."""
+    with transaction.atomic():
+        mismatches = find_mismatches()
+        for obj, _, actual in mismatches:
+            if isinstance(obj, Group):
+                Group.objects.filter(pk=obj.pk).update(posts_count=actual)
+            else:
+                AuthorCounter.objects.update_or_create(
+                    author_id=obj.pk,
+                    defaults=dict(zip(AUTHOR_FIELDS, actual)),
+                )
+    if mismatches:
+        lookups.clear()
+    return len(mismatches)
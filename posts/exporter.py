@@ -0,0 +1,79 @@
+import csv
+import heapq
+import json
+import operator
+
+from .archive import PostChain
+
+FIELDS = ('id', 'text', 'pub_date', 'edited', 'author__username',
+          'group__slug')
+HEADER = ('id', 'text', 'pub_date', 'edited', 'author', 'group')
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def iter_rows(queryset, chunk_size=2000):
+    """Отдаем кортежи полей постов пачками по первичному ключу.
+
+    Каждая пачка — отдельный короткий запрос WHERE id > последний,
+    поэтому ни память, ни время одного запроса не растут с размером
+    выгрузки, а долгое чтение не держит открытым курсор базы.
+    У PostChain id горячих и архивных постов перемежаются (импорт
+    старых постов), поэтому каждая таблица читается своим проходом,
+    а потоки сливаются по id.
+    """
+    if isinstance(queryset, PostChain):
+        return heapq.merge(
+            *(_keyset_rows(part, chunk_size) for part in queryset.parts()),
+            key=operator.itemgetter(0),
+        )
+    return _keyset_rows(queryset, chunk_size)
+
+
+def _keyset_rows(queryset, chunk_size):
+    rows = queryset.order_by('pk').values_list(*FIELDS)
+    last = 0
+    while True:
+        chunk = list(rows.filter(pk__gt=last)[:chunk_size])
+        if not chunk:
+            return
+        yield from chunk
+        last = chunk[-1][0]
+
+
+def _serialize(row):
+    pk, text, pub_date, edited, author, group = row
+    return pk, text, pub_date.isoformat(), edited.isoformat(), author, group
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(HEADER, _serialize(row))),
+                         ensure_ascii=False) + '\n'
+
+
+class _Echo:
+    """Псевдофайл для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(HEADER)
+    for row in rows:
+        yield writer.writerow(_serialize(row))
+
+
+FORMATTERS = {
+    'ndjson': ndjson_lines,
+    'csv': csv_lines,
+}
+
+
+def export(queryset, file_format='ndjson', chunk_size=2000):
+    """Строки выгрузки в нужном формате."""
+    return FORMATTERS[file_format](iter_rows(queryset, chunk_size))
@@ -1,8 +1,29 @@
 from .models import Post
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.forms import ModelForm
 
 
 class PostForm(ModelForm):
     class Meta:
         model = Post
-        fields = ('text', 'group')
+        fields = ('text', 'group', 'image')
+
+    def clean_image(self):
+        """Отсекаем картинки, которые воркер не станет раскрывать."""
+        image = self.cleaned_data.get('image')
+        # Pillow-объект есть только у только что загруженного файла
+        if not getattr(image, 'image', None):
+            return image
+        if image.size > settings.POST_IMAGE_MAX_BYTES:
+            raise ValidationError(
+                'Файл больше %(limit)s МБ',
+                params={'limit': settings.POST_IMAGE_MAX_BYTES // 2 ** 20},
+            )
+        width, height = image.image.size
+        if width * height > settings.POST_IMAGE_MAX_PIXELS:
+            raise ValidationError(
+                'Картинка больше %(limit)s Мпикс',
+                params={'limit': settings.POST_IMAGE_MAX_PIXELS // 10 ** 6},
+            )
+        return image
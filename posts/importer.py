@@ -0,0 +1,244 @@
+import contextlib
+import csv
+import itertools
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+from django.utils import timezone
+
+from . import archive, counters, page_cache, search
+from .models import Group, Post
+
+User = get_user_model()
+
+# Сколько ошибок хранить для отчета, остальные только считаются
+REPORTED_ERRORS = 100
+
+
+class RecordError(ValueError):
+    """Запись, которую нельзя импортировать."""
+
+
+def read_jsonl(stream):
+    # Строки разбирает Importer.add: битая строка — пропущенная запись
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield line
+
+
+def read_csv(stream):
+    yield from csv.DictReader(stream)
+
+
+READERS = {'jsonl': read_jsonl, 'csv': read_csv}
+
+
+@contextlib.contextmanager
+def keep_dates():
+    """Отключаем auto_now/auto_now_add, чтобы сохранить даты из файла."""
+    fields = [Post._meta.get_field('pub_date'),
+              Post._meta.get_field('edited')]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+@contextlib.contextmanager
+def deferred_indexes():
+    """Снимаем вторичные индексы постов на время загрузки.
+
+    Построить индекс один раз в конце быстрее, чем обновлять его
+    на каждой вставленной строке.
+    """
+    indexes = Post._meta.indexes
+    with connection.schema_editor() as editor:
+        for index in indexes:
+            editor.remove_index(Post, index)
+    try:
+        yield
+    finally:
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                editor.add_index(Post, index)
+
+
+class Importer:
+    """Потоковая загрузка пользователей, групп и постов.
+
+    Записи приходят по одной (поле type: user, group или post),
+    копятся в буферах не длиннее batch_size и вставляются bulk_create.
+    Каждые transaction_size записей транзакция фиксируется, так что
+    память не зависит от размера файла — растут только словари
+    username -> id и slug -> id.
+    """
+
+    def __init__(self, batch_size=5000, transaction_size=50000,
+                 progress=None):
+        self.batch_size = batch_size
+        self.transaction_size = transaction_size
+        self.progress = progress or (lambda message: None)
+        self.authors = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.pending_users = {}
+        self.pending_groups = {}
+        self.pending_posts = []
+        self.created = {'user': 0, 'group': 0, 'post': 0}
+        self.touched_feeds = {page_cache.GLOBAL_FEED}
+        self.errors = []
+        self.skipped = 0
+        self.now = timezone.now()
+
+    def run(self, records):
+        started = time.monotonic()
+        total = 0
+        records = iter(records)
+        try:
+            with keep_dates():
+                while True:
+                    chunk = list(itertools.islice(records,
+                                                  self.transaction_size))
+                    if not chunk:
+                        break
+                    with transaction.atomic():
+                        for number, record in enumerate(chunk, total + 1):
+                            try:
+                                self.add(record)
+                            except (RecordError, KeyError, ValueError) as e:
+                                self.skipped += 1
+                                if len(self.errors) < REPORTED_ERRORS:
+                                    self.errors.append((number, repr(e)))
+                        self.flush()
+                    total += len(chunk)
+                    elapsed = time.monotonic() - started
+                    self.progress(
+                        f'{total} записей, {total / elapsed:.0f} в секунду'
+                    )
+        finally:
+            # Уже зафиксированные пачки догоняем и при аварийном выходе
+            self.finish()
+        return total, time.monotonic() - started
+
+    def add(self, record):
+        if isinstance(record, str):
+            record = json.loads(record)
+        if not isinstance(record, dict):
+            raise RecordError(f'запись не объект: {record!r}')
+        kind = record.get('type')
+        if kind == 'user':
+            self.add_user(record)
+        elif kind == 'group':
+            self.add_group(record)
+        elif kind == 'post':
+            self.add_post(record)
+        else:
+            raise RecordError(f'неизвестный тип записи: {kind!r}')
+
+    def add_user(self, record):
+        username = record['username']
+        if username in self.authors or username in self.pending_users:
+            return
+        self.pending_users[username] = User(
+            username=username,
+            first_name=record.get('first_name') or '',
+            last_name=record.get('last_name') or '',
+            email=record.get('email') or '',
+            password=make_password(None),
+        )
+        if len(self.pending_users) >= self.batch_size:
+            self.flush_users()
+
+    def add_group(self, record):
+        slug = record['slug']
+        if slug in self.groups or slug in self.pending_groups:
+            return
+        self.pending_groups[slug] = Group(
+            slug=slug,
+            title=record.get('title') or slug,
+            description=record.get('description') or '',
+        )
+        if len(self.pending_groups) >= self.batch_size:
+            self.flush_groups()
+
+    def add_post(self, record):
+        username, slug = record['author'], record.get('group') or None
+        if username in self.pending_users:
+            self.flush_users()
+        if slug in self.pending_groups:
+            self.flush_groups()
+        if username not in self.authors:
+            raise RecordError(f'неизвестный автор: {username}')
+        if slug is not None and slug not in self.groups:
+            raise RecordError(f'неизвестная группа: {slug}')
+        pub_date = record.get('pub_date')
+        pub_date = parse_datetime(pub_date) if pub_date else self.now
+        if pub_date is None:
+            raise RecordError(f'неверная дата: {record["pub_date"]}')
+        if timezone.is_naive(pub_date):
+            pub_date = timezone.make_aware(pub_date, timezone.utc)
+        self.touched_feeds.add(page_cache.AUTHOR_FEED.format(
+            username=username
+        ))
+        if slug is not None:
+            self.touched_feeds.add(page_cache.GROUP_FEED.format(slug=slug))
+        self.pending_posts.append(Post(
+            text=record['text'],
+            author_id=self.authors[username],
+            group_id=self.groups.get(slug),
+            pub_date=pub_date,
+            edited=pub_date,
+        ))
+        if len(self.pending_posts) >= self.batch_size:
+            self.flush_posts()
+
+    def flush_users(self):
+        if not self.pending_users:
+            return
+        User.objects.bulk_create(self.pending_users.values())
+        # SQLite не возвращает id из bulk_create, дочитываем их
+        self.authors.update(User.objects.filter(
+            username__in=list(self.pending_users)
+        ).values_list('username', 'pk'))
+        self.created['user'] += len(self.pending_users)
+        self.pending_users = {}
+
+    def flush_groups(self):
+        if not self.pending_groups:
+            return
+        Group.objects.bulk_create(self.pending_groups.values())
+        self.groups.update(Group.objects.filter(
+            slug__in=list(self.pending_groups)
+        ).values_list('slug', 'pk'))
+        self.created['group'] += len(self.pending_groups)
+        self.pending_groups = {}
+
+    def flush_posts(self):
+        if not self.pending_posts:
+            return
+        Post.objects.bulk_create(self.pending_posts)
+        self.created['post'] += len(self.pending_posts)
+        self.pending_posts = []
+
+    def flush(self):
+        self.flush_users()
+        self.flush_groups()
+        self.flush_posts()
+
+    def finish(self):
+        """Догоняем то, что bulk_create обходит: счетчики, поиск, кеш."""
+        if not self.created['post']:
+            return
+        self.progress('Пересчитываем счетчики и поисковый индекс')
+        archive.restore_order()
+        counters.rebuild()
+        search.rebuild()
+        page_cache.bump(self.touched_feeds)
@@ -0,0 +1,206 @@
+"""Кеш поиска групп по slug и пользователей по username в процессе.
+
+Эти строки читаются на порядки чаще, чем меняются, поэтому живут в
+ограниченном LRU-кеше с TTL прямо в процессе; при
+LOOKUP_CACHE_SHARED вторым уровнем служит общий кеш Django. Хранятся
+только поля, которые видны на страницах, а не экземпляры моделей:
+пароль и почта пользователя в кеш не попадают.
+
+Запись сбрасывается сигналами сохранения и удаления, а также при сдвиге
+счетчиков (пользователь хранится вместе с post_counter). Сброс меняет
+версию объекта в кеше Django, и запись процесса отдается, только пока
+ее версия совпадает, поэтому сброс виден всем процессам с общим кешем.
+"""
+import collections
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.http import Http404
+
+from .models import AuthorCounter, Group
+
+User = get_user_model()
+
+GROUP_FIELDS = ('id', 'title', 'slug', 'description', 'posts_count')
+USER_FIELDS = ('id', 'username', 'first_name', 'last_name')
+COUNTER_FIELDS = ('posts_count', 'followers_count', 'following_count')
+
+
+class LocalCache:
+    """LRU с TTL и индексом pk -> ключи для сброса по первичному ключу.
+
+    Значения — строки values(), build собирает из них новый экземпляр
+    модели для каждого читателя: изменения в одном запросе не видны
+    другим.
+    """
+
+    def __init__(self, prefix, build):
+        self.prefix = prefix
+        self.build = build
+        self.entries = collections.OrderedDict()
+        self.keys_by_pk = collections.defaultdict(set)
+        self.lock = threading.Lock()
+
+    def shared_key(self, key):
+        return f'lookup:{self.prefix}:{key}'
+
+    def pk_key(self, pk):
+        return f'lookup:{self.prefix}:pk:{pk}'
+
+    def version_key(self, pk):
+        return f'lookup:{self.prefix}:version:{pk}'
+
+    def generation_key(self):
+        return f'lookup:{self.prefix}:generation'
+
+    @staticmethod
+    def token(key):
+        """Текущее значение версии key; забытую кешем заводим заново,
+        и записи со старой версией перестают совпадать."""
+        token = cache.get(key)
+        if token is None:
+            cache.add(key, uuid.uuid4().hex, None)
+            token = cache.get(key)
+        return token
+
+    def get(self, key, load):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is not None and entry[0] > now:
+            _, pk, version, row = entry
+            if cache.get(self.version_key(pk)) == version:
+                with self.lock:
+                    if key in self.entries:
+                        self.entries.move_to_end(key)
+                return self.build(row)
+        generation = self.token(self.generation_key())
+        row = None
+        if settings.LOOKUP_CACHE_SHARED:
+            row = cache.get(self.shared_key(key))
+        if row is None:
+            row = load()
+            if row is None:
+                return None
+            if settings.LOOKUP_CACHE_SHARED:
+                cache.set_many({self.shared_key(key): row,
+                                self.pk_key(row['id']): key},
+                               settings.LOOKUP_CACHE_TIMEOUT)
+        pk = row['id']
+        version = self.token(self.version_key(pk))
+        if cache.get(self.generation_key()) != generation:
+            # Пока строка читалась, какой-то объект сбросили: она могла
+            # устареть до версии, которую мы уже видим
+            return self.build(row)
+        with self.lock:
+            self.entries[key] = (now + settings.LOOKUP_CACHE_TIMEOUT,
+                                 pk, version, row)
+            self.entries.move_to_end(key)
+            self.keys_by_pk[pk].add(key)
+            while len(self.entries) > settings.LOOKUP_CACHE_SIZE:
+                old_key, (_, old_pk, _, _) = self.entries.popitem(
+                    last=False
+                )
+                keys = self.keys_by_pk[old_pk]
+                keys.discard(old_key)
+                if not keys:
+                    del self.keys_by_pk[old_pk]
+        return self.build(row)
+
+    def forget(self, pk, keys=()):
+        """Сбрасываем все записи объекта во всех процессах, в том числе
+        под прежним ключом после переименования, и записи под ключами
+        keys."""
+        cache.set_many({self.version_key(pk): uuid.uuid4().hex,
+                        self.generation_key(): uuid.uuid4().hex}, None)
+        with self.lock:
+            keys = self.keys_by_pk.pop(pk, set()) | set(keys)
+            for key in keys:
+                self.entries.pop(key, None)
+        if settings.LOOKUP_CACHE_SHARED:
+            shared = cache.get(self.pk_key(pk))
+            if shared is not None:
+                keys = keys | {shared}
+            cache.delete_many([self.shared_key(key) for key in keys]
+                              + [self.pk_key(pk)])
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.keys_by_pk.clear()
+
+
+def _build_group(row):
+    return Group.from_db(DEFAULT_DB_ALIAS, GROUP_FIELDS,
+                         [row[field] for field in GROUP_FIELDS])
+
+
+def _build_user(row):
+    """Пользователь без непоказываемых полей (они дочитываются при
+    обращении) и с закешированным post_counter."""
+    user = User.from_db(DEFAULT_DB_ALIAS, USER_FIELDS,
+                        [row[field] for field in USER_FIELDS])
+    counter = None
+    if row['post_counter__posts_count'] is not None:
+        counter = AuthorCounter(author_id=user.pk, **{
+            field: row[f'post_counter__{field}'] for field in COUNTER_FIELDS
+        })
+        counter._state.adding = False
+        counter._state.db = DEFAULT_DB_ALIAS
+    # Нет строки счетчика — обращение бросает DoesNotExist без запроса
+    User.post_counter.related.set_cached_value(user, counter)
+    return user
+
+
+groups = LocalCache('group', _build_group)
+users = LocalCache('user', _build_user)
+
+
+def group_by_slug(slug):
+    group = groups.get(
+        slug, lambda: Group.objects.filter(slug=slug).values(
+            *GROUP_FIELDS
+        ).first()
+    )
+    if group is None:
+        raise Http404('Группа не найдена')
+    return group
+
+
+def user_by_username(username):
+    """Пользователь вместе со счетчиками post_counter."""
+    user = users.get(username, lambda: User.objects.filter(
+        username=username
+    ).values(*USER_FIELDS, *(
+        f'post_counter__{field}' for field in COUNTER_FIELDS
+    )).first())
+    if user is None:
+        raise Http404('Пользователь не найден')
+    return user
+
+
+def _forget(lookup, pk, keys):
+    if pk is None:
+        return
+    lookup.forget(pk, keys)
+    # Второй сброс отбрасывает запись, которую другой запрос успел
+    # закешировать по еще не закоммиченным данным
+    transaction.on_commit(lambda: lookup.forget(pk, keys))
+
+
+def forget_group(pk, slug=None):
+    _forget(groups, pk, [slug] if slug else [])
+
+
+def forget_user(pk, username=None):
+    _forget(users, pk, [username] if username else [])
+
+
+def clear():
+    groups.clear()
+    users.clear()
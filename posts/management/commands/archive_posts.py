@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts import archive
+
+
+class Command(BaseCommand):
+    help = ('Переносит посты старше ARCHIVE_AFTER_DAYS дней в архивную '
+            'таблицу. Запускается периодически.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int)
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, **options):
+        total = archive.move(options['days'], options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Перенесено в архив: {total}')
+        )
@@ -0,0 +1,86 @@
+import os
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Меряет p50/p95/p99, запросы к базе и пиковую память всех '
+            'страниц на засеянных базах разного объема; сравнивает '
+            'результаты двух запусков.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int,
+                            default=[10000, 100000, 1000000])
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Запросов на страницу.')
+        parser.add_argument('--routes', nargs='+',
+                            help='Мерить только эти страницы.')
+        parser.add_argument('--cold', action='store_true',
+                            help='Очищать кеш перед каждым запросом.')
+        parser.add_argument('--db-dir', default='.',
+                            help='Каталог файлов засеянных баз.')
+        parser.add_argument('--output', default='benchmark.json')
+        parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'),
+                            help='Сравнить два файла результатов.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Допустимый относительный рост метрик.')
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            return self.compare(*options['compare'], options['threshold'])
+        results = {'environment': benchmark.environment(), 'results': {}}
+        for size in options['sizes']:
+            self.stdout.write(f'{size} постов')
+            results['results'][str(size)] = self.run_size(size, options)
+            self.speedups(results['results'][str(size)])
+        benchmark.save(results, options['output'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Результаты записаны в {options["output"]}')
+        )
+
+    def run_size(self, size, options):
+        connection.settings_dict['TEST']['NAME'] = os.path.join(
+            options['db_dir'], f'benchmark-{size}.sqlite3'
+        )
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False, keepdb=True
+        )
+        cache.clear()
+        try:
+            return benchmark.run(
+                size, options['requests'], options['cold'],
+                options['routes'], self.progress,
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0,
+                                                keepdb=True)
+
+    def progress(self, name, metrics):
+        self.stdout.write(
+            f'  {name:<20}{metrics["status"] or "-":>4}'
+            f'{metrics["p50_ms"]:>9.1f}{metrics["p95_ms"]:>9.1f}'
+            f'{metrics["p99_ms"]:>9.1f} мс{metrics["queries"]:>4} SQL'
+            f'{metrics["peak_kib"]:>9.0f} КиБ'
+        )
+
+    def speedups(self, results):
+        for name, speedup in benchmark.api_speedups(results).items():
+            style = (self.style.SUCCESS
+                     if speedup >= benchmark.API_SPEEDUP_TARGET
+                     else self.style.WARNING)
+            self.stdout.write(style(f'  {name:<20}в {speedup} раза быстрее '
+                                    f'HTML'))
+
+    def compare(self, base, new, threshold):
+        regressions = benchmark.compare(
+            benchmark.load(base), benchmark.load(new), threshold
+        )
+        for line in regressions:
+            self.stdout.write(line)
+        if regressions:
+            raise CommandError(f'Регрессий: {len(regressions)}')
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
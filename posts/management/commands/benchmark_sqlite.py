@@ -0,0 +1,152 @@
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+
+from yatube.sqlite.retry import is_locked, retry_on_lock
+
+SCHEMA = (
+    'CREATE TABLE bench_post (id integer PRIMARY KEY AUTOINCREMENT, '
+    'text text NOT NULL, author_id integer NOT NULL, '
+    'pub_date real NOT NULL)',
+    'CREATE INDEX bench_post_author_idx '
+    'ON bench_post (author_id, pub_date DESC, id DESC)',
+)
+AUTHORS = 100
+
+
+class Command(BaseCommand):
+    help = ('Многопоточный бенчмарк смешанной нагрузки (ленты и новые '
+            'посты) на временной базе для профилей SQLITE_PROFILES.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='+',
+                            default=['stock', 'production'])
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--write-share', type=float, default=0.2,
+                            help='Доля операций записи.')
+        parser.add_argument('--rows', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        unknown = set(options['profiles']) - set(settings.SQLITE_PROFILES)
+        if unknown:
+            raise CommandError(f'Неизвестные профили: {sorted(unknown)}')
+        self.stdout.write(
+            f'{"профиль":<12}{"чтений/с":>10}{"записей/с":>11}'
+            f'{"p95, мс":>10}{"блокировок":>12}'
+        )
+        for profile in options['profiles']:
+            with tempfile.TemporaryDirectory() as directory:
+                result = self.run_profile(profile, directory, options)
+            self.stdout.write(
+                f'{profile:<12}{result["reads"]:>10.0f}'
+                f'{result["writes"]:>11.0f}{result["p95"]:>10.2f}'
+                f'{result["locked"]:>12}'
+            )
+
+    def run_profile(self, profile, directory, options):
+        alias = f'benchmark_{profile}'
+        connections.databases[alias] = {
+            **settings.SQLITE_PROFILES[profile],
+            'NAME': os.path.join(directory, 'benchmark.sqlite3'),
+        }
+        try:
+            self.seed(alias, options['rows'])
+            return self.measure(alias, profile, options)
+        finally:
+            connections[alias].close()
+            del connections.databases[alias]
+
+    def seed(self, alias, rows):
+        now = time.time()
+        with transaction.atomic(using=alias):
+            with connections[alias].cursor() as cursor:
+                for statement in SCHEMA:
+                    cursor.execute(statement)
+                cursor.executemany(
+                    'INSERT INTO bench_post (text, author_id, pub_date) '
+                    'VALUES (%s, %s, %s)',
+                    [(f'Пост {i}', i % AUTHORS, now - i)
+                     for i in range(rows)],
+                )
+
+    def measure(self, alias, profile, options):
+        deadline = time.monotonic() + options['seconds']
+        lock = threading.Lock()
+        stats = {'reads': 0, 'writes': 0, 'locked': 0, 'latencies': []}
+
+        def write():
+            with transaction.atomic(using=alias):
+                with connections[alias].cursor() as cursor:
+                    cursor.execute(
+                        'INSERT INTO bench_post (text, author_id, pub_date)'
+                        ' VALUES (%s, %s, %s)',
+                        ('Новый пост', random.randrange(AUTHORS),
+                         time.time()),
+                    )
+
+        if profile == 'production':
+            write = retry_on_lock(write)
+
+        def read():
+            with connections[alias].cursor() as cursor:
+                cursor.execute(
+                    'SELECT id, text, pub_date FROM bench_post '
+                    'WHERE author_id = %s '
+                    'ORDER BY pub_date DESC, id DESC LIMIT 10',
+                    (random.randrange(AUTHORS),),
+                )
+                cursor.fetchall()
+
+        def worker():
+            local = {'reads': 0, 'writes': 0, 'locked': 0, 'latencies': []}
+            connection = connections[alias]
+            try:
+                while time.monotonic() < deadline:
+                    writes = random.random() < options['write_share']
+                    kind = 'writes' if writes else 'reads'
+                    started = time.perf_counter()
+                    try:
+                        write() if kind == 'writes' else read()
+                    except OperationalError as error:
+                        if not is_locked(error):
+                            raise
+                        local['locked'] += 1
+                    else:
+                        local[kind] += 1
+                        local['latencies'].append(
+                            time.perf_counter() - started
+                        )
+                    # Конец «запроса»: соединение закрывается по тем же
+                    # правилам, что и после HTTP-запроса (CONN_MAX_AGE)
+                    connection.close_if_unusable_or_obsolete()
+            finally:
+                connection.close()
+                with lock:
+                    for key in ('reads', 'writes', 'locked'):
+                        stats[key] += local[key]
+                    stats['latencies'] += local['latencies']
+
+        threads = [threading.Thread(target=worker)
+                   for _ in range(options['threads'])]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+        latencies = stats['latencies'] or [0]
+        return {
+            'reads': stats['reads'] / elapsed,
+            'writes': stats['writes'] / elapsed,
+            'locked': stats['locked'],
+            'p95': statistics.quantiles(latencies, n=20)[-1] * 1000
+            if len(latencies) > 1 else latencies[0] * 1000,
+        }
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from posts import archive, exporter
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты автора, группы или всего сайта.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--author', help='username автора.')
+        parser.add_argument('--group', help='slug группы.')
+        parser.add_argument(
+            '--format',
+            choices=sorted(exporter.FORMATTERS),
+            default='ndjson',
+        )
+        parser.add_argument('--output', help='Файл, по умолчанию stdout.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        filters = {}
+        if options['author']:
+            filters['author__username'] = options['author']
+        if options['group']:
+            filters['group__slug'] = options['group']
+        posts = archive.chain(lambda model: model.objects.filter(**filters))
+        lines = exporter.export(
+            posts, options['format'], options['chunk_size']
+        )
+        if options['output']:
+            with open(options['output'], 'w', newline='',
+                      encoding='utf-8') as stream:
+                stream.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,53 @@
+import contextlib
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importer
+
+
+class Command(BaseCommand):
+    help = ('Импортирует пользователей, группы и посты из JSONL или CSV. '
+            'Каждая запись содержит поле type: user, group или post.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл с записями.')
+        parser.add_argument(
+            '--format',
+            choices=sorted(importer.READERS),
+            help='Формат файла, по умолчанию — по расширению.',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--transaction-size', type=int, default=50000)
+        parser.add_argument(
+            '--defer-indexes',
+            action='store_true',
+            help='Снять индексы постов на время загрузки и построить '
+                 'их заново в конце.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or path.rsplit('.', 1)[-1]
+        if file_format not in importer.READERS:
+            raise CommandError(f'Неизвестный формат файла: {file_format}')
+        loader = importer.Importer(
+            batch_size=options['batch_size'],
+            transaction_size=options['transaction_size'],
+            progress=self.stdout.write,
+        )
+        deferred = (importer.deferred_indexes() if options['defer_indexes']
+                    else contextlib.nullcontext())
+        with open(path, newline='', encoding='utf-8') as stream, deferred:
+            total, elapsed = loader.run(
+                importer.READERS[file_format](stream)
+            )
+        for number, error in loader.errors:
+            self.stderr.write(f'Запись {number}: {error}')
+        created = ', '.join(
+            f'{kind}: {count}' for kind, count in loader.created.items()
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано {total} записей за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-6):.0f} в секунду), '
+            f'создано — {created}, пропущено: {loader.skipped}'
+        ))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики записей авторов и групп.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить счетчики, ничего не меняя.',
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            mismatches = counters.find_mismatches()
+            for obj, stored, actual in mismatches:
+                self.stdout.write(
+                    f'{obj._meta.model_name} {obj.pk}: {stored} != {actual}'
+                )
+            if mismatches:
+                raise CommandError(
+                    f'Расхождений в счетчиках: {len(mismatches)}'
+                )
+            self.stdout.write(self.style.SUCCESS('Счетчики в порядке'))
+            return
+        fixed = counters.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Исправлено счетчиков: {fixed}')
+        )
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from posts import tasks
+
+
+class Command(BaseCommand):
+    help = ('Воркер очереди задач. Можно запускать несколько процессов '
+            'одновременно.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--poll-interval', type=float)
+        parser.add_argument('--once', action='store_true',
+                            help='Выйти, когда готовых задач не останется.')
+        parser.add_argument('--stats', action='store_true',
+                            help='Показать состояние очереди и выйти.')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(
+                'Ждут: {waiting}, выполняются: {running}, '
+                'с ошибкой: {failed}, задержка: {lag:.1f} с'.format(
+                    **tasks.stats()
+                )
+            )
+            return
+        tasks.work(
+            batch_size=options['batch_size'],
+            once=options['once'],
+            poll_interval=options['poll_interval'],
+            progress=self.report,
+        )
+
+    def report(self, result):
+        self.stdout.write(
+            'Выполнено: {done}, с ошибкой: {failed}, задержка '
+            'средняя {lag_mean:.3f} с, max {lag_max:.3f} с'.format(**result)
+        )
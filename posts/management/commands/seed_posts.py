@@ -0,0 +1,48 @@
+import datetime as dt
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from posts import synthetic
+
+
+class Command(BaseCommand):
+    help = ('Генерирует пользователей, группы и посты с популярностью '
+            'по Ципфу. Одинаковые --seed и --end дают одинаковые данные.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=1000000,
+                            help='Число постов.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--end', type=parse_date,
+                            help='Дата самого свежего поста, ГГГГ-ММ-ДД; '
+                                 'по умолчанию сегодня.')
+        parser.add_argument('--authors', type=int)
+        parser.add_argument('--groups', type=int)
+        parser.add_argument('--days', type=int, default=730,
+                            help='За сколько дней до --end идут посты.')
+        parser.add_argument('--batch-size', type=int, default=50000)
+        parser.add_argument('--skip-search', action='store_true',
+                            help='Не строить поисковый индекс; его можно '
+                                 'построить позже rebuild_search_index.')
+
+    def handle(self, *args, **options):
+        end = options['end']
+        if end is not None:
+            end = dt.datetime.combine(end, dt.time(), timezone.utc)
+        generator = synthetic.Generator(
+            options['size'],
+            seed=options['seed'],
+            end=end,
+            authors=options['authors'],
+            groups=options['groups'],
+            span_days=options['days'],
+            batch_size=options['batch_size'],
+            progress=lambda done: self.stdout.write(f'Постов: {done}'),
+        )
+        elapsed = generator.run(index_search=not options['skip_search'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано {options["size"]} постов, {generator.authors} '
+            f'авторов и {generator.groups} групп за {elapsed:.1f} с'
+        ))
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from yatube import throttle
+
+
+class Command(BaseCommand):
+    help = ('Показывает, сколько записей пропущено и отклонено '
+            'ограничением частоты во всех процессах.')
+
+    def handle(self, *args, **options):
+        if not settings.WRITE_THROTTLE_SHARED:
+            raise CommandError('Счетчики других процессов видны только '
+                               'при WRITE_THROTTLE_SHARED')
+        self.stdout.write(', '.join(
+            f'{name}: {value}'
+            for name, value in throttle.stats()['shared'].items()
+        ))
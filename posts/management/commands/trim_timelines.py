@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = ('Обрезает все ленты подписок до TIMELINE_LENGTH записей: '
+            'для лент, заполненных до обрезки в рассылке.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--length', type=int)
+
+    def handle(self, *args, **options):
+        deleted = timeline.trim(options['length'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Удалено записей лент: {deleted}')
+        )
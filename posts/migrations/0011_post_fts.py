@@ -0,0 +1,27 @@
+# Generated by Django 2.2.6 on 2026-10-18 20:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_post_edited'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                "CREATE VIRTUAL TABLE posts_post_fts USING fts5("
+                "text, group_title, group_description, "
+                "tokenize = 'unicode61')",
+                "INSERT INTO posts_post_fts "
+                "(rowid, text, group_title, group_description) "
+                "SELECT p.id, p.text, COALESCE(g.title, ''), "
+                "COALESCE(g.description, '') "
+                "FROM posts_post p "
+                "LEFT JOIN posts_group g ON g.id = p.group_id",
+            ],
+            reverse_sql=['DROP TABLE posts_post_fts'],
+        ),
+    ]
@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -20,12 +21,70 @@ class Group(models.Model):
         verbose_name='Описание',
         help_text='Напишите описание группы'
     )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число записей',
+    )
 
     def __str__(self):
         return self.title
 
 
-class Post(models.Model):
+class AuthorCounter(models.Model):
+    """Денормализованные счетчики записей и подписок автора."""
+    author = models.OneToOneField(
+        User,
+        primary_key=True,
+        verbose_name='Автор',
+        on_delete=models.CASCADE,
+        related_name='post_counter'
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число записей',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписчиков',
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписок',
+    )
+
+    def __str__(self):
+        return f'{self.author_id}: {self.posts_count}'
+
+
+class CountedPost:
+    """Общее поведение горячего и архивного поста для счетчиков."""
+
+    def __str__(self):
+        return self.text[:15]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_relations()
+        instance.remember_files()
+        return instance
+
+    def remember_relations(self):
+        """Запоминаем автора и группу, по которым учтен пост в счетчиках."""
+        self._counted_relations = (self.author_id, self.group_id)
+
+    def remember_files(self):
+        """Запоминаем картинку и миниатюры, занятые постом в хранилище."""
+        self._stored_files = (self.image.name, self.thumbnails)
+
+    def save(self, *args, **kwargs):
+        # Счетчики пересчитываются в post_save, держим их в той же транзакции
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
+class Post(CountedPost, models.Model):
 
     text = models.TextField(
         verbose_name='Текст',
@@ -36,6 +95,10 @@ class Post(models.Model):
         help_text='Добавьте дату публикации',
         auto_now_add=True
     )
+    edited = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True
+    )
     author = models.ForeignKey(
         User,
         verbose_name='Автор',
@@ -52,9 +115,218 @@ class Post(models.Model):
         null=True,
         help_text='Выберите группу'
     )
+    image = models.ImageField(
+        upload_to='posts/',
+        blank=True,
+        verbose_name='Картинка',
+        help_text='Загрузите картинку'
+    )
+    thumbnails = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='Миниатюры (JSON)'
+    )
+
+    class Meta:
+        ordering = ('-pub_date', '-id')
+        indexes = (
+            models.Index(fields=('-pub_date', '-id'),
+                         name='post_pub_date_idx'),
+            models.Index(fields=('group', '-pub_date', '-id'),
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=('author', '-pub_date', '-id'),
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=('-edited',),
+                         name='post_edited_idx'),
+            models.Index(fields=('group', '-edited'),
+                         name='post_group_edited_idx'),
+            models.Index(fields=('author', '-edited'),
+                         name='post_author_edited_idx'),
+        )
+
+
+class ArchivedPost(CountedPost, models.Model):
+    """Пост старше ARCHIVE_AFTER_DAYS, перенесенный из Post с тем же id.
+
+    Архив не читают первые страницы лент, поэтому его индексы могут
+    не помещаться в кеш страниц без вреда для горячего чтения.
+    """
+    text = models.TextField(
+        verbose_name='Текст'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации'
+    )
+    edited = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор',
+        on_delete=models.CASCADE,
+        related_name='archived_posts'
+    )
+    group = models.ForeignKey(
+        Group,
+        verbose_name='Группа',
+        on_delete=models.SET_NULL,
+        related_name='archived_posts',
+        blank=True,
+        null=True
+    )
+    image = models.ImageField(
+        upload_to='posts/',
+        blank=True,
+        verbose_name='Картинка'
+    )
+    thumbnails = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='Миниатюры (JSON)'
+    )
+
+    class Meta:
+        ordering = ('-pub_date', '-id')
+        indexes = (
+            models.Index(fields=('-pub_date', '-id'),
+                         name='archived_pub_date_idx'),
+            models.Index(fields=('group', '-pub_date', '-id'),
+                         name='archived_group_pub_date_idx'),
+            models.Index(fields=('author', '-pub_date', '-id'),
+                         name='archived_author_pub_date_idx'),
+        )
+
+
+class Follow(models.Model):
+    user = models.ForeignKey(
+        User,
+        verbose_name='Подписчик',
+        on_delete=models.CASCADE,
+        related_name='follower'
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор',
+        on_delete=models.CASCADE,
+        related_name='following'
+    )
+    created = models.DateTimeField(
+        verbose_name='Дата подписки',
+        auto_now_add=True
+    )
 
     class Meta:
-        ordering = ('-pub_date', )
+        constraints = (
+            models.UniqueConstraint(fields=('user', 'author'),
+                                    name='unique_follow'),
+        )
 
     def __str__(self):
-        return self.text[:15]
+        return f'{self.user_id} -> {self.author_id}'
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок читателя.
+
+    pub_date копируется из поста, чтобы лента читалась одним проходом
+    по индексу (owner, pub_date, post).
+    """
+    owner = models.ForeignKey(
+        User,
+        verbose_name='Читатель',
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        verbose_name='Запись',
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации'
+    )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(fields=('owner', 'post'),
+                                    name='unique_timeline_entry'),
+        )
+        indexes = (
+            models.Index(fields=('owner', '-pub_date', '-post'),
+                         name='timeline_owner_pub_date_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.owner_id}: {self.post_id}'
+
+
+class Task(models.Model):
+    """Побочное действие записи, которое выполняет воркер run_tasks.
+
+    Задача вставляется в той же транзакции, что и запись, поэтому
+    не теряется и не выполняется для откаченной записи. Пока задача
+    ждет, вторая задача с тем же key не создается.
+    """
+    name = models.CharField(
+        max_length=100,
+        verbose_name='Обработчик'
+    )
+    payload = models.TextField(
+        default='{}',
+        verbose_name='Данные (JSON)'
+    )
+    key = models.CharField(
+        max_length=200,
+        null=True,
+        blank=True,
+        verbose_name='Ключ идемпотентности'
+    )
+    created = models.DateTimeField(
+        verbose_name='Дата создания',
+        auto_now_add=True
+    )
+    run_at = models.DateTimeField(
+        verbose_name='Выполнить после',
+        default=timezone.now
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число попыток'
+    )
+    locked_by = models.CharField(
+        max_length=32,
+        null=True,
+        blank=True,
+        verbose_name='Захвачена воркером'
+    )
+    locked_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Захвачена до'
+    )
+    failed = models.BooleanField(
+        default=False,
+        verbose_name='Попытки исчерпаны'
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка'
+    )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('key',),
+                condition=models.Q(locked_by__isnull=True, failed=False),
+                name='unique_waiting_task',
+            ),
+        )
+        indexes = (
+            models.Index(fields=('failed', 'run_at'),
+                         name='task_due_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.name}: {self.key or self.pk}'
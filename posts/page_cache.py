@@ -0,0 +1,189 @@
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Group
+
+User = get_user_model()
+
+GLOBAL_FEED = 'global'
+GROUP_FEED = 'group:{slug}'
+AUTHOR_FEED = 'author:{username}'
+
+
+def generation_key(feed):
+    return f'feed-generation:{feed}'
+
+
+def changed_key(feed):
+    return f'feed-changed:{feed}'
+
+
+def fresh_generation():
+    """Поколение ленты, которую кеш забыл: больше всех прежних, чтобы
+    забытая лента не вернулась к старым страницам и ETag."""
+    return time.time_ns() // 1000
+
+
+def _read(keys, default):
+    """Значения keys; недостающие заводим значением default()."""
+    values = cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        value = default()
+        for key in missing:
+            cache.add(key, value, None)
+        # Ключ мог успеть завести другой запрос
+        values.update(cache.get_many(missing))
+    return [values[key] if key in values else default() for key in keys]
+
+
+def get_generations(feeds):
+    return _read([generation_key(feed) for feed in feeds], fresh_generation)
+
+
+def get_state(feeds):
+    """Поколения лент и время последнего сдвига любой из них одним
+    обращением к кешу. Сдвиг, который кеш забыл, считаем текущим."""
+    keys = [generation_key(feed) for feed in feeds]
+    changed_keys = [changed_key(feed) for feed in feeds]
+    values = cache.get_many(keys + changed_keys)
+    if len(values) < len(keys) + len(changed_keys):
+        return (get_generations(feeds),
+                max(_read(changed_keys, time.time)))
+    return ([values[key] for key in keys],
+            max(values[key] for key in changed_keys))
+
+
+def bump(feeds):
+    """Сдвигаем поколения лент, закешированные страницы перестают
+    находиться. Время сдвига идет в Last-Modified лент."""
+    feeds = list(feeds)
+    changed = time.time()
+    for feed in feeds:
+        key = generation_key(feed)
+        cache.add(key, fresh_generation(), None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Ключ успели вытеснить между add и incr
+            cache.set(key, fresh_generation(), None)
+    cache.set_many({changed_key(feed): changed for feed in feeds}, None)
+
+
+def bump_on_commit(feeds):
+    """Сдвигаем поколения сразу и еще раз после коммита.
+
+    Второй сдвиг отбрасывает страницы, которые другой запрос успел
+    закешировать по еще не закоммиченным данным.
+    """
+    feeds = list(feeds)
+    bump(feeds)
+    transaction.on_commit(lambda: bump(feeds))
+
+
+def _username(post, author_id):
+    if author_id == post.author_id and type(post).author.is_cached(post):
+        return post.author.username
+    return User.objects.filter(pk=author_id).values_list(
+        'username', flat=True
+    ).first()
+
+
+def _slug(post, group_id):
+    if group_id == post.group_id and type(post).group.is_cached(post):
+        return post.group.slug
+    return Group.objects.filter(pk=group_id).values_list(
+        'slug', flat=True
+    ).first()
+
+
+def post_feeds(post, relations=()):
+    """Ленты, на которых виден пост сейчас и до изменения (relations)."""
+    feeds = {GLOBAL_FEED}
+    for author_id, group_id in {(post.author_id, post.group_id), *relations}:
+        username = _username(post, author_id)
+        if username is not None:
+            feeds.add(AUTHOR_FEED.format(username=username))
+        if group_id is not None:
+            slug = _slug(post, group_id)
+            if slug is not None:
+                feeds.add(GROUP_FEED.format(slug=slug))
+    return feeds
+
+
+def post_changed(post, created):
+    # Читаем прежние автора и группу до того, как их обновят счетчики
+    relations = () if created else (
+        getattr(post, '_counted_relations', None),
+    )
+    bump_on_commit(post_feeds(post, filter(None, relations)))
+
+
+def post_deleted(post):
+    bump_on_commit(post_feeds(post))
+
+
+def author_changed(user):
+    """Имя автора видно в карточках всех лент с его постами."""
+    feeds = {GLOBAL_FEED, AUTHOR_FEED.format(username=user.username)}
+    for related in (user.posts, user.archived_posts):
+        feeds.update(
+            GROUP_FEED.format(slug=slug) for slug in related.filter(
+                group__isnull=False
+            ).order_by().values_list('group__slug', flat=True).distinct()
+        )
+    bump_on_commit(feeds)
+
+
+def group_changed(group, old_slug=None):
+    """Название и slug группы видны в карточках ее постов на всех
+    лентах; old_slug — прежний slug после переименования."""
+    feeds = {GLOBAL_FEED, GROUP_FEED.format(slug=group.slug)}
+    if old_slug:
+        feeds.add(GROUP_FEED.format(slug=old_slug))
+    for related in (group.groups, group.archived_posts):
+        feeds.update(
+            AUTHOR_FEED.format(username=username)
+            for username in related.order_by().values_list(
+                'author__username', flat=True
+            ).distinct()
+        )
+    bump_on_commit(feeds)
+
+
+def cache_for_anonymous(*feeds):
+    """Кешируем страницу для анонимных пользователей.
+
+    feeds — шаблоны имен лент, от которых зависит страница, они
+    заполняются аргументами view ('group:{slug}'). Ключ страницы
+    включает текущие поколения этих лент и полный путь запроса
+    с параметрами (page, cursor), поэтому запись сдвигает ключи только
+    затронутых лент. FEED_PAGE_CACHE_TIMEOUT ограничивает устаревание
+    всего, что поколения не отслеживают (например, смену имени автора).
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD')
+                    or request.user.is_authenticated):
+                return view(request, *args, **kwargs)
+            names = [feed.format(**kwargs) for feed in feeds]
+            path = hashlib.md5(
+                request.get_full_path().encode()
+            ).hexdigest()
+            generations = '.'.join(map(str, get_generations(names)))
+            key = f'page:{view.__name__}:{generations}:{path}'
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200:
+                    cache.set(key, response, settings.FEED_PAGE_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,186 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes, force_text
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+POSTS_PER_PAGE = 10
+# Сколько номеров страниц показывать по обе стороны от текущей
+PAGE_WINDOW = 2
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def position(post):
+    """(pub_date, id) поста или строки из values()."""
+    if isinstance(post, dict):
+        return post['pub_date'], post['id']
+    return post.pub_date, post.pk
+
+
+def encode_cursor(post, direction=NEXT):
+    """Упаковываем позицию поста (pub_date, id) в непрозрачный токен."""
+    pub_date, pk = position(post)
+    raw = f'{direction}|{pub_date.isoformat()}|{pk}'
+    return urlsafe_base64_encode(force_bytes(raw))
+
+
+def decode_cursor(token):
+    """Распаковываем токен, для битого токена возвращаем None."""
+    try:
+        direction, pub_date, pk = force_text(
+            urlsafe_base64_decode(token)
+        ).split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or pub_date is None:
+        return None
+    return direction, pub_date, pk
+
+
+class CursorPage:
+    """Страница курсорной пагинации.
+
+    Повторяет интерфейс Page, которым пользуются шаблоны, но вместо
+    номеров страниц хранит токены соседних страниц.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset-пагинация по (pub_date, id) в порядке Post.Meta.ordering.
+
+    Каждая страница выбирается одним запросом с LIMIT per_page + 1
+    от позиции из токена, поэтому не нужен ни OFFSET, ни COUNT(*),
+    и время выборки не зависит от глубины страницы.
+    """
+
+    def __init__(self, object_list, per_page):
+        self.object_list = object_list
+        self.per_page = per_page
+
+    def get_page(self, token):
+        cursor = decode_cursor(token) if token else None
+        if cursor is None:
+            return self._forward(self.object_list, has_previous=False)
+        direction, pub_date, pk = cursor
+        if direction == NEXT:
+            return self._forward(
+                self.object_list.filter(
+                    Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+                ),
+                has_previous=True,
+            )
+        return self._backward(
+            self.object_list.filter(
+                Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk)
+            )
+        )
+
+    def _forward(self, queryset, has_previous):
+        rows = list(
+            queryset.order_by('-pub_date', '-pk')[:self.per_page + 1]
+        )
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        return CursorPage(
+            rows,
+            next_cursor=encode_cursor(rows[-1]) if has_next else None,
+            previous_cursor=(encode_cursor(rows[0], PREVIOUS)
+                             if has_previous and rows else None),
+        )
+
+    def _backward(self, queryset):
+        rows = list(
+            queryset.order_by('pub_date', 'pk')[:self.per_page + 1]
+        )
+        if not rows:
+            return self._forward(self.object_list, has_previous=False)
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        return CursorPage(
+            rows,
+            next_cursor=encode_cursor(rows[-1]),
+            previous_cursor=(encode_cursor(rows[0], PREVIOUS)
+                             if has_previous else None),
+        )
+
+
+def page_window(number, num_pages, size=PAGE_WINDOW):
+    """Номера страниц вокруг текущей плюс первая и последняя,
+    пропуски обозначены None: [1, None, 11, 12, 13, 14, 15, None, 50]."""
+    numbers = sorted({1, num_pages} | set(range(
+        max(number - size, 1), min(number + size, num_pages) + 1
+    )))
+    window = []
+    for i in numbers:
+        if window and i - window[-1] > 1:
+            window.append(None)
+        window.append(i)
+    return window
+
+
+def cached_count(name, queryset):
+    """COUNT(*) ленты из кеша, устаревает не дольше
+    POST_COUNT_CACHE_TIMEOUT секунд."""
+    return cache.get_or_set(
+        f'count:{name}', queryset.count, settings.POST_COUNT_CACHE_TIMEOUT
+    )
+
+
+def paginate(request, object_list, per_page=POSTS_PER_PAGE, count=None):
+    """Возвращаем (paginator, page) для ленты.
+
+    Запрос с ?cursor= обслуживается курсорной пагинацией. Без него
+    работает прежний Paginator, чтобы старые ссылки ?page=N не ломались;
+    ссылка «Следующая» на такой странице уже ведет на курсор.
+    Известное заранее число записей (count, число или функция)
+    избавляет от COUNT(*); навигация показывает окно page.window.
+    """
+    token = request.GET.get('cursor')
+    if token is not None:
+        paginator = CursorPaginator(object_list, per_page)
+        return paginator, paginator.get_page(token)
+    paginator = Paginator(object_list, per_page)
+    if count is not None:
+        # Paginator.count — cached_property, подставляем готовое значение
+        paginator.count = count() if callable(count) else count
+    page = paginator.get_page(request.GET.get('page'))
+    if count is not None:
+        # Устаревшее число не должно обрезать страницу: срез без границы
+        bottom = (page.number - 1) * per_page
+        page.object_list = object_list[bottom:bottom + per_page]
+    page.window = page_window(page.number, paginator.num_pages)
+    page.next_cursor = (encode_cursor(page[len(page) - 1])
+                        if page.has_next() else None)
+    return paginator, page
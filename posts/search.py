@@ -0,0 +1,198 @@
+import re
+
+from django.db import connection
+from django.utils.encoding import force_bytes, force_text
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from . import tasks
+from .models import ArchivedPost, Group, Post
+
+FTS_TABLE = 'posts_post_fts'
+# Веса колонок для bm25: текст поста важнее названия и описания группы
+RANK = f'bm25({FTS_TABLE}, 1.0, 0.5, 0.25)'
+TERM = re.compile(r'(\w+)(\*?)')
+
+# Горячие и архивные посты вместе, id у них не пересекаются
+ALL_POSTS = ('(SELECT id, text, group_id FROM posts_post UNION ALL '
+             'SELECT id, text, group_id FROM posts_archivedpost)')
+INSERT_SQL = f"""
+    INSERT INTO {FTS_TABLE} (rowid, text, group_title, group_description)
+    SELECT p.id, p.text, COALESCE(g.title, ''), COALESCE(g.description, '')
+    FROM {ALL_POSTS} p LEFT JOIN posts_group g ON g.id = p.group_id
+"""
+
+
+def build_query(raw):
+    """Переводим пользовательский запрос в выражение MATCH.
+
+    Каждое слово берется в кавычки, чтобы синтаксис FTS5 из запроса
+    не исполнялся; слово со звездочкой на конце ищется как префикс.
+    """
+    terms = [f'"{word}"{star}' for word, star in TERM.findall(raw)]
+    return ' '.join(terms)
+
+
+INDEX_TASK = 'search.index_posts'
+
+
+def index_post(post):
+    """Ставим пост в очередь на переиндексацию, в том числе удаленный:
+    задача сверяет индекс с таблицей постов."""
+    tasks.enqueue(INDEX_TASK, {'post': post.pk},
+                  key=f'{INDEX_TASK}:{post.pk}')
+
+
+@tasks.handler(INDEX_TASK)
+def index_posts(payloads):
+    """Переиндексируем пачку постов; удаленные уходят из индекса."""
+    ids = sorted({payload['post'] for payload in payloads})
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} '
+                       f'WHERE rowid IN ({placeholders})', ids)
+        cursor.execute(f'{INSERT_SQL} WHERE p.id IN ({placeholders})', ids)
+
+
+GROUP_TASK = 'search.index_groups'
+# Сколько id постов удаленной группы подставлять в один UPDATE
+GROUP_CHUNK = 500
+
+
+def index_group(group, deleted=False):
+    """Ставим в очередь обновление названия и описания группы у всех
+    ее постов.
+
+    После удаления посты уже без группы, поэтому их id собираются
+    заранее, до удаления, и задача без ключа не сливается с ждущей
+    задачей переименования.
+    """
+    if not deleted:
+        tasks.enqueue(GROUP_TASK, {'group': group.pk},
+                      key=f'{GROUP_TASK}:{group.pk}')
+        return
+    posts = []
+    for model in (Post, ArchivedPost):
+        posts += model.objects.filter(group=group).values_list(
+            'pk', flat=True
+        )
+    tasks.enqueue(GROUP_TASK, {'group': group.pk, 'posts': posts})
+
+
+@tasks.handler(GROUP_TASK)
+def index_groups(payloads):
+    """Переписываем текст групп в индексе; у постов удаленной группы
+    он стирается."""
+    with connection.cursor() as cursor:
+        for payload in payloads:
+            if 'posts' in payload:
+                posts = payload['posts']
+                for start in range(0, len(posts), GROUP_CHUNK):
+                    chunk = posts[start:start + GROUP_CHUNK]
+                    cursor.execute(
+                        f"UPDATE {FTS_TABLE} SET group_title = '', "
+                        f"group_description = '' WHERE rowid IN "
+                        f"({', '.join(['%s'] * len(chunk))})",
+                        chunk,
+                    )
+                continue
+            group = Group.objects.filter(pk=payload['group']).values_list(
+                'title', 'description'
+            ).first()
+            if group is None:
+                # Удаление группы разбирает своя задача
+                continue
+            cursor.execute(
+                f'UPDATE {FTS_TABLE} SET group_title = %s, '
+                f'group_description = %s WHERE rowid IN '
+                f'(SELECT id FROM {ALL_POSTS} WHERE group_id = %s)',
+                [*group, payload['group']],
+            )
+
+
+def rebuild():
+    """Перестраиваем индекс целиком, возвращаем число записей."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(INSERT_SQL)
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) "
+                       f"VALUES ('optimize')")
+        cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE}')
+        return cursor.fetchone()[0]
+
+
+def filter_matching(queryset, query):
+    """Оставляем в queryset постов только найденные по индексу."""
+    match = build_query(query)
+    if not match:
+        return queryset.none()
+    return queryset.extra(
+        where=[f'{Post._meta.db_table}.id IN '
+               f'(SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)'],
+        params=[match],
+    )
+
+
+def encode_cursor(score, pk):
+    return urlsafe_base64_encode(force_bytes(f'{score!r}|{pk}'))
+
+
+def decode_cursor(token):
+    try:
+        score, pk = force_text(urlsafe_base64_decode(token)).split('|')
+        return float(score), int(pk)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        return None
+
+
+class SearchPage:
+    """Страница результатов поиска с токеном следующей страницы."""
+
+    def __init__(self, object_list, next_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def search(query, token=None, per_page=10):
+    """Ищем посты по релевантности (bm25), постранично по курсору."""
+    match = build_query(query)
+    if not match:
+        return SearchPage([])
+    sql = (f'SELECT id, score FROM (SELECT rowid AS id, {RANK} AS score '
+           f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)')
+    params = [match]
+    cursor_position = decode_cursor(token) if token else None
+    if cursor_position is not None:
+        score, pk = cursor_position
+        sql += ' WHERE score > %s OR (score = %s AND id > %s)'
+        params += [score, score, pk]
+    sql += ' ORDER BY score, id LIMIT %s'
+    params.append(per_page + 1)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    ids = [pk for pk, _ in rows]
+    posts = Post.objects.select_related('author', 'group').in_bulk(ids)
+    missing = [pk for pk in ids if pk not in posts]
+    if missing:
+        posts.update(ArchivedPost.objects.select_related(
+            'author', 'group'
+        ).in_bulk(missing))
+    return SearchPage(
+        [posts[pk] for pk, _ in rows if pk in posts],
+        next_cursor=(encode_cursor(rows[-1][1], rows[-1][0])
+                     if has_next else None),
+    )
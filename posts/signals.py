@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import counters, lookups, page_cache, search, thumbnails, timeline
+from .models import ArchivedPost, Group, Post
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=ArchivedPost)
+def post_saved(sender, instance, created, **kwargs):
+    # page_cache читает прежние связи поста, counters их обновляет
+    page_cache.post_changed(instance, created)
+    counters.post_saved(instance, created)
+    search.index_post(instance)
+    thumbnails.release(instance)
+    thumbnails.schedule(instance)
+    if created and sender is Post:
+        timeline.fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=ArchivedPost)
+def post_deleted(sender, instance, **kwargs):
+    page_cache.post_deleted(instance)
+    counters.post_deleted(instance)
+    search.index_post(instance)
+    thumbnails.release(instance, deleted=True)
+
+
+@receiver(pre_save, sender=Group)
+def group_saving(sender, instance, **kwargs):
+    # Ленты под прежним slug тоже надо сбросить
+    instance._saved_slug = Group.objects.filter(
+        pk=instance.pk
+    ).values_list('slug', flat=True).first() if instance.pk else None
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    old_slug = getattr(instance, '_saved_slug', None)
+    page_cache.group_changed(
+        instance, old_slug if old_slug != instance.slug else None
+    )
+    search.index_group(instance)
+    lookups.forget_group(instance.pk, instance.slug)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    lookups.forget_group(instance.pk, instance.slug)
+
+
+# Поля пользователя, которые видны в карточках постов
+CARD_USER_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    lookups.forget_user(instance.pk, instance.username)
+    # Вход сохраняет только last_login, ленты от него не меняются
+    if update_fields is None or CARD_USER_FIELDS & set(update_fields):
+        page_cache.author_changed(instance)
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    # Посты останутся без группы, их id для индекса и ленты их авторов
+    # собираем заранее
+    search.index_group(instance, deleted=True)
+    page_cache.group_changed(instance)
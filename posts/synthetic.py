@@ -0,0 +1,181 @@
+"""Быстрая детерминированная генерация пользователей, групп и постов.
+
+Один и тот же seed (и end) дает одни и те же данные. Популярность
+авторов и групп распределена по Ципфу, длина текстов логнормальна,
+даты постов растут вместе с id, как в живой базе. Посты вставляются
+executemany крупными транзакциями при снятых вторичных индексах и без
+проверки внешних ключей; счетчики считаются по ходу генерации.
+"""
+import bisect
+import collections
+import datetime as dt
+import itertools
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import archive, importer, page_cache, search
+from .models import AuthorCounter, Group
+
+User = get_user_model()
+
+WORDS = (
+    'пост', 'группа', 'лента', 'автор', 'текст', 'новость', 'день', 'город',
+    'книга', 'музыка', 'фильм', 'работа', 'отпуск', 'кофе', 'утро', 'вечер',
+    'дорога', 'море', 'горы', 'лес', 'друзья', 'семья', 'кино', 'театр',
+    'выставка', 'концерт', 'погода', 'дождь', 'снег', 'солнце', 'кот',
+    'собака', 'рецепт', 'ужин', 'завтрак', 'спорт', 'бег', 'велосипед',
+    'поезд', 'самолет', 'проект', 'код', 'идея', 'вопрос', 'ответ',
+    'сегодня', 'вчера', 'завтра', 'очень', 'снова', 'наконец', 'новый',
+    'старый', 'большой', 'маленький', 'хороший', 'интересный', 'и', 'в',
+    'на', 'с', 'по', 'для', 'о', 'не', 'что', 'как', 'это', 'мы', 'я',
+)
+# Длина общего потока слов, из которого вырезаются тексты постов
+STREAM_WORDS = 200000
+# Посты без группы
+NO_GROUP_SHARE = 0.4
+INSERT_SQL = ('INSERT INTO posts_post '
+              '(text, pub_date, edited, author_id, group_id, image, '
+              "thumbnails) VALUES (%s, %s, %s, %s, %s, '', '')")
+
+
+def zipf_cum_weights(count, exponent=1.1):
+    """Накопленные веса Ципфа: k-й по рангу в k**s раз реже первого."""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+class Generator:
+
+    def __init__(self, size, seed=0, end=None, authors=None, groups=None,
+                 span_days=730, batch_size=50000, progress=None):
+        self.size = size
+        self.rng = random.Random(seed)
+        self.end = end or timezone.now().replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        self.authors = authors or max(size // 100, 10)
+        self.groups = groups or max(size // 2000, 5)
+        self.span = dt.timedelta(days=span_days).total_seconds()
+        self.batch_size = batch_size
+        self.progress = progress
+
+    def run(self, index_search=True):
+        """Генерируем данные, возвращаем время в секундах."""
+        started = time.monotonic()
+        with transaction.atomic():
+            author_ids = self.create_authors()
+            group_ids = self.create_groups()
+        # id авторов и групп заведомо существуют, проверка внешних
+        # ключей на каждой строке только тратит время
+        with importer.deferred_indexes(), \
+                connection.constraint_checks_disabled():
+            posts_counts = self.create_posts(author_ids, group_ids)
+        # Посты не новее уже архивных сразу уходят в архив
+        archive.restore_order()
+        self.update_counters(posts_counts)
+        if index_search:
+            search.rebuild()
+        # Новые авторы и группы еще не кешировались, устарела только
+        # общая лента
+        page_cache.bump([page_cache.GLOBAL_FEED])
+        return time.monotonic() - started
+
+    def create_authors(self):
+        prefix = f'user-{self.rng.getrandbits(32):08x}-'
+        User.objects.bulk_create(
+            User(username=f'{prefix}{i}', first_name='Автор',
+                 last_name=f'№{i}', password='!')
+            for i in range(self.authors)
+        )
+        # SQLite не возвращает id из bulk_create, перечитываем по порядку
+        return list(User.objects.filter(
+            username__startswith=prefix
+        ).order_by('pk').values_list('pk', flat=True))
+
+    def create_groups(self):
+        prefix = f'group-{self.rng.getrandbits(32):08x}-'
+        Group.objects.bulk_create(
+            Group(title=f'Группа {i}', slug=f'{prefix}{i}',
+                  description='Описание группы')
+            for i in range(self.groups)
+        )
+        return list(Group.objects.filter(
+            slug__startswith=prefix
+        ).order_by('pk').values_list('pk', flat=True))
+
+    def texts(self):
+        """Тексты — срезы общего потока слов логнормальной длины."""
+        rng = self.rng
+        stream = rng.choices(WORDS, k=STREAM_WORDS)
+        starts = list(itertools.accumulate(
+            (len(word) + 1 for word in stream), initial=0
+        ))
+        stream = ' '.join(stream)
+        while True:
+            length = min(int(rng.lognormvariate(3, 1)) + 1,
+                         STREAM_WORDS - 1)
+            first = rng.randrange(STREAM_WORDS - length)
+            yield stream[starts[first]:starts[first + length] - 1]
+
+    def dates(self):
+        """Возрастающие даты публикации в пределах span до end."""
+        rng = self.rng
+        offsets = sorted(rng.random() * self.span for _ in range(self.size))
+        end = self.end.astimezone(dt.timezone.utc).replace(tzinfo=None)
+        for offset in reversed(offsets):
+            yield (end - dt.timedelta(seconds=offset)).isoformat(' ')
+
+    def create_posts(self, author_ids, group_ids):
+        rng = self.rng
+        author_weights = zipf_cum_weights(len(author_ids))
+        group_weights = zipf_cum_weights(len(group_ids))
+        author_total = author_weights[-1]
+        group_total = group_weights[-1]
+        rows = zip(self.texts(), self.dates())
+        posts_counts = collections.Counter()
+        done = 0
+        while done < self.size:
+            count = min(self.batch_size, self.size - done)
+            batch = []
+            for text, date in itertools.islice(rows, count):
+                author = author_ids[bisect.bisect(
+                    author_weights, rng.random() * author_total
+                )]
+                group = None
+                if rng.random() >= NO_GROUP_SHARE:
+                    group = group_ids[bisect.bisect(
+                        group_weights, rng.random() * group_total
+                    )]
+                batch.append((text, date, date, author, group))
+                posts_counts[author, group] += 1
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(INSERT_SQL, batch)
+            done += count
+            if self.progress:
+                self.progress(done)
+        return posts_counts
+
+    def update_counters(self, posts_counts):
+        """Счетчики новых авторов и групп — по числу сгенерированных
+        постов, без пересчета по таблице."""
+        authors = collections.Counter()
+        groups = collections.Counter()
+        for (author, group), count in posts_counts.items():
+            authors[author] += count
+            if group is not None:
+                groups[group] += count
+        with transaction.atomic():
+            AuthorCounter.objects.bulk_create(
+                AuthorCounter(author_id=author, posts_count=count)
+                for author, count in authors.items()
+            )
+            for group, count in groups.items():
+                Group.objects.filter(pk=group).update(
+                    posts_count=F('posts_count') + count
+                )
@@ -0,0 +1,198 @@
+"""Очередь задач в SQLite для побочных действий записи.
+
+enqueue() вставляет задачу в транзакции записи, и запрос завершается
+сразу после коммита. Воркер (manage.py run_tasks) захватывает пачку
+готовых задач на TASK_LEASE секунд одним UPDATE, выполняет их пачками
+по обработчику и удаляет. Упавшая задача повторяется с экспоненциальной
+паузой, после TASK_MAX_ATTEMPTS попыток остается в таблице с failed.
+Воркеров может быть несколько: задачу упавшего воркера подберет другой,
+когда истечет аренда, поэтому обработчики должны быть идемпотентны.
+"""
+import collections
+import datetime as dt
+import json
+import logging
+import random
+import time
+import traceback
+import uuid
+
+from django.conf import settings
+from django.db import (IntegrityError, close_old_connections, connection,
+                       transaction)
+from django.db.models import F, Min, Q
+from django.utils import timezone
+
+from yatube.sqlite.retry import retry_on_lock
+
+from .models import Task
+
+logger = logging.getLogger('yatube.tasks')
+
+HANDLERS = {}
+# Обработчики, которые сами открывают короткие транзакции
+NON_ATOMIC = set()
+
+
+def handler(name, atomic=True):
+    """Регистрируем обработчик задач name: он получает список payload
+    всей пачки и выполняется в одной транзакции. atomic=False — без
+    общей транзакции, чтобы долгая работа не держала запись в базу."""
+    def decorator(func):
+        HANDLERS[name] = func
+        if atomic:
+            NON_ATOMIC.discard(name)
+        else:
+            NON_ATOMIC.add(name)
+        return func
+    return decorator
+
+
+def enqueue(name, payload, key=None, delay=0):
+    """Ставим задачу; ждущая задача с тем же key поглощает новую."""
+    if settings.TASKS_EAGER:
+        HANDLERS[name]([payload])
+        return
+    Task.objects.bulk_create([Task(
+        name=name, payload=json.dumps(payload), key=key,
+        run_at=timezone.now() + dt.timedelta(seconds=delay),
+    )], ignore_conflicts=True)
+
+
+@retry_on_lock
+def claim(limit):
+    """Захватываем до limit готовых задач, в том числе брошенные
+    воркерами, у которых истекла аренда."""
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    due = Task.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+        failed=False, run_at__lte=now,
+    ).order_by('run_at').values('pk')[:limit]
+    with transaction.atomic():
+        # Один UPDATE: две пачки одной задачи захватить нельзя
+        Task.objects.filter(pk__in=due).update(
+            locked_by=token,
+            locked_until=now + dt.timedelta(seconds=settings.TASK_LEASE),
+            attempts=F('attempts') + 1,
+        )
+    return list(Task.objects.filter(locked_by=token).order_by('pk'))
+
+
+def _call(name, tasks):
+    func = HANDLERS.get(name)
+    if func is None:
+        raise LookupError(f'Нет обработчика задачи {name}')
+    payloads = [json.loads(task.payload) for task in tasks]
+    if name in NON_ATOMIC:
+        func(payloads)
+        return
+    with transaction.atomic():
+        func(payloads)
+
+
+@retry_on_lock
+def _finish(tasks):
+    if tasks:
+        Task.objects.filter(pk__in=[task.pk for task in tasks],
+                            locked_by=tasks[0].locked_by).delete()
+
+
+@retry_on_lock
+def _retry(task, error):
+    mine = Task.objects.filter(pk=task.pk, locked_by=task.locked_by)
+    if task.attempts >= settings.TASK_MAX_ATTEMPTS:
+        mine.update(failed=True, locked_by=None, locked_until=None,
+                    last_error=error)
+        return
+    delay = (settings.TASK_RETRY_BACKOFF * 2 ** (task.attempts - 1)
+             * random.uniform(0.5, 1.5))
+    try:
+        with transaction.atomic():
+            mine.update(
+                run_at=timezone.now() + dt.timedelta(seconds=delay),
+                locked_by=None, locked_until=None, last_error=error,
+            )
+    except IntegrityError:
+        # Пока задача выполнялась, поставили новую с тем же ключом,
+        # она и повторит действие
+        mine.delete()
+
+
+def run(tasks):
+    """Выполняем захваченные задачи, возвращаем сводку пачки."""
+    by_name = collections.defaultdict(list)
+    for task in tasks:
+        by_name[task.name].append(task)
+    done, failed = [], []
+    for name, group in by_name.items():
+        try:
+            _call(name, group)
+        except Exception:
+            if len(group) == 1:
+                failed.append((group[0], traceback.format_exc()))
+                continue
+        else:
+            done += group
+            continue
+        # Пачка упала: выполняем по одной, чтобы не повторять
+        # исправные задачи из-за одной сломанной
+        for task in group:
+            try:
+                _call(name, [task])
+            except Exception:
+                failed.append((task, traceback.format_exc()))
+            else:
+                done.append(task)
+    _finish(done)
+    for task, error in failed:
+        logger.warning('Задача %s упала (попытка %s): %s',
+                       task, task.attempts, error)
+        _retry(task, error)
+    now = timezone.now()
+    lags = [(now - task.created).total_seconds() for task in done]
+    return {
+        'done': len(done),
+        'failed': len(failed),
+        'lag_max': max(lags, default=0.0),
+        'lag_mean': sum(lags) / len(lags) if lags else 0.0,
+    }
+
+
+def work(batch_size=None, once=False, poll_interval=None, progress=None):
+    """Цикл воркера; once — выйти, когда готовых задач не осталось."""
+    batch_size = batch_size or settings.TASK_BATCH_SIZE
+    while True:
+        # Долгоживущий воркер переоткрывает соединение по CONN_MAX_AGE
+        if not connection.in_atomic_block:
+            close_old_connections()
+        tasks = claim(batch_size)
+        if not tasks:
+            if once:
+                return
+            time.sleep(poll_interval or settings.TASK_POLL_INTERVAL)
+            continue
+        result = run(tasks)
+        logger.info('Выполнено задач: %(done)s, с ошибкой: %(failed)s, '
+                    'задержка max %(lag_max).3f с', result)
+        if progress:
+            progress(result)
+
+
+def run_pending():
+    """Выполняем все готовые задачи в текущем процессе."""
+    work(once=True)
+
+
+def stats():
+    """Размер очереди и возраст самой старой ждущей задачи в секундах."""
+    now = timezone.now()
+    active = Task.objects.filter(failed=False)
+    oldest = active.aggregate(oldest=Min('created'))['oldest']
+    return {
+        'waiting': active.filter(locked_by__isnull=True).count(),
+        'running': active.filter(locked_by__isnull=False,
+                                 locked_until__gte=now).count(),
+        'failed': Task.objects.filter(failed=True).count(),
+        'lag': (now - oldest).total_seconds() if oldest else 0.0,
+    }
@@ -0,0 +1,22 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.cards import render_cards
+from posts.thumbnails import image_html
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts, size='feed'):
+    return mark_safe(''.join(render_cards(posts, size)))
+
+
+@register.simple_tag
+def post_card(post):
+    return post_cards((post,), 'detail')
+
+
+@register.simple_tag
+def post_image(post, size='feed'):
+    return mark_safe(image_html(post, size))
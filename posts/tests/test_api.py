@@ -0,0 +1,157 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import api, lookups, page_cache
+from posts.models import Group, Post
+
+
+class ApiTest(TestCase):
+    """Тестируем JSON API лент."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = get_user_model()
+        cls.author = user.objects.create_user(
+            username='test-author', first_name='Лев'
+        )
+        cls.group = Group.objects.create(
+            title='test-group', slug='test_group',
+            description='test-description'
+        )
+        for i in range(12):
+            Post.objects.create(text=f'Пост {i}', author=cls.author,
+                                group=cls.group if i % 2 else None)
+        cls.post = Post.objects.first()
+
+    def setUp(self):
+        cache.clear()
+        lookups.clear()
+        api.local_responses.clear()
+        self.client = Client()
+
+    def get(self, name, *args, **params):
+        response = self.client.get(reverse(name, args=args), params)
+        return response, response.json()
+
+    def test_feeds_without_model_instances(self):
+        urls = (
+            ('api_index', ()),
+            ('api_group', (self.group.slug,)),
+            ('api_profile', (self.author.username,)),
+            ('api_post', (self.author.username, self.post.id)),
+        )
+        with mock.patch.object(Post, 'from_db',
+                               side_effect=AssertionError('Post создан')):
+            for name, args in urls:
+                with self.subTest(name=name):
+                    response, _ = self.get(name, *args)
+                    self.assertEqual(response.status_code, 200)
+
+    def test_field_selection(self):
+        _, data = self.get('api_index', fields='text,author_first_name')
+        self.assertEqual(data['results'][0],
+                         {'text': 'Пост 11', 'author_first_name': 'Лев'})
+        response, data = self.get('api_index', fields='text,password')
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_pagination(self):
+        _, first = self.get('api_index')
+        self.assertEqual(len(first['results']), 10)
+        self.assertIsNone(first['previous'])
+        _, second = self.get('api_index', cursor=first['next'])
+        self.assertEqual([row['text'] for row in second['results']],
+                         ['Пост 1', 'Пост 0'])
+        self.assertIsNone(second['next'])
+
+    def test_group_feed_and_not_found(self):
+        _, data = self.get('api_group', self.group.slug)
+        self.assertEqual(len(data['results']), 6)
+        self.assertEqual({row['group'] for row in data['results']},
+                         {self.group.slug})
+        response, _ = self.get('api_group', 'missing')
+        self.assertEqual(response.status_code, 404)
+        response, _ = self.get('api_post', self.author.username, 10 ** 6)
+        self.assertEqual(response.status_code, 404)
+
+    def test_repeat_served_from_caches(self):
+        for name, arg, count in (('api_group', self.group.slug, 6),
+                                 ('api_profile', self.author.username, 10)):
+            with self.subTest(name=name):
+                response, _ = self.get(name, arg)
+                # Ни сессии, ни валидаторов из базы: только кеш
+                with self.assertNumQueries(0):
+                    response, data = self.get(name, arg)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(data['results']), count)
+                with self.assertNumQueries(0):
+                    response = self.client.get(
+                        reverse(name, args=(arg,)),
+                        HTTP_IF_NONE_MATCH=response['ETag'],
+                    )
+                self.assertEqual(response.status_code, 304)
+        response, data = self.get('api_profile', 'missing')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(data, {'error': 'Пользователь не найден'})
+
+    def test_logged_in_served_from_cache(self):
+        self.get('api_index')
+        self.client.force_login(self.author)
+        with self.assertNumQueries(0):
+            response, _ = self.get('api_index')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+
+    def test_changes_reach_cached_responses(self):
+        feeds = (
+            ('api_index', ()),
+            ('api_group', (self.group.slug,)),
+            ('api_profile', (self.author.username,)),
+        )
+        fields = 'text,author_first_name,group_title'
+        for name, args in feeds:
+            self.get(name, *args, fields=fields)
+        self.get('api_post', self.author.username, self.post.id)
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        for name, args in feeds:
+            with self.subTest(name=name):
+                _, data = self.get(name, *args, fields=fields)
+                self.assertEqual(data['results'][0]['group_title'],
+                                 'Новое название')
+        author = get_user_model().objects.get(pk=self.author.pk)
+        author.first_name = 'Федор'
+        author.save()
+        Post.objects.get(pk=self.post.pk).delete()
+        for name, args in feeds:
+            with self.subTest(name=name):
+                _, data = self.get(name, *args, fields=fields)
+                self.assertNotEqual(data['results'][0]['text'],
+                                    self.post.text)
+                self.assertEqual(data['results'][0]['author_first_name'],
+                                 'Федор')
+        response, _ = self.get('api_post', self.author.username,
+                               self.post.id)
+        self.assertEqual(response.status_code, 404)
+
+    def test_bump_in_other_process(self):
+        self.get('api_index')
+        # Другой процесс сдвигает поколение только в общем кеше, и
+        # ответ из памяти этого процесса больше не отдается
+        Post.objects.filter(pk=self.post.pk).update(text='Чужая правка')
+        page_cache.bump([page_cache.GLOBAL_FEED])
+        with self.assertNumQueries(1):
+            _, data = self.get('api_index')
+        self.assertEqual(data['results'][0]['text'], 'Чужая правка')
+
+    def test_renamed_group_slug_not_served(self):
+        self.get('api_group', self.group.slug)
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed'
+        group.save()
+        response, _ = self.get('api_group', 'test_group')
+        self.assertEqual(response.status_code, 404)
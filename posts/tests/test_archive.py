@@ -0,0 +1,172 @@
+import datetime as dt
+import json
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from posts import archive, counters, importer, search, tasks
+from posts.models import ArchivedPost, Group, Post, TimelineEntry
+
+OLD = 8
+NEW = 12
+
+
+class ArchiveTest(TestCase):
+    """Тестируем перенос старых постов в архив."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = get_user_model()
+        cls.author = user.objects.create_user(username='test-author')
+        cls.reader = user.objects.create_user(username='test-reader')
+        cls.group = Group.objects.create(
+            title='test-group', slug='test_group',
+            description='test-description'
+        )
+        now = timezone.now()
+        for i in range(OLD + NEW):
+            post = Post.objects.create(text=f'Пост {i}', author=cls.author,
+                                       group=cls.group)
+            age = dt.timedelta(days=200 - i if i < OLD else OLD + NEW - i)
+            Post.objects.filter(pk=post.pk).update(pub_date=now - age)
+        tasks.run_pending()
+        cls.expected = [f'Пост {i}' for i in reversed(range(OLD + NEW))]
+        cls.oldest = Post.objects.order_by('pub_date').first()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+        TimelineEntry.objects.create(owner=self.reader, post=self.oldest,
+                                     pub_date=self.oldest.pub_date)
+        self.moved = archive.move(days=100, batch_size=3)
+
+    def feed(self, url):
+        texts = []
+        response = self.client.get(url)
+        texts += [post.text for post in response.context['page']]
+        while response.context['page'].has_next():
+            response = self.client.get(
+                url, {'cursor': response.context['page'].next_cursor}
+            )
+            texts += [post.text for post in response.context['page']]
+        return texts
+
+    def test_move(self):
+        self.assertEqual(self.moved, OLD)
+        self.assertEqual(Post.objects.count(), NEW)
+        self.assertEqual(ArchivedPost.objects.count(), OLD)
+        self.assertEqual(ArchivedPost.objects.get(pk=self.oldest.pk).text,
+                         self.oldest.text)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(counters.rebuild(), 0)
+        self.assertEqual(archive.move(days=100), 0)
+
+    def test_feeds_continue_into_archive(self):
+        for url in (reverse('index'),
+                    reverse('group', args=(self.group.slug,)),
+                    reverse('profile', args=(self.author.username,))):
+            with self.subTest(url=url):
+                self.assertEqual(self.feed(url), self.expected)
+                response = self.client.get(url, {'page': 2})
+                self.assertEqual(
+                    [post.text for post in response.context['page']],
+                    self.expected[10:],
+                )
+                self.assertEqual(response.context['paginator'].count,
+                                 OLD + NEW)
+
+    def test_chain_reads_archive_only_when_needed(self):
+        posts = archive.chain(lambda model: model.objects.all())
+        with self.assertNumQueries(1):
+            self.assertEqual(len(posts[:10]), 10)
+        with self.assertNumQueries(1):
+            self.assertEqual(posts.count(), OLD + NEW)
+        with self.assertNumQueries(2):
+            self.assertEqual(len(posts[10:20]), 10)
+        # Страница только из архива: горячих строк до нее не хватило
+        with self.assertNumQueries(3):
+            self.assertEqual([post.text for post in posts[15:20]],
+                             self.expected[15:])
+        hot_only = archive.chain(lambda model: model.objects.all(),
+                                 total=NEW)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(hot_only[5:20]), NEW - 5)
+
+    def test_archived_post_detail_and_edit(self):
+        url = reverse('post', args=(self.author.username, self.oldest.pk))
+        response = self.client.get(url)
+        self.assertContains(response, self.oldest.text)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.client.post(
+            reverse('post_edit',
+                    args=(self.author.username, self.oldest.pk)),
+            {'text': 'Правка архивного поста', 'group': self.group.pk},
+        )
+        self.assertEqual(ArchivedPost.objects.get(pk=self.oldest.pk).text,
+                         'Правка архивного поста')
+        self.assertContains(self.client.get(url), 'Правка архивного поста')
+        tasks.run_pending()
+        self.assertEqual([post.pk for post in search.search('правка')],
+                         [self.oldest.pk])
+
+    def test_api_and_export(self):
+        response = self.client.get(
+            reverse('api_post', args=(self.author.username, self.oldest.pk))
+        )
+        self.assertEqual(json.loads(response.content)['text'],
+                         self.oldest.text)
+        response = self.client.get(
+            reverse('profile_export', args=(self.author.username,))
+        )
+        rows = [json.loads(line) for line in b''.join(
+            response.streaming_content
+        ).decode().splitlines()]
+        self.assertEqual(len(rows), OLD + NEW)
+
+    def test_export_command(self):
+        out = StringIO()
+        call_command('export_posts', '--author', self.author.username,
+                     '--chunk-size', '3', stdout=out)
+        texts = [json.loads(line)['text']
+                 for line in out.getvalue().splitlines()]
+        self.assertEqual(sorted(texts), sorted(self.expected))
+        out = StringIO()
+        call_command('export_posts', '--group', self.group.slug,
+                     stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), OLD + NEW)
+
+    def test_import_of_old_post_keeps_order(self):
+        year_ago = timezone.now() - dt.timedelta(days=365)
+        importer.Importer().run([{
+            'type': 'post', 'author': self.author.username,
+            'group': self.group.slug, 'text': 'Импортированный пост',
+            'pub_date': year_ago.isoformat(),
+        }])
+        self.assertTrue(ArchivedPost.objects.filter(
+            text='Импортированный пост'
+        ).exists())
+        self.assertEqual(Post.objects.count(), NEW)
+        url = reverse('profile', args=(self.author.username,))
+        self.assertEqual(self.feed(url),
+                         self.expected + ['Импортированный пост'])
+
+    def test_delete_archived(self):
+        ArchivedPost.objects.get(pk=self.oldest.pk).delete()
+        self.assertEqual(counters.rebuild(), 0)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, OLD + NEW - 1)
+
+    def test_command(self):
+        Post.objects.filter(pk=Post.objects.order_by('pub_date').first().pk
+                            ).update(pub_date=timezone.now()
+                                     - dt.timedelta(days=500))
+        out = StringIO()
+        call_command('archive_posts', '--days', '100', stdout=out)
+        self.assertIn('Перенесено в архив: 1', out.getvalue())
@@ -0,0 +1,61 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TransactionTestCase
+from posts import benchmark
+from posts.models import Post
+
+
+class BenchmarkRunTest(TransactionTestCase):
+    """Тестируем прогон бенчмарка на маленькой базе."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_run_every_route(self):
+        results = benchmark.run(200, requests=2)
+        self.assertGreaterEqual(Post.objects.count(), 200)
+        for name, metrics in results.items():
+            with self.subTest(route=name):
+                self.assertIn(metrics['status'], (200, 302, None))
+                self.assertLessEqual(metrics['p50_ms'], metrics['p99_ms'])
+        self.assertEqual(len(results), len(benchmark.routes(
+            benchmark.prepare(Post.objects.count())
+        )) + len(benchmark.renderers()))
+
+
+class BenchmarkCompareTest(SimpleTestCase):
+
+    def results(self, p95, queries):
+        metrics = {'p50_ms': 1.0, 'p95_ms': p95, 'p99_ms': p95,
+                   'queries': queries, 'peak_kib': 10.0}
+        return {'results': {'10000': {'index': metrics}}}
+
+    def test_flags_regressions(self):
+        base = self.results(10.0, 3)
+        self.assertEqual(benchmark.compare(base, self.results(11.0, 3)), [])
+        self.assertEqual(len(benchmark.compare(base, self.results(20, 4))),
+                         3)
+
+    def test_api_speedups(self):
+        results = {'index': {'p50_ms': 10.0}, 'api_index': {'p50_ms': 2.0},
+                   'group': {'p50_ms': 8.0}}
+        self.assertEqual(benchmark.api_speedups(results), {'api_index': 5.0})
+
+    def test_compare_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = []
+            for name, p95 in (('base', 10.0), ('new', 20.0)):
+                paths.append(os.path.join(directory, f'{name}.json'))
+                with open(paths[-1], 'w') as stream:
+                    json.dump(self.results(p95, 3), stream)
+            with self.assertRaises(CommandError):
+                call_command('benchmark', '--compare', *paths,
+                             stdout=StringIO())
+            call_command('benchmark', '--compare', paths[0], paths[0],
+                         stdout=StringIO())
@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import cards
+from posts.models import Post
+
+
+class PostCardCacheTest(TestCase):
+    """Тестируем кеш отрендеренных карточек постов."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = get_user_model()
+        cls.user = user.objects.create_user(
+            username='test-author', first_name='Лев', last_name='Толстой'
+        )
+        for i in range(3):
+            Post.objects.create(text=f'Тестовый текст {i}', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        cards.reset_stats()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_feed_served_from_cache(self):
+        first = self.client.get(reverse('index'))
+        self.assertEqual(cards.stats(), {'hits': 0, 'misses': 3})
+        second = self.client.get(reverse('index'))
+        self.assertEqual(cards.stats(), {'hits': 3, 'misses': 3})
+        self.assertEqual(first.content, second.content)
+
+    def test_card_matches_include(self):
+        """Карточка из кеша совпадает с прямым include шаблона."""
+        post = Post.objects.select_related('author').first()
+        self.client.get(reverse('index'))
+        self.assertEqual(
+            cards.render_cards([post]),
+            [render_to_string('post_main.html', {'post': post})],
+        )
+
+    def test_post_edit_invalidates_card(self):
+        post = Post.objects.first()
+        self.client.get(reverse('index'))
+        self.client.post(
+            reverse('post_edit', args=(self.user.username, post.id)),
+            data={'text': 'Измененный текст'},
+        )
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Измененный текст')
+        self.assertEqual(cards.stats(), {'hits': 2, 'misses': 4})
+
+    def test_author_rename_invalidates_card(self):
+        self.client.get(reverse('index'))
+        self.user.first_name = 'Алексей'
+        self.user.save()
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, '@Алексей Толстой')
+        self.assertNotContains(response, '@Лев Толстой')
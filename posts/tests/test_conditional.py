@@ -0,0 +1,126 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Group, Post
+
+
+class ConditionalGetTest(TestCase):
+    """Тестируем ответы 304 на условные GET-запросы."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = get_user_model()
+        cls.user = user.objects.create_user(username='test-author')
+        cls.group = Group.objects.create(
+            title='test-group', slug='test_group',
+            description='test-description'
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый текст', author=cls.user, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def urls(self):
+        return (
+            reverse('index'),
+            reverse('group', args=(self.group.slug,)),
+            reverse('profile', args=(self.user.username,)),
+            reverse('post', args=(self.user.username, self.post.id)),
+        )
+
+    def test_not_modified_with_single_query(self):
+        for url in self.urls():
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                with self.assertNumQueries(1):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since(self):
+        extra = Post.objects.create(
+            text='Лишний пост', author=self.user, group=self.group
+        )
+        start = time.time()
+        with mock.patch('time.time', return_value=start + 5):
+            dates = [self.guest_client.get(url)['Last-Modified']
+                     for url in self.urls()]
+            for url, date in zip(self.urls(), dates):
+                with self.subTest(url=url):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_MODIFIED_SINCE=date
+                    )
+                    self.assertEqual(response.status_code, 304)
+        # Удаление и смена имени не меняют время правки постов
+        with mock.patch('time.time', return_value=start + 10):
+            extra.delete()
+            user = get_user_model().objects.get(pk=self.user.pk)
+            user.first_name = 'Лев'
+            user.save()
+            response = self.guest_client.get(reverse('index'))
+            self.assertNotIn('Last-Modified', response)
+        with mock.patch('time.time', return_value=start + 15):
+            for url, date in zip(self.urls(), dates):
+                with self.subTest(url=url):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_MODIFIED_SINCE=date
+                    )
+                    self.assertEqual(response.status_code, 200)
+                    self.assertContains(response, 'Лев')
+
+    def test_edit_changes_validators(self):
+        etags = [self.guest_client.get(url)['ETag'] for url in self.urls()]
+        Post.objects.create(
+            text='Новый пост', author=self.user, group=self.group
+        )
+        for url, etag in zip(self.urls(), etags):
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_author_rename_changes_validators(self):
+        etags = [self.guest_client.get(url)['ETag'] for url in self.urls()]
+        user = get_user_model().objects.get(pk=self.user.pk)
+        user.first_name = 'Лев'
+        user.save()
+        for url, etag in zip(self.urls(), etags):
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Лев')
+
+    def test_login_keeps_validators(self):
+        user = get_user_model().objects.get(pk=self.user.pk)
+        user.set_password('test-password')
+        user.save()
+        etag = self.guest_client.get(reverse('index'))['ETag']
+        Client().login(username=user.username, password='test-password')
+        response = self.guest_client.get(reverse('index'),
+                                         HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_page_and_user_in_etag(self):
+        url = reverse('index')
+        etag = self.guest_client.get(url)['ETag']
+        response = self.guest_client.get(url, {'page': 2},
+                                         HTTP_IF_NONE_MATCH=etag)
+        self.assertNotEqual(response.status_code, 304)
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
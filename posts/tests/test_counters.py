@@ -0,0 +1,96 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import AuthorCounter, Group, Post
+
+
+class PostCountersTest(TestCase):
+    """Тестируем денормализованные счетчики записей."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = get_user_model()
+        cls.user = user.objects.create_user(username='test-author')
+        cls.group = Group.objects.create(
+            title='test-group', slug='test_group',
+            description='test-description'
+        )
+        cls.group_two = Group.objects.create(
+            title='test-group-2', slug='test_group_2',
+            description='test-description'
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def counts(self):
+        self.group.refresh_from_db()
+        self.group_two.refresh_from_db()
+        author = AuthorCounter.objects.filter(author=self.user).first()
+        return (author.posts_count if author else 0,
+                self.group.posts_count,
+                self.group_two.posts_count)
+
+    def test_create_move_delete(self):
+        post = Post.objects.create(
+            text='Тестовый текст', author=self.user, group=self.group
+        )
+        Post.objects.create(text='Без группы', author=self.user)
+        self.assertEqual(self.counts(), (2, 1, 0))
+        post = Post.objects.get(pk=post.pk)
+        post.group = self.group_two
+        post.save()
+        self.assertEqual(self.counts(), (2, 0, 1))
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(self.counts(), (2, 0, 1))
+        post.delete()
+        self.assertEqual(self.counts(), (1, 0, 0))
+
+    def test_post_edit_moves_counter(self):
+        post = Post.objects.create(
+            text='Тестовый текст', author=self.user, group=self.group
+        )
+        self.client.post(
+            reverse('post_edit', args=(self.user.username, post.id)),
+            data={'text': 'Измененный текст', 'group': self.group_two.id},
+        )
+        self.assertEqual(self.counts(), (1, 0, 1))
+
+    def test_queryset_delete(self):
+        """Массовое удаление (в том числе действие админки)."""
+        for _ in range(3):
+            Post.objects.create(
+                text='Тестовый текст', author=self.user, group=self.group
+            )
+        Post.objects.filter(
+            pk__in=Post.objects.values_list('pk', flat=True)[:2]
+        ).delete()
+        self.assertEqual(self.counts(), (1, 1, 0))
+
+    def test_profile_reads_counter(self):
+        Post.objects.create(text='Тестовый текст', author=self.user)
+        AuthorCounter.objects.filter(author=self.user).update(posts_count=7)
+        response = self.client.get(
+            reverse('profile', args=(self.user.username,))
+        )
+        self.assertContains(response, 'Записей: 7')
+        self.assertEqual(response.context['paginator'].count, 7)
+
+    def test_rebuild_command(self):
+        Post.objects.bulk_create(
+            Post(text='Тестовый текст', author=self.user, group=self.group)
+            for _ in range(4)
+        )
+        with self.assertRaises(CommandError):
+            call_command('rebuild_post_counters', '--check',
+                         stdout=StringIO())
+        call_command('rebuild_post_counters', stdout=StringIO())
+        self.assertEqual(self.counts(), (4, 4, 0))
+        call_command('rebuild_post_counters', '--check', stdout=StringIO())
@@ -0,0 +1,85 @@
+import csv
+import json
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import archive, exporter
+from posts.models import ArchivedPost, Group, Post
+
+
+class ExportTest(TestCase):
+    """Тестируем потоковую выгрузку постов."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = get_user_model()
+        cls.author = user.objects.create_user(username='test-author')
+        cls.other = user.objects.create_user(username='test-other')
+        cls.group = Group.objects.create(
+            title='test-group', slug='test_group',
+            description='test-description'
+        )
+        for i in range(5):
+            Post.objects.create(text=f'Пост {i}, "в кавычках"',
+                                author=cls.author, group=cls.group)
+        Post.objects.create(text='Чужой пост', author=cls.other)
+
+    def test_rows_in_chunks(self):
+        with self.assertNumQueries(3):
+            rows = list(exporter.iter_rows(Post.objects.all(), 3))
+        self.assertEqual([row[0] for row in rows],
+                         sorted(Post.objects.values_list('pk', flat=True)))
+
+    def test_chain_rows_merged_by_pk(self):
+        # Старые посты импортированы после свежих: id таблиц перемежаются
+        for post in Post.objects.filter(author=self.author)[::2]:
+            ArchivedPost.objects.create(
+                pk=post.pk, text=post.text, pub_date=post.pub_date,
+                author=post.author, group=post.group,
+            )
+            post.delete()
+        rows = exporter.iter_rows(
+            archive.chain(lambda model: model.objects.all()), 2
+        )
+        self.assertEqual([row[0] for row in rows], sorted(
+            list(Post.objects.values_list('pk', flat=True))
+            + list(ArchivedPost.objects.values_list('pk', flat=True))
+        ))
+
+    def test_command_ndjson(self):
+        out = StringIO()
+        call_command('export_posts', '--author', 'test-author', stdout=out)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[0]['author'], 'test-author')
+        self.assertEqual(records[0]['group'], 'test_group')
+        self.assertEqual(records[0]['text'], 'Пост 0, "в кавычках"')
+
+    def test_view_streams_csv_for_author(self):
+        client = Client()
+        client.force_login(self.author)
+        response = client.get(
+            reverse('profile_export', args=(self.author.username,)),
+            {'format': 'csv'},
+        )
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        content = b''.join(response.streaming_content).decode()
+        rows = list(csv.reader(StringIO(content)))
+        self.assertEqual(rows[0], list(exporter.HEADER))
+        self.assertEqual(len(rows), 6)
+
+    def test_view_forbidden_for_others(self):
+        url = reverse('profile_export', args=(self.author.username,))
+        response = Client().get(url)
+        self.assertEqual(response.status_code, 302)
+        client = Client()
+        client.force_login(self.other)
+        response = client.get(url)
+        self.assertRedirects(
+            response, reverse('profile', args=(self.author.username,))
+        )
@@ -0,0 +1,133 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts import tasks, timeline
+from posts.models import AuthorCounter, Follow, Post, TimelineEntry
+
+
+class FollowTest(TestCase):
+    """Тестируем подписки и материализованную ленту."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = get_user_model()
+        cls.reader = user.objects.create_user(username='test-reader')
+        cls.author = user.objects.create_user(username='test-author')
+        cls.star = user.objects.create_user(username='test-star')
+        for i in range(3):
+            Post.objects.create(text=f'Старый пост {i}', author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def follow(self, author):
+        return self.client.get(
+            reverse('profile_follow', args=(author.username,))
+        )
+
+    def feed(self):
+        response = self.client.get(reverse('follow_index'))
+        return [post.text for post in response.context['page']]
+
+    def test_follow_and_unfollow(self):
+        response = self.follow(self.author)
+        self.assertRedirects(
+            response, reverse('profile', args=(self.author.username,))
+        )
+        self.follow(self.author)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(
+            AuthorCounter.objects.get(author=self.author).followers_count, 1
+        )
+        self.assertEqual(
+            AuthorCounter.objects.get(author=self.reader).following_count, 1
+        )
+        response = self.client.get(
+            reverse('profile', args=(self.author.username,))
+        )
+        self.assertContains(response, 'Подписчиков: 1')
+        self.assertContains(response, 'Отписаться')
+        self.client.get(reverse('profile_unfollow',
+                                args=(self.author.username,)))
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(
+            AuthorCounter.objects.get(author=self.author).followers_count, 0
+        )
+
+    def test_cannot_follow_self(self):
+        self.client.get(reverse('profile_follow',
+                                args=(self.reader.username,)))
+        self.assertFalse(Follow.objects.exists())
+
+    def test_backfill_and_fan_out(self):
+        self.follow(self.author)
+        self.assertEqual(self.feed(), [f'Старый пост {i}'
+                                       for i in (2, 1, 0)])
+        Post.objects.create(text='Новый пост', author=self.author)
+        Post.objects.create(text='Чужой пост', author=self.star)
+        tasks.run_pending()
+        self.assertEqual(self.feed()[0], 'Новый пост')
+        self.assertNotIn('Чужой пост', self.feed())
+
+    def test_feed_is_single_range_read(self):
+        self.follow(self.author)
+        with self.assertNumQueries(2):
+            page = timeline.get_page(self.reader)
+            [post.author.username for post in page]
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_celebrity_posts_merged_on_read(self):
+        self.follow(self.star)
+        Post.objects.create(text='Пост звезды', author=self.star)
+        tasks.run_pending()
+        self.assertFalse(TimelineEntry.objects.filter(
+            post__author=self.star
+        ).exists())
+        with self.settings(TIMELINE_FANOUT_LIMIT=1000):
+            self.follow(self.author)
+        self.assertEqual(self.feed(), ['Пост звезды'] + [
+            f'Старый пост {i}' for i in (2, 1, 0)
+        ])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_former_celebrity_backfilled(self):
+        other = get_user_model().objects.create_user(username='test-other')
+        timeline.follow(other, self.star)
+        self.follow(self.star)
+        Post.objects.create(text='Пост звезды', author=self.star)
+        tasks.run_pending()
+        self.assertFalse(TimelineEntry.objects.filter(
+            owner=self.reader
+        ).exists())
+        timeline.unfollow(other, self.star)
+        tasks.run_pending()
+        self.assertEqual(list(TimelineEntry.objects.filter(
+            owner=self.reader
+        ).values_list('post__text', flat=True)), ['Пост звезды'])
+        self.assertEqual(self.feed(), ['Пост звезды'])
+
+    def test_cursor_and_trim(self):
+        self.follow(self.author)
+        first = timeline.get_page(self.reader, per_page=2)
+        second = timeline.get_page(self.reader, first.next_cursor, 2)
+        self.assertEqual([post.text for post in second], ['Старый пост 0'])
+        self.assertFalse(second.has_next())
+        self.assertEqual(timeline.trim(length=2), 1)
+        self.assertEqual(TimelineEntry.objects.count(), 2)
+
+    @override_settings(TIMELINE_LENGTH=2)
+    def test_fan_out_trims_timelines(self):
+        self.follow(self.author)
+        self.assertEqual(TimelineEntry.objects.count(), 2)
+        Post.objects.create(text='Новый пост', author=self.author)
+        tasks.run_pending()
+        self.assertEqual(
+            list(TimelineEntry.objects.order_by('-pub_date').values_list(
+                'post__text', flat=True
+            )),
+            ['Новый пост', 'Старый пост 2'],
+        )
+        self.assertEqual(timeline.trim(), 0)
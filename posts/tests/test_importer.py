@@ -0,0 +1,107 @@
+import datetime as dt
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase
+from posts import importer, search
+from posts.models import AuthorCounter, Group, Post
+
+
+class ImportPostsTest(TransactionTestCase):
+    """Тестируем команду массового импорта."""
+
+    def write(self, suffix, content):
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, 'w', encoding='utf-8') as stream:
+            stream.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def call(self, path, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_posts', path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_jsonl_import(self):
+        records = [
+            {'type': 'user', 'username': 'leo', 'first_name': 'Лев'},
+            {'type': 'group', 'slug': 'garden', 'title': 'Сад'},
+        ] + [
+            {'type': 'post', 'author': 'leo', 'group': 'garden',
+             'text': f'Пост про яблоки {i}',
+             'pub_date': f'2020-01-0{i + 1}T10:00:00+00:00'}
+            for i in range(5)
+        ] + [
+            {'type': 'post', 'author': 'nobody', 'text': 'Без автора'},
+        ]
+        path = self.write('.jsonl', '\n'.join(map(json.dumps, records)))
+        out, err = self.call(path, '--batch-size', '2',
+                             '--transaction-size', '3')
+        self.assertIn('пропущено: 1', out)
+        self.assertIn('неизвестный автор', err)
+        author = get_user_model().objects.get(username='leo')
+        self.assertFalse(author.has_usable_password())
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertEqual(
+            Post.objects.last().pub_date,
+            dt.datetime(2020, 1, 1, 10, tzinfo=dt.timezone.utc),
+        )
+        self.assertEqual(
+            AuthorCounter.objects.get(author=author).posts_count, 5
+        )
+        self.assertEqual(Group.objects.get(slug='garden').posts_count, 5)
+        self.assertEqual(len(search.search('яблоки')), 5)
+
+    def test_malformed_jsonl_lines_skipped(self):
+        path = self.write('.jsonl', '\n'.join([
+            json.dumps({'type': 'user', 'username': 'leo'}),
+            '{"type": "post", "author": "leo", "text": "Обрыв',
+            '[1, 2]',
+            json.dumps({'type': 'post', 'author': 'leo',
+                        'text': 'Груши'}),
+        ]))
+        out, err = self.call(path, '--transaction-size', '2')
+        self.assertIn('пропущено: 2', out)
+        self.assertIn('Запись 2: JSONDecodeError', err)
+        self.assertIn('запись не объект', err)
+        self.assertEqual(Post.objects.get().text, 'Груши')
+        self.assertEqual(AuthorCounter.objects.get().posts_count, 1)
+        self.assertEqual(len(search.search('груши')), 1)
+
+    def test_committed_chunks_reconciled_on_failure(self):
+        def records():
+            yield {'type': 'user', 'username': 'leo'}
+            yield {'type': 'post', 'author': 'leo', 'text': 'Сливы'}
+            raise OSError('Файл оборвался')
+
+        loader = importer.Importer(transaction_size=2)
+        with self.assertRaises(OSError):
+            loader.run(records())
+        self.assertEqual(AuthorCounter.objects.get().posts_count, 1)
+        self.assertEqual(len(search.search('сливы')), 1)
+
+    def test_csv_import_with_deferred_indexes(self):
+        get_user_model().objects.create_user(username='leo')
+        path = self.write('.csv', (
+            'type,username,slug,title,author,group,text,pub_date\n'
+            'group,,garden,Сад,,,,\n'
+            'post,,,,leo,garden,Первый,2020-01-01 10:00\n'
+            'post,,,,leo,,Второй,\n'
+        ))
+        self.call(path, '--defer-indexes')
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Post.objects.filter(group__slug='garden').count(),
+                         1)
+        with connection.cursor() as cursor:
+            names = {
+                index for index, info in connection.introspection
+                .get_constraints(cursor, Post._meta.db_table).items()
+                if info['index']
+            }
+        for index in Post._meta.indexes:
+            self.assertIn(index.name, names)
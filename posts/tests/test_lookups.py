@@ -0,0 +1,120 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import Http404
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts import lookups
+from posts.models import AuthorCounter, Group, Post
+
+
+class LookupCacheTest(TestCase):
+    """Тестируем кеш групп и пользователей в процессе."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = get_user_model()
+        cls.user = user.objects.create_user(username='test-author')
+        cls.group = Group.objects.create(
+            title='test-group', slug='test_group',
+            description='test-description'
+        )
+        Post.objects.create(text='Тестовый текст', author=cls.user,
+                            group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        lookups.clear()
+
+    def test_hot_path_skips_query(self):
+        for url in (reverse('group', args=(self.group.slug,)),
+                    reverse('profile', args=(self.user.username,))):
+            with self.subTest(url=url):
+                cache.clear()
+                with self.assertNumQueries(3):
+                    Client().get(url)
+                # Другой путь страницы: мимо кеша страниц, но не лукапов
+                with self.assertNumQueries(2):
+                    Client().get(url, {'page': 1})
+
+    def test_instances_are_not_shared(self):
+        first = lookups.user_by_username(self.user.username)
+        first.first_name = 'Измененное'
+        second = lookups.user_by_username(self.user.username)
+        self.assertEqual(second.first_name, '')
+        self.assertIsNot(first, second)
+
+    def test_missing_is_404(self):
+        with self.assertRaises(Http404):
+            lookups.group_by_slug('no-such-group')
+        with self.assertRaises(Http404):
+            lookups.user_by_username('no-such-user')
+
+    def test_rename_and_delete_invalidate(self):
+        lookups.group_by_slug(self.group.slug)
+        self.group.refresh_from_db()
+        self.group.slug = 'renamed'
+        self.group.save()
+        with self.assertRaises(Http404):
+            lookups.group_by_slug('test_group')
+        self.assertEqual(lookups.group_by_slug('renamed').pk, self.group.pk)
+        lookups.user_by_username(self.user.username)
+        self.user.delete()
+        with self.assertRaises(Http404):
+            lookups.user_by_username('test-author')
+
+    def test_counters_invalidate(self):
+        author = lookups.user_by_username(self.user.username)
+        self.assertEqual(author.post_counter.posts_count, 1)
+        self.assertEqual(lookups.group_by_slug('test_group').posts_count, 1)
+        Post.objects.create(text='Еще текст', author=self.user,
+                            group=self.group)
+        author = lookups.user_by_username(self.user.username)
+        self.assertEqual(author.post_counter.posts_count, 2)
+        self.assertEqual(lookups.group_by_slug('test_group').posts_count, 2)
+
+    @override_settings(LOOKUP_CACHE_SIZE=1)
+    def test_lru_bound(self):
+        lookups.group_by_slug('test_group')
+        lookups.user_by_username('test-author')
+        Group.objects.create(title='Другая', slug='other', description='-')
+        lookups.group_by_slug('other')
+        self.assertEqual(len(lookups.groups.entries), 1)
+        with self.assertNumQueries(1):
+            lookups.group_by_slug('test_group')
+
+    @override_settings(LOOKUP_CACHE_SHARED=True)
+    def test_shared_tier(self):
+        lookups.group_by_slug('test_group')
+        lookups.clear()
+        with self.assertNumQueries(0):
+            lookups.group_by_slug('test_group')
+        Group.objects.filter(pk=self.group.pk).update(title='Новое')
+        lookups.forget_group(self.group.pk)
+        lookups.clear()
+        self.assertEqual(lookups.group_by_slug('test_group').title, 'Новое')
+
+    def test_forget_in_other_process(self):
+        lookups.user_by_username(self.user.username)
+        AuthorCounter.objects.filter(author=self.user).update(posts_count=5)
+        # Сброс в другом процессе виден через общий кеш Django
+        lookups.LocalCache('user', lookups.users.build).forget(self.user.pk)
+        author = lookups.user_by_username(self.user.username)
+        self.assertEqual(author.post_counter.posts_count, 5)
+
+    def test_without_counter_and_secrets(self):
+        reader = get_user_model().objects.create_user(
+            username='test-reader', password='test-password'
+        )
+        with self.settings(LOOKUP_CACHE_SHARED=True):
+            user = lookups.user_by_username(reader.username)
+            shared = cache.get(lookups.users.shared_key(reader.username))
+        self.assertEqual(set(shared), {
+            'id', 'username', 'first_name', 'last_name',
+            'post_counter__posts_count', 'post_counter__followers_count',
+            'post_counter__following_count',
+        })
+        with self.assertNumQueries(0):
+            with self.assertRaises(AuthorCounter.DoesNotExist):
+                user.post_counter
+        self.assertTrue(user.check_password('test-password'))
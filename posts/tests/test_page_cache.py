@@ -0,0 +1,102 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Group, Post
+
+
+class AnonymousPageCacheTest(TestCase):
+    """Тестируем кеш страниц лент для анонимных пользователей."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = get_user_model()
+        cls.author = user.objects.create_user(username='test-author')
+        cls.other = user.objects.create_user(username='test-other')
+        cls.group = Group.objects.create(
+            title='test-group', slug='test_group',
+            description='test-description'
+        )
+        cls.group_two = Group.objects.create(
+            title='test-group-2', slug='test_group_2',
+            description='test-description'
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый текст', author=cls.author, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+
+    def urls(self):
+        return {
+            'index': reverse('index'),
+            'group': reverse('group', args=(self.group.slug,)),
+            'group_two': reverse('group', args=(self.group_two.slug,)),
+            'author': reverse('profile', args=(self.author.username,)),
+            'other': reverse('profile', args=(self.other.username,)),
+            'post': reverse('post', args=(self.author.username,
+                                          self.post.id)),
+        }
+
+    def cached(self):
+        """Какие страницы отдаются из кеша (без рендера шаблона)."""
+        result = {}
+        for name, url in self.urls().items():
+            response = self.guest_client.get(url)
+            result[name] = response.context is None
+        return result
+
+    def test_second_hit_is_cached(self):
+        self.cached()
+        self.assertTrue(all(self.cached().values()))
+
+    def test_authorized_not_cached(self):
+        for _ in range(2):
+            response = self.authorized_client.get(reverse('index'))
+        self.assertIsNotNone(response.context)
+
+    def test_page_parameter_in_key(self):
+        self.guest_client.get(reverse('index'))
+        response = self.guest_client.get(reverse('index'), {'page': 2})
+        self.assertIsNotNone(response.context)
+
+    def test_new_post_bumps_only_affected_feeds(self):
+        self.cached()
+        self.authorized_client.post(
+            reverse('new_post'),
+            data={'text': 'Новый пост', 'group': self.group_two.id},
+        )
+        self.assertEqual(self.cached(), {
+            'index': False,
+            'group': True,
+            'group_two': False,
+            'author': False,
+            'other': True,
+            'post': False,
+        })
+        response = self.guest_client.get(reverse('index'))
+        self.assertContains(response, 'Новый пост')
+
+    def test_post_edit_moving_group_bumps_both_groups(self):
+        self.cached()
+        self.authorized_client.post(
+            reverse('post_edit', args=(self.author.username, self.post.id)),
+            data={'text': 'Измененный текст', 'group': self.group_two.id},
+        )
+        cached = self.cached()
+        self.assertFalse(cached['group'])
+        self.assertFalse(cached['group_two'])
+        self.assertTrue(cached['other'])
+
+    def test_delete_bumps_feeds(self):
+        self.cached()
+        Post.objects.filter(pk=self.post.pk).delete()
+        cached = self.cached()
+        self.assertFalse(cached['index'])
+        self.assertFalse(cached['group'])
+        self.assertTrue(cached['group_two'])
@@ -0,0 +1,145 @@
+import datetime as dt
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from posts.models import Post
+from posts.paginators import CursorPaginator, encode_cursor, page_window
+
+
+class CursorPaginatorTest(TestCase):
+    """Тестируем курсорную пагинацию."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = get_user_model()
+        cls.user = user.objects.create_user(username='test-author')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.user) for i in range(25)
+        )
+        # Часть постов с одинаковой датой, чтобы проверить id-тайбрейк
+        now = timezone.now()
+        for i, post in enumerate(Post.objects.order_by('id')):
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=now - dt.timedelta(minutes=i // 3)
+            )
+        cls.expected = list(Post.objects.values_list('pk', flat=True))
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, token=None):
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        pages = []
+        while True:
+            page = paginator.get_page(token)
+            pages.append(page)
+            if not page.has_next():
+                return pages
+            token = page.next_cursor
+
+    def test_forward_walk_matches_ordering(self):
+        """Проход вперед по курсорам отдает все посты по порядку."""
+        pages = self.walk()
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(
+            [post.pk for page in pages for post in page], self.expected
+        )
+        self.assertFalse(pages[0].has_previous())
+        self.assertTrue(pages[-1].has_previous())
+
+    def test_backward_walk(self):
+        """Ссылка «Предыдущая» возвращает на ту же страницу."""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        pages = self.walk()
+        back = paginator.get_page(pages[2].previous_cursor)
+        self.assertEqual(list(back), list(pages[1]))
+        first = paginator.get_page(back.previous_cursor)
+        self.assertEqual(list(first), list(pages[0]))
+        self.assertFalse(first.has_previous())
+
+    def test_broken_cursor_returns_first_page(self):
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        page = paginator.get_page('не-курсор')
+        self.assertEqual([post.pk for post in page], self.expected[:10])
+
+    def test_cursor_page_without_count(self):
+        """Курсорная страница ленты не делает COUNT(*) и OFFSET."""
+        post = Post.objects.get(pk=self.expected[19])
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        with self.assertNumQueries(1):
+            paginator.get_page(encode_cursor(post))
+        response = Client().get(
+            reverse('index'), {'cursor': encode_cursor(post)}
+        )
+        self.assertEqual(
+            [item.pk for item in response.context['page']],
+            self.expected[20:],
+        )
+
+    def test_numbered_page_links_to_cursor(self):
+        """Старые ссылки ?page=N работают и ведут дальше по курсору."""
+        client = Client()
+        response = client.get(reverse('index'), {'page': 2})
+        page = response.context['page']
+        self.assertEqual(page.number, 2)
+        self.assertEqual(
+            [post.pk for post in page], self.expected[10:20]
+        )
+        response = client.get(
+            reverse('index'), {'cursor': page.next_cursor}
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['page']],
+            self.expected[20:],
+        )
+
+
+class PageWindowTest(TestCase):
+    """Тестируем окно номеров страниц и кешированное число постов."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = get_user_model()
+        cls.user = user.objects.create_user(username='test-author')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.user) for i in range(300)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_page_window(self):
+        self.assertEqual(page_window(1, 1), [1])
+        self.assertEqual(page_window(1, 4), [1, 2, 3, 4])
+        self.assertEqual(page_window(13, 50),
+                         [1, None, 11, 12, 13, 14, 15, None, 50])
+        self.assertEqual(page_window(2, 50), [1, 2, 3, 4, None, 50])
+
+    def test_navigation_is_bounded(self):
+        response = self.client.get(reverse('index'), {'page': 15})
+        self.assertEqual(response.context['page'].window,
+                         [1, None, 13, 14, 15, 16, 17, None, 30])
+        # «Предыдущая» и шесть номеров, текущая страница без ссылки
+        self.assertContains(response, '?page=', count=7)
+
+    def test_index_count_is_cached(self):
+        self.client.get(reverse('index'))
+        Post.objects.create(text='Новый пост', author=self.user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['paginator'].count, 300)
+        self.assertEqual(response.context['page'][0].text, 'Новый пост')
+        self.assertFalse([query for query in context.captured_queries
+                          if 'COUNT(*)' in query['sql']])
+        cache.clear()
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.context['paginator'].count, 301)
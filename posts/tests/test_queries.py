@@ -0,0 +1,153 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts import counters, timeline
+from posts.models import Group, Post
+
+DATA_SIZES = (10, 1000, 10000)
+AUTHORS = 20
+
+
+class QueryBudgetTest(TestCase):
+    """Число запросов на страницу не зависит от объема данных."""
+
+    # Верхние границы числа запросов (сессия и пользователь входят)
+    budgets = {
+        'index': 5,
+        'group': 6,
+        'profile': 7,
+        'post': 4,
+        'post_edit': 4,
+        'admin': 5,
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = get_user_model()
+        cls.authors = user.objects.bulk_create(
+            user(username=f'author-{i}', first_name='Имя',
+                 last_name=f'Фамилия {i}')
+            for i in range(AUTHORS)
+        )
+        cls.author = user.objects.get(username='author-0')
+        cls.admin = user.objects.create_superuser(
+            username='admin', email='admin@example.com', password='123456'
+        )
+        cls.group = Group.objects.create(
+            title='test-group', slug='test_group',
+            description='test-description'
+        )
+        cls.groups = Group.objects.bulk_create(
+            Group(title=f'group-{i}', slug=f'group-{i}', description='-')
+            for i in range(5)
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.admin_client = Client()
+        self.admin_client.force_login(self.admin)
+
+    def seed(self, total):
+        """Догружаем посты до total штук."""
+        authors = list(get_user_model().objects.filter(
+            username__startswith='author-'
+        ))
+        groups = [self.group] + list(Group.objects.exclude(pk=self.group.pk))
+        start = Post.objects.count()
+        Post.objects.bulk_create(
+            (Post(text=f'Пост {i}',
+                  author=authors[i % len(authors)],
+                  group=groups[i % len(groups)])
+             for i in range(start, total)),
+            batch_size=500,
+        )
+        counters.rebuild()
+
+    def count_queries(self, client, url):
+        # Меряем холодный путь: закешированное число постов не в счет
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def urls(self):
+        post = self.author.posts.order_by('id').first()
+        return {
+            'index': (self.client, reverse('index')),
+            'group': (self.client,
+                      reverse('group', kwargs={'slug': self.group.slug})),
+            'profile': (self.client,
+                        reverse('profile', args=(self.author.username,))),
+            'post': (self.client,
+                     reverse('post', args=(self.author.username, post.id))),
+            'post_edit': (self.client,
+                          reverse('post_edit',
+                                  args=(self.author.username, post.id))),
+            'admin': (self.admin_client,
+                      reverse('admin:posts_post_changelist')),
+        }
+
+    def test_query_count_does_not_grow_with_data(self):
+        counts = {}
+        for size in DATA_SIZES:
+            self.seed(size)
+            for name, (client, url) in self.urls().items():
+                counts.setdefault(name, []).append(
+                    self.count_queries(client, url)
+                )
+        for name, by_size in counts.items():
+            with self.subTest(view=name):
+                self.assertEqual(len(set(by_size)), 1,
+                                 f'{name}: запросов {by_size} '
+                                 f'на {DATA_SIZES} постов')
+                self.assertLessEqual(by_size[0], self.budgets[name])
+
+
+class PostDetailQueryTest(TestCase):
+    """Страница поста: проверка версии и один запрос за всеми данными."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = get_user_model()
+        cls.author = user.objects.create_user(username='author')
+        cls.reader = user.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='test-group', slug='test_group',
+            description='test-description'
+        )
+        cls.post = Post.objects.create(text='Тестовый текст',
+                                       author=cls.author, group=group)
+        cls.url = reverse('post', args=(cls.author.username, cls.post.id))
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, client, queries):
+        with self.assertNumQueries(queries):
+            response = client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_anonymous(self):
+        # post_state и сам пост с автором, счетчиками и группой
+        response = self.get(Client(), 2)
+        self.assertContains(response, 'Тестовый текст')
+        self.assertContains(response, 'Записей: 1')
+
+    def test_logged_in(self):
+        # Сессия и пользователь, post_state, пост вместе с подпиской
+        client = Client()
+        client.force_login(self.reader)
+        response = self.get(client, 4)
+        self.assertFalse(response.context['following'])
+        timeline.follow(self.reader, self.author)
+        response = self.get(client, 4)
+        self.assertTrue(response.context['following'])
+        self.assertContains(response, 'Подписчиков: 1')
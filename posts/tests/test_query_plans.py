@@ -0,0 +1,66 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts import counters
+from posts.models import Group, Post
+from posts.paginators import encode_cursor
+
+FULL_SCAN = re.compile(r'SCAN (TABLE )?posts_post\b(?! USING)')
+TEMP_SORT = re.compile(r'USE TEMP B-TREE')
+
+
+class QueryPlanTest(TestCase):
+    """Запросы лент к posts_post идут по индексам, без полного
+    сканирования таблицы и без сортировки во временном B-tree."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = get_user_model()
+        cls.author = user.objects.create_user(username='test-author')
+        cls.group = Group.objects.create(
+            title='test-group', slug='test_group',
+            description='test-description'
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.author,
+                 group=cls.group if i % 2 else None)
+            for i in range(30)
+        )
+        counters.rebuild()
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def feed_queries(self, url, params=None):
+        """SQL-запросы к posts_post, выполненные view."""
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = Client().get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in context.captured_queries
+                if 'FROM "posts_post"' in query['sql']]
+
+    def test_feed_plans_use_indexes(self):
+        post = Post.objects.all()[15]
+        urls = {
+            'index': reverse('index'),
+            'group': reverse('group', kwargs={'slug': self.group.slug}),
+            'profile': reverse('profile', args=(self.author.username,)),
+            'post': reverse('post', args=(self.author.username, post.id)),
+        }
+        for name, url in urls.items():
+            for params in (None, {'page': 2},
+                           {'cursor': encode_cursor(post)}):
+                for sql in self.feed_queries(url, params):
+                    plan = '\n'.join(self.explain(sql))
+                    with self.subTest(view=name, params=params, sql=sql):
+                        self.assertIsNone(FULL_SCAN.search(plan), plan)
+                        self.assertIsNone(TEMP_SORT.search(plan), plan)
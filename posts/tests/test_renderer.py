@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.template.loader import render_to_string
+from django.test import TestCase
+from django.urls import set_script_prefix
+from posts import renderer
+from posts.models import Post
+
+
+class RendererTest(TestCase):
+    """Карточки за один проход совпадают с include post_main.html."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = get_user_model()
+        authors = [
+            user.objects.create_user(username='test-author'),
+            user.objects.create_user(
+                username='ёжик', first_name='<b>Лев</b>',
+                last_name='"Толстой" & Ко',
+            ),
+        ]
+        for i, text in enumerate(('Текст', '<script>alert(1)</script>',
+                                  "Кавычки ' \" и {скобки}")):
+            Post.objects.create(text=text, author=authors[i % 2])
+
+    def tearDown(self):
+        set_script_prefix('/')
+
+    def assertSameHtml(self):
+        posts = list(Post.objects.select_related('author'))
+        self.assertEqual(
+            renderer.render_cards(posts),
+            [render_to_string('post_main.html', {'post': post})
+             for post in posts],
+        )
+
+    def test_same_html(self):
+        self.assertSameHtml()
+
+    def test_same_html_under_script_prefix(self):
+        set_script_prefix('/yatube/')
+        self.assertSameHtml()
@@ -0,0 +1,99 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Post
+from yatube.replicas import PIN_COOKIE, ReplicaRouter, pin_to_primary
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaRouterTest(TestCase):
+    """Тестируем чтение лент с реплики."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = get_user_model()
+        cls.user = user.objects.create_user(username='test-author')
+        Post.objects.create(text='Тестовый текст', author=cls.user)
+
+    def setUp(self):
+        # Реплика-зеркало: то же соединение, что и у default,
+        # как делает тестовый раннер для TEST['MIRROR']
+        connections.databases['replica'] = connections.databases['default']
+        connections['replica'] = connections['default']
+        self.addCleanup(connections.databases.pop, 'replica')
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def feed_db(self, client=None):
+        response = (client or self.client).get(reverse('index'))
+        return response.context['page'][0]._state.db
+
+    def test_reads_outside_requests_use_primary(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Post), 'default')
+        self.assertEqual(router.db_for_write(Post), 'default')
+        with pin_to_primary():
+            self.assertEqual(router.db_for_read(Post), 'default')
+
+    def test_feed_reads_from_replica(self):
+        self.assertEqual(self.feed_db(), 'replica')
+        self.assertEqual(self.feed_db(Client()), 'replica')
+
+    def test_author_sticks_to_primary_after_write(self):
+        response = self.client.post(reverse('new_post'),
+                                    data={'text': 'Новый пост'})
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(self.feed_db(), 'default')
+        self.client.cookies.pop(PIN_COOKIE)
+        self.assertEqual(self.feed_db(), 'replica')
+
+    def test_edit_and_admin_read_primary(self):
+        post = Post.objects.first()
+        response = self.client.get(
+            reverse('post_edit', args=(self.user.username, post.id))
+        )
+        self.assertEqual(response.context['form'].instance._state.db,
+                         'default')
+        self.user.is_staff = self.user.is_superuser = True
+        self.user.save()
+        self.client.cookies.pop(PIN_COOKIE, None)
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertEqual(
+            response.context['cl'].result_list[0]._state.db, 'default'
+        )
+
+    def test_logout_then_feed_reads_sessions_from_primary(self):
+        reads = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            db = db_for_read(router, model, **hints)
+            reads.append((model._meta.label, db))
+            return db
+
+        session = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        self.client.get(reverse('logout'))
+        # Пин истек, а клиент прислал старую куку сессии
+        self.client.cookies.pop(PIN_COOKIE, None)
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session
+        with mock.patch.object(ReplicaRouter, 'db_for_read', spy):
+            response = self.client.get(reverse('index'))
+        self.assertTrue(response.context['user'].is_anonymous)
+        self.assertIn(('sessions.Session', 'default'), reads)
+        self.assertIn(('posts.Post', 'replica'), reads)
+        self.client.force_login(self.user)
+        reads.clear()
+        with mock.patch.object(ReplicaRouter, 'db_for_read', spy):
+            response = self.client.get(reverse('index'))
+        self.assertTrue(response.context['user'].is_authenticated)
+        self.assertIn(('auth.User', 'default'), reads)
+        self.assertNotIn('replica', {db for label, db in reads
+                                     if label in ('sessions.Session',
+                                                  'auth.User')})
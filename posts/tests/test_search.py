@@ -0,0 +1,97 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import search, tasks
+from posts.models import Group, Post
+
+
+class SearchTest(TestCase):
+    """Тестируем полнотекстовый поиск по постам."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = get_user_model()
+        cls.user = user.objects.create_superuser(
+            username='test-author', email='a@example.com', password='123456'
+        )
+        cls.group = Group.objects.create(
+            title='Садоводы', slug='gardeners',
+            description='Все о грядках'
+        )
+        cls.tomato = Post.objects.create(
+            text='Помидоры созрели, помидоры красные', author=cls.user,
+            group=cls.group
+        )
+        cls.cucumber = Post.objects.create(
+            text='Огурцы и помидоры в теплице', author=cls.user
+        )
+        cls.other = Post.objects.create(
+            text='Про погоду', author=cls.user
+        )
+        tasks.run_pending()
+
+    def ids(self, query, token=None, per_page=10):
+        return [post.pk for post in search.search(query, token, per_page)]
+
+    def test_build_query_escapes_syntax(self):
+        self.assertEqual(search.build_query('огурцы OR "NEAR(x'),
+                         '"огурцы" "OR" "NEAR" "x"')
+        self.assertEqual(search.build_query('помид*'), '"помид"*')
+
+    def test_ranked_search(self):
+        """Пост с двумя вхождениями выше поста с одним."""
+        self.assertEqual(self.ids('помидоры'),
+                         [self.tomato.pk, self.cucumber.pk])
+
+    def test_prefix_and_group_text(self):
+        self.assertEqual(self.ids('огур*'), [self.cucumber.pk])
+        self.assertEqual(self.ids('грядках'), [self.tomato.pk])
+        self.assertEqual(self.ids('огур'), [])
+
+    def test_cursor_pagination(self):
+        page = search.search('помидоры', per_page=1)
+        self.assertEqual([post.pk for post in page], [self.tomato.pk])
+        self.assertEqual(self.ids('помидоры', page.next_cursor, 1),
+                         [self.cucumber.pk])
+
+    def test_index_follows_writes(self):
+        self.other.text = 'Про редиску'
+        self.other.save()
+        tasks.run_pending()
+        self.assertEqual(self.ids('редиску'), [self.other.pk])
+        self.group.title = 'Огородники'
+        self.group.save()
+        # Группа переиндексируется в фоне, а не в save()
+        self.assertEqual(self.ids('огородники'), [])
+        tasks.run_pending()
+        self.assertEqual(self.ids('огородники'), [self.tomato.pk])
+        self.group.title = 'Садоводы'
+        self.group.save()
+        self.group.delete()
+        tasks.run_pending()
+        self.assertEqual(self.ids('огородники'), [])
+        self.assertEqual(self.ids('садоводы'), [])
+        self.other.delete()
+        tasks.run_pending()
+        self.assertEqual(self.ids('редиску'), [])
+
+    def test_rebuild_command(self):
+        Post.objects.bulk_create([
+            Post(text='Кабачки без сигналов', author=self.user)
+        ])
+        self.assertEqual(self.ids('кабачки'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.ids('кабачки')), 1)
+
+    def test_search_view_and_admin(self):
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('search'), {'q': 'огурцы'})
+        self.assertEqual(list(response.context['page']), [self.cucumber])
+        response = client.get(reverse('admin:posts_post_changelist'),
+                              {'q': 'помидоры'})
+        self.assertEqual(response.context['cl'].result_count, 2)
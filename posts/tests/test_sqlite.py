@@ -0,0 +1,53 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from yatube.sqlite.retry import retry_on_lock
+
+
+class SqliteProfileTest(TestCase):
+    """Тестируем продакшен-профиль SQLite."""
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connection_pragmas(self):
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('cache_size'), -64 * 1024)
+
+
+@override_settings(SQLITE_LOCK_RETRIES=2, SQLITE_LOCK_BACKOFF=0)
+class RetryOnLockTest(SimpleTestCase):
+
+    def test_retries_locked_write(self):
+        write = mock.Mock(side_effect=[
+            OperationalError('database is locked'), 'ok'
+        ])
+        self.assertEqual(retry_on_lock(write)(), 'ok')
+        self.assertEqual(write.call_count, 2)
+
+    def test_gives_up_and_skips_other_errors(self):
+        write = mock.Mock(side_effect=OperationalError('database is locked'))
+        with self.assertRaises(OperationalError):
+            retry_on_lock(write)()
+        self.assertEqual(write.call_count, 3)
+        write = mock.Mock(side_effect=OperationalError('no such table'))
+        with self.assertRaises(OperationalError):
+            retry_on_lock(write)()
+        self.assertEqual(write.call_count, 1)
+
+
+class BenchmarkCommandTest(SimpleTestCase):
+    databases = '__all__'
+
+    def test_benchmark_runs_both_profiles(self):
+        out = StringIO()
+        call_command('benchmark_sqlite', '--seconds', '0.2', '--threads',
+                     '2', '--rows', '100', stdout=out)
+        self.assertIn('stock', out.getvalue())
+        self.assertIn('production', out.getvalue())
@@ -0,0 +1,57 @@
+import datetime as dt
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TransactionTestCase
+from django.utils import timezone
+from posts import counters, search
+from posts.models import Group, Post
+from posts.synthetic import Generator
+
+END = dt.datetime(2021, 1, 1, tzinfo=timezone.utc)
+
+
+class SyntheticDataTest(TransactionTestCase):
+    """Тестируем генератор синтетических данных."""
+
+    def snapshot(self):
+        return list(Post.objects.order_by('id').values_list(
+            'text', 'pub_date', 'author__last_name', 'group__title'
+        ))
+
+    def clear(self):
+        get_user_model().objects.all().delete()
+        Group.objects.all().delete()
+
+    def test_same_seed_same_data(self):
+        Generator(500, seed=7, end=END).run()
+        first = self.snapshot()
+        self.clear()
+        Generator(500, seed=7, end=END).run()
+        self.assertEqual(self.snapshot(), first)
+        self.clear()
+        Generator(500, seed=8, end=END).run()
+        self.assertNotEqual(self.snapshot(), first)
+
+    def test_shape_of_data(self):
+        Generator(2000, seed=1, end=END, authors=50).run()
+        self.assertEqual(Post.objects.count(), 2000)
+        self.assertEqual(counters.find_mismatches(), [])
+        self.assertEqual(len(search.search('музыка')), 10)
+        dates = list(Post.objects.order_by('id').values_list(
+            'pub_date', flat=True
+        ))
+        self.assertEqual(dates, sorted(dates))
+        self.assertLessEqual(dates[-1], END)
+        # Популярность по Ципфу: первый автор пишет больше всех
+        top = Post.objects.filter(author__last_name='№0').count()
+        last = Post.objects.filter(author__last_name='№49').count()
+        self.assertGreater(top, 10 * last)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('seed_posts', '--size', '300', '--seed', '3',
+                     '--end', '2021-01-01', '--skip-search', stdout=out)
+        self.assertIn('Создано 300 постов', out.getvalue())
+        self.assertEqual(Post.objects.count(), 300)
@@ -0,0 +1,132 @@
+import datetime as dt
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from posts import search, tasks
+from posts.models import Post, Task
+
+calls = []
+
+
+@tasks.handler('test.record')
+def record(payloads):
+    calls.append(payloads)
+    if any(payload.get('fail') for payload in payloads):
+        raise ValueError('Сломанная задача')
+
+
+class TaskQueueTest(TestCase):
+    """Тестируем очередь задач после записи."""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_write_returns_before_side_effects(self):
+        user = get_user_model().objects.create_user(username='test-author')
+        post = Post.objects.create(text='Кабачки в очереди', author=user)
+        self.assertEqual(
+            set(Task.objects.values_list('name', flat=True)),
+            {search.INDEX_TASK, 'timeline.fan_out'}
+        )
+        self.assertEqual(list(search.search('кабачки')), [])
+        tasks.run_pending()
+        self.assertEqual(list(search.search('кабачки')), [post])
+        self.assertFalse(Task.objects.exists())
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager(self):
+        tasks.enqueue('test.record', {'n': 1})
+        self.assertEqual(calls, [[{'n': 1}]])
+        self.assertFalse(Task.objects.exists())
+
+    def test_idempotency_key(self):
+        tasks.enqueue('test.record', {'n': 1}, key='same')
+        tasks.enqueue('test.record', {'n': 2}, key='same')
+        self.assertEqual(Task.objects.count(), 1)
+        claimed = tasks.claim(10)
+        # Захваченная задача могла прочитать старые данные, новая нужна
+        tasks.enqueue('test.record', {'n': 3}, key='same')
+        self.assertEqual(Task.objects.count(), 2)
+        tasks.run(claimed)
+        tasks.run_pending()
+        self.assertEqual(calls, [[{'n': 1}], [{'n': 3}]])
+
+    def test_batching(self):
+        for n in range(5):
+            tasks.enqueue('test.record', {'n': n})
+        tasks.run_pending()
+        self.assertEqual(calls, [[{'n': n} for n in range(5)]])
+        self.assertFalse(Task.objects.exists())
+
+    def test_failing_task_does_not_block_batch(self):
+        tasks.enqueue('test.record', {'n': 1})
+        tasks.enqueue('test.record', {'fail': True})
+        with self.assertLogs('yatube.tasks', 'WARNING'):
+            result = tasks.run(tasks.claim(10))
+        self.assertEqual((result['done'], result['failed']), (1, 1))
+        task = Task.objects.get()
+        self.assertEqual(task.attempts, 1)
+        self.assertIsNone(task.locked_by)
+        self.assertGreater(task.run_at, timezone.now())
+        self.assertIn('Сломанная задача', task.last_error)
+        self.assertEqual(tasks.claim(10), [])
+
+    @override_settings(TASK_MAX_ATTEMPTS=3, TASK_RETRY_BACKOFF=0)
+    def test_gives_up_after_max_attempts(self):
+        tasks.enqueue('test.record', {'fail': True}, key='broken')
+        with self.assertLogs('yatube.tasks', 'WARNING'):
+            tasks.run_pending()
+        task = Task.objects.get()
+        self.assertTrue(task.failed)
+        self.assertEqual(task.attempts, 3)
+        self.assertEqual(len(calls), 3)
+        # Проваленная задача не мешает поставить новую с тем же ключом
+        tasks.enqueue('test.record', {'n': 1}, key='broken')
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_retry_yields_to_newer_task(self):
+        tasks.enqueue('test.record', {'fail': True}, key='same')
+        claimed = tasks.claim(10)
+        tasks.enqueue('test.record', {'n': 1}, key='same')
+        with self.assertLogs('yatube.tasks', 'WARNING'):
+            tasks.run(claimed)
+        self.assertEqual(list(Task.objects.values_list('payload', flat=True)),
+                         ['{"n": 1}'])
+
+    def test_lease(self):
+        tasks.enqueue('test.record', {'n': 1})
+        first = tasks.claim(10)
+        self.assertEqual(len(first), 1)
+        self.assertEqual(tasks.claim(10), [])
+        # Воркер умер: по истечении аренды задачу забирает другой
+        Task.objects.update(
+            locked_until=timezone.now() - dt.timedelta(seconds=1)
+        )
+        second = tasks.claim(10)
+        self.assertEqual(len(second), 1)
+        self.assertEqual(second[0].attempts, 2)
+        # Опоздавший воркер не удаляет чужую задачу
+        tasks.run(first)
+        self.assertTrue(Task.objects.exists())
+        tasks.run(second)
+        self.assertFalse(Task.objects.exists())
+
+    def test_stats_and_command(self):
+        tasks.enqueue('test.record', {'n': 1})
+        Task.objects.update(
+            created=timezone.now() - dt.timedelta(seconds=30)
+        )
+        stats = tasks.stats()
+        self.assertEqual((stats['waiting'], stats['running'],
+                          stats['failed']), (1, 0, 0))
+        self.assertGreaterEqual(stats['lag'], 30)
+        out = StringIO()
+        call_command('run_tasks', '--stats', stdout=out)
+        self.assertIn('Ждут: 1', out.getvalue())
+        out = StringIO()
+        call_command('run_tasks', '--once', stdout=out)
+        self.assertIn('Выполнено: 1, с ошибкой: 0', out.getvalue())
+        self.assertEqual(tasks.stats()['lag'], 0.0)
@@ -0,0 +1,96 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Post
+from yatube import throttle
+
+
+@override_settings(WRITE_THROTTLE_RATES={'user': (1, 2),
+                                         'global': (10, 3)})
+class ThrottleTest(TestCase):
+    """Тестируем ограничение частоты записей."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = get_user_model()
+        cls.author = user.objects.create_user(username='test-author')
+        cls.other = user.objects.create_user(username='test-other')
+
+    def setUp(self):
+        throttle.reset()
+        cache.clear()
+        self.now = 1000.0
+        patcher = mock.patch('yatube.throttle.time.time',
+                             lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, user, text='Текст'):
+        client = Client()
+        client.force_login(user)
+        return client.post(reverse('new_post'), {'text': text})
+
+    def assertThrottled(self, response, retry_after):
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], str(retry_after))
+
+    def test_user_bucket(self):
+        for _ in range(2):
+            self.assertEqual(self.post(self.author).status_code, 302)
+        with self.assertLogs('yatube.throttle', 'WARNING'):
+            response = self.post(self.author)
+        self.assertThrottled(response, 1)
+        self.assertEqual(Post.objects.count(), 2)
+        self.now += 1
+        self.assertEqual(self.post(self.author).status_code, 302)
+
+    def test_global_bucket(self):
+        self.post(self.author)
+        self.post(self.author)
+        self.assertEqual(self.post(self.other).status_code, 302)
+        with self.assertLogs('yatube.throttle', 'WARNING'):
+            self.assertThrottled(self.post(self.other), 1)
+        self.assertEqual(throttle.stats()['local'], {
+            'admitted': 3, 'throttled_user': 0, 'throttled_global': 1,
+        })
+
+    def test_rejected_write_keeps_other_tokens(self):
+        self.post(self.author)
+        self.post(self.author)
+        with self.assertLogs('yatube.throttle', 'WARNING'):
+            self.post(self.author)
+        # Отказ по ведру пользователя не тратит маркер общего ведра
+        self.assertEqual(self.post(self.other).status_code, 302)
+
+    def test_reads_not_throttled(self):
+        client = Client()
+        client.force_login(self.author)
+        for _ in range(5):
+            self.assertEqual(
+                client.get(reverse('new_post')).status_code, 200
+            )
+
+    def test_local_buckets_pruned(self):
+        with mock.patch('yatube.throttle.LOCAL_BUCKETS', 1):
+            throttle.acquire({'user:1': (1, 2)}, now=0)
+            throttle.acquire({'user:2': (1, 2)}, now=10)
+        self.assertEqual(list(throttle._buckets), ['user:2'])
+
+    @override_settings(WRITE_THROTTLE_SHARED=True)
+    def test_shared_backend(self):
+        self.post(self.author)
+        self.post(self.author)
+        # Другой процесс видит те же ведра через кеш
+        throttle.reset()
+        with self.assertLogs('yatube.throttle', 'WARNING'):
+            self.assertThrottled(self.post(self.author), 1)
+        out = StringIO()
+        call_command('throttle_stats', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'admitted: 2, '
+                         'throttled_user: 1, throttled_global: 0')
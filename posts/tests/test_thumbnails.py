@@ -0,0 +1,232 @@
+import hashlib
+import io
+import json
+import shutil
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template.loader import render_to_string
+from django.db import OperationalError
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.urls import reverse
+from PIL import Image
+from posts import renderer, tasks, thumbnails
+from posts.models import Post, Task
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_image(size, image_format='JPEG', mode='RGB', name='photo.jpg'):
+    buffer = io.BytesIO()
+    Image.new(mode, size, 'green').save(buffer, image_format)
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type=f'image/{image_format.lower()}')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, WRITE_THROTTLE_RATES={})
+class ThumbnailTest(TestCase):
+    """Тестируем картинки постов и миниатюры в воркере."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = get_user_model().objects.create_user(
+            username='test-author'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def publish(self, image, text='Пост с картинкой'):
+        return self.client.post(reverse('new_post'),
+                                {'text': text, 'image': image})
+
+    def test_thumbnails_made_off_request(self):
+        self.publish(make_image((2000, 1500)))
+        post = Post.objects.get()
+        self.assertTrue(post.image.name.startswith('posts/'))
+        self.assertTrue(Task.objects.filter(
+            name=thumbnails.THUMBNAIL_TASK
+        ).exists())
+        self.assertNotIn('<img', self.client.get(reverse('index')).content
+                         .decode())
+        tasks.run_pending()
+        post.refresh_from_db()
+        sizes = thumbnails.stored(post)
+        self.assertEqual([size[0] for size in sizes], [1280, 960, 640, 320])
+        self.assertEqual([tuple(size[2:]) for size in sizes],
+                         [(1280, 960), (960, 720), (640, 480), (320, 240)])
+        for _, name, *_ in sizes:
+            with default_storage.open(name) as thumbnail:
+                digest = hashlib.sha256(thumbnail.read()).hexdigest()
+            self.assertEqual(name, f'thumbs/{digest[:2]}/{digest}.jpg')
+        feed = self.client.get(reverse('index')).content.decode()
+        self.assertIn(' 640w, ', feed)
+        self.assertIn('loading="lazy"', feed)
+        self.assertNotIn(' 1280w', feed)
+        detail = self.client.get(
+            reverse('post', args=(self.author.username, post.pk))
+        ).content.decode()
+        self.assertIn(' 1280w', detail)
+        self.assertNotIn('loading="lazy"', detail)
+
+    def test_small_image_not_upscaled(self):
+        self.publish(make_image((500, 300), 'PNG', 'RGBA', 'logo.png'))
+        tasks.run_pending()
+        sizes = thumbnails.stored(Post.objects.get())
+        self.assertEqual({tuple(size[2:]) for size in sizes},
+                         {(500, 300), (320, 192)})
+        self.assertEqual(len({size[1] for size in sizes}), 2)
+
+    def test_jpeg_decoded_at_reduced_scale(self):
+        self.publish(make_image((4000, 3000)))
+        with mock.patch.object(thumbnails.engine, 'orientation',
+                               wraps=thumbnails.engine.orientation) as spy:
+            tasks.run_pending()
+        self.assertEqual(spy.call_args[0][0].size, (2000, 1500))
+
+    def test_form_limits(self):
+        with override_settings(POST_IMAGE_MAX_BYTES=100):
+            response = self.publish(make_image((200, 200)))
+        self.assertFormError(response, 'form', 'image', 'Файл больше 0 МБ')
+        with override_settings(POST_IMAGE_MAX_PIXELS=10 ** 4):
+            response = self.publish(make_image((200, 200)))
+        self.assertFormError(response, 'form', 'image',
+                             'Картинка больше 0 Мпикс')
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=10 ** 4)
+    def test_worker_rejects_large_source(self):
+        Post.objects.create(text='В обход формы', author=self.author,
+                            image=make_image((200, 200)))
+        with self.assertLogs('yatube.thumbnails', 'WARNING'):
+            tasks.run_pending()
+        post = Post.objects.get()
+        self.assertEqual(thumbnails.stored(post), [])
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(thumbnails.image_html(post), '')
+
+    def test_corrupt_upload_not_retried(self):
+        raw = make_image((400, 300)).read()
+        Post.objects.create(
+            text='Обрезанный файл', author=self.author,
+            image=SimpleUploadedFile('broken.jpg', raw[:len(raw) // 2]),
+        )
+        with self.assertLogs('yatube.thumbnails', 'WARNING'):
+            tasks.run_pending()
+        self.assertEqual(thumbnails.stored(Post.objects.get()), [])
+        self.assertFalse(Task.objects.exists())
+
+    def test_unused_files_deleted(self):
+        self.publish(make_image((800, 600)))
+        tasks.run_pending()
+        post = Post.objects.get()
+        old = thumbnails.files(post.image.name, post.thumbnails)
+        self.assertEqual(len(old), 4)
+        self.client.post(
+            reverse('post_edit', args=(self.author.username, post.pk)),
+            {'text': post.text, 'image': make_image((900, 600))},
+        )
+        tasks.run_pending()
+        post.refresh_from_db()
+        new = thumbnails.files(post.image.name, post.thumbnails)
+        for name in old:
+            self.assertFalse(default_storage.exists(name))
+        for name in new:
+            self.assertTrue(default_storage.exists(name))
+        Post.objects.get().delete()
+        tasks.run_pending()
+        for name in new:
+            self.assertFalse(default_storage.exists(name))
+
+    def test_shared_thumbnail_kept(self):
+        for text in ('Первый', 'Второй'):
+            self.publish(make_image((400, 300)), text)
+        tasks.run_pending()
+        first, second = Post.objects.order_by('pk')
+        shared = thumbnails.stored(second)[0][1]
+        self.assertEqual(thumbnails.stored(first)[0][1], shared)
+        first.delete()
+        tasks.run_pending()
+        self.assertFalse(default_storage.exists(first.image.name))
+        self.assertTrue(default_storage.exists(shared))
+
+    def test_replaced_image_waits_for_new_thumbnails(self):
+        self.publish(make_image((800, 600)))
+        tasks.run_pending()
+        post = Post.objects.get()
+        self.client.post(
+            reverse('post_edit', args=(self.author.username, post.pk)),
+            {'text': post.text, 'image': make_image((900, 600))},
+        )
+        post.refresh_from_db()
+        self.assertIsNone(thumbnails.stored(post))
+        self.assertEqual(thumbnails.image_html(post), '')
+        tasks.run_pending()
+        post.refresh_from_db()
+        self.assertEqual(thumbnails.stored(post)[0][2:], [900, 600])
+
+    def test_card_matches_include(self):
+        self.publish(make_image((800, 600)))
+        tasks.run_pending()
+        post = Post.objects.select_related('author').get()
+        self.assertEqual(json.loads(post.thumbnails)['source'],
+                         post.image.name)
+        self.assertEqual(
+            renderer.render_cards([post]),
+            [render_to_string('post_main.html', {'post': post})],
+        )
+        self.assertEqual(
+            renderer.render_cards([post], 'detail'),
+            [render_to_string('post_main.html',
+                              {'post': post, 'size': 'detail'})],
+        )
+
+
+@override_settings(SQLITE_LOCK_BACKOFF=0, WRITE_THROTTLE_RATES={})
+class ImageRetryTest(TransactionTestCase):
+    """Повтор записи поста после блокировки не копирует картинку."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = self.settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def test_locked_commit_keeps_one_upload(self):
+        author = get_user_model().objects.create_user(username='test-author')
+        client = Client()
+        client.force_login(author)
+        save_base = Post.save_base
+        attempts = []
+
+        def locked_once(post, *args, **kwargs):
+            save_base(post, *args, **kwargs)
+            attempts.append(post.image.name)
+            if len(attempts) == 1:
+                raise OperationalError('database is locked')
+
+        with mock.patch.object(Post, 'save_base', locked_once):
+            client.post(reverse('new_post'),
+                        {'text': 'Пост с картинкой',
+                         'image': make_image((100, 100))})
+        post = Post.objects.get()
+        self.assertEqual(attempts, [post.image.name] * 2)
+        self.assertEqual(
+            os.listdir(os.path.join(self.media_root, 'posts')),
+            [os.path.basename(post.image.name)],
+        )
@@ -0,0 +1,67 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Post
+
+
+@override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+class ServerTimingTest(TestCase):
+    """Тестируем заголовок Server-Timing."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        user = get_user_model()
+        cls.user = user.objects.create_user(username='test-author')
+        for i in range(3):
+            Post.objects.create(text=f'Тестовый текст {i}', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def metrics(self, response):
+        metrics = {}
+        for item in response['Server-Timing'].split(', '):
+            name, *params = item.split(';')
+            metrics[name] = dict(param.split('=', 1) for param in params)
+        return metrics
+
+    def cache_counts(self, metrics):
+        counts = dict(item.split('=') for item in
+                      metrics['cache']['desc'].strip('"').split())
+        return int(counts['hit']), int(counts['miss'])
+
+    def test_header_on_feed(self):
+        metrics = self.metrics(self.client.get(reverse('index')))
+        self.assertEqual(
+            set(metrics), {'db', 'tpl', 'tpl-post-main', 'cache', 'total'}
+        )
+        self.assertRegex(metrics['db']['desc'], r'"\d+ SQL"')
+        first = self.cache_counts(metrics)
+        self.assertLessEqual(float(metrics['tpl-post-main']['dur']),
+                             float(metrics['tpl']['dur']))
+        metrics = self.metrics(self.client.get(reverse('index')))
+        # Три карточки постов теперь берутся из кеша
+        hits, misses = self.cache_counts(metrics)
+        self.assertGreaterEqual(hits - first[0], 3)
+        self.assertGreaterEqual(first[1] - misses, 3)
+        self.assertNotIn('tpl-post-main', metrics)
+
+    @override_settings(SERVER_TIMING_LOG=True)
+    def test_structured_log(self):
+        with self.assertLogs('yatube.timing', 'INFO') as logs:
+            self.client.get(reverse('index'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], reverse('index'))
+        self.assertGreater(record['queries'], 0)
+        self.assertLessEqual(len(record['slowest']), 3)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_request(self):
+        response = self.client.get(reverse('index'))
+        self.assertNotIn('Server-Timing', response)
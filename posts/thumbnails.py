@@ -0,0 +1,260 @@
+"""Миниатюры картинок постов, которые делает воркер, а не запрос.
+
+Запись поста с новой картинкой ставит задачу; воркер один раз
+раскрывает исходник движком sorl-thumbnail и сохраняет миниатюры всех
+ширин POST_IMAGE_SIZES под именами из хеша их содержимого. Такие
+файлы не меняются, их можно отдавать с вечным кешем, а одинаковые
+миниатюры разных постов хранятся один раз. Пока миниатюр нет,
+карточка показывает пост без картинки.
+
+Картинки и миниатюры, на которые после замены картинки или удаления
+поста не ссылается ни один пост, удаляет задача cleanup.
+
+Память ограничена: Pillow читает файл по мере декодирования, JPEG
+декодируется сразу в уменьшенном масштабе (draft), а исходники больше
+POST_IMAGE_MAX_PIXELS не раскрываются вовсе.
+"""
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.html import conditional_escape
+from PIL import Image
+from sorl.thumbnail.engines.pil_engine import Engine
+
+from . import archive, page_cache, tasks
+from .models import ArchivedPost, Post
+
+logger = logging.getLogger('yatube.thumbnails')
+
+THUMBNAIL_TASK = 'thumbnails.generate'
+CLEANUP_TASK = 'thumbnails.cleanup'
+# Сколько имен файлов проверять одним запросом
+CLEANUP_CHUNK = 100
+# Миниатюра не выше стольких своих ширин: панорамы ужимаются по высоте
+MAX_ASPECT = 2
+OPTIONS = {
+    'format': 'JPEG',
+    'colorspace': 'RGB',
+    'orientation': True,
+    'upscale': False,
+    'crop': False,
+}
+IMG = ('<img class="card-img-top img-fluid" src="{src}" srcset="{srcset}" '
+       'sizes="{sizes}" width="{width}" height="{height}"{loading} '
+       'decoding="async" alt="Картинка к записи">')
+
+
+class ImageRejected(ValueError):
+    """Исходник слишком велик, чтобы его раскрывать."""
+
+
+class StreamingEngine(Engine):
+    """Движок sorl-thumbnail, который не читает исходник в память
+    целиком и проверяет его размер до декодирования."""
+
+    def get_image(self, source):
+        # Image.open читает только заголовок, пиксели — при load()
+        image = Image.open(source)
+        width, height = image.size
+        if width * height > settings.POST_IMAGE_MAX_PIXELS:
+            raise ImageRejected(f'{width}x{height} больше '
+                                f'{settings.POST_IMAGE_MAX_PIXELS} пикселей')
+        return image
+
+    def _colorspace(self, image, colorspace, format):
+        # В JPEG нет прозрачности: кладем картинку на белый фон
+        if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+            image = image.convert('RGBA')
+            flat = Image.new('RGB', image.size, 'white')
+            flat.paste(image, mask=image.getchannel('A'))
+            return flat
+        return image.convert('RGB')
+
+    def _scale(self, image, width, height):
+        # ANTIALIAS — прежнее имя LANCZOS, в новых Pillow его нет
+        return image.resize((width, height), resample=Image.LANCZOS)
+
+    def encode(self, image, image_info):
+        # image_info исходника: миниатюра сохраняет его ICC-профиль
+        return self._get_raw_data(image, OPTIONS['format'],
+                                  settings.POST_THUMBNAIL_QUALITY,
+                                  image_info=image_info, progressive=True)
+
+
+engine = StreamingEngine()
+
+
+def all_widths():
+    return sorted({width for size in settings.POST_IMAGE_SIZES.values()
+                   for width in size['widths']}, reverse=True)
+
+
+def save(raw):
+    """Сохраняем миниатюру под именем из хеша содержимого."""
+    digest = hashlib.sha256(raw).hexdigest()
+    name = f'{settings.POST_THUMBNAIL_DIR}/{digest[:2]}/{digest}.jpg'
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(raw))
+    return name
+
+
+def build(field):
+    """Миниатюры картинки field: [[ширина, имя файла, w, h], ...]."""
+    widths = all_widths()
+    saved = {}
+    thumbnails = []
+    with field.open('rb') as source:
+        image = engine.get_image(source)
+        image_info = engine.get_image_info(image)
+        # Масштаб 1/2..1/8, при котором картинка еще не уже самой
+        # широкой миниатюры; квадрат — на случай поворота по EXIF
+        image.draft('RGB', (widths[0], widths[0]))
+        image = engine.orientation(image, None, OPTIONS)
+        image = engine.colorspace(image, None, OPTIONS)
+        for width in widths:
+            thumbnail = engine.scale(image, (width, width * MAX_ASPECT),
+                                     OPTIONS)
+            # Исходник уже нескольких ширин: одна миниатюра на все
+            if thumbnail.size not in saved:
+                saved[thumbnail.size] = save(
+                    engine.encode(thumbnail, image_info)
+                )
+            thumbnails.append([width, saved[thumbnail.size],
+                               *thumbnail.size])
+    return thumbnails
+
+
+def stored(post):
+    """Миниатюры текущей картинки поста или None, если их еще нет."""
+    if not post.image or not post.thumbnails:
+        return None
+    data = json.loads(post.thumbnails)
+    if data['source'] != post.image.name:
+        return None
+    return data['sizes']
+
+
+def files(image, thumbnails):
+    """Файлы хранилища картинки image вместе с ее миниатюрами."""
+    if not image:
+        return set()
+    names = {image}
+    if thumbnails:
+        data = json.loads(thumbnails)
+        if data['source'] == image:
+            names.update(size[1] for size in data['sizes'])
+    return names
+
+
+def release(post, deleted=False):
+    """Ставим в очередь удаление файлов, которые пост больше не
+    занимает: прежней картинки с миниатюрами или всех при удалении."""
+    current = files(post.image.name, post.thumbnails)
+    unused = files(*getattr(post, '_stored_files', (None, None)))
+    if deleted:
+        unused |= current
+    else:
+        unused -= current
+    post.remember_files()
+    if unused:
+        tasks.enqueue(CLEANUP_TASK, {'files': sorted(unused)})
+
+
+def schedule(post):
+    """Ставим миниатюры новой картинки поста в очередь."""
+    if post.image and stored(post) is None:
+        tasks.enqueue(THUMBNAIL_TASK, {'post': post.pk},
+                      key=f'{THUMBNAIL_TASK}:{post.pk}')
+
+
+@tasks.handler(THUMBNAIL_TASK, atomic=False)
+def generate(payloads):
+    """Делаем миниатюры вне транзакции и записываем их, только если
+    картинка поста за это время не сменилась."""
+    for pk in sorted({payload['post'] for payload in payloads}):
+        post = archive.find(lambda model: model.objects.select_related(
+            'author', 'group'
+        ).filter(pk=pk))
+        if post is None or not post.image or stored(post) is not None:
+            continue
+        try:
+            sizes = build(post.image)
+        except (ImageRejected, OSError, SyntaxError,
+                Image.DecompressionBombError) as error:
+            # OSError — битый или обрезанный файл, SyntaxError Pillow
+            # бросает на испорченных заголовках
+            # Повтор не поможет: пост остается без картинки
+            logger.warning('Нет миниатюр для поста %s: %s', pk, error)
+            sizes = []
+        updated = type(post).objects.filter(
+            pk=pk, image=post.image.name
+        ).update(
+            thumbnails=json.dumps({'source': post.image.name,
+                                   'sizes': sizes}),
+            # Новая версия поста: карточки и ETag перестают находиться
+            edited=timezone.now(),
+        )
+        if updated:
+            page_cache.bump_on_commit(page_cache.post_feeds(post))
+        else:
+            # Пост перенесли в архив или сменили картинку: повторяем
+            # по свежим данным, а сделанные миниатюры уже не нужны
+            schedule(post)
+            tasks.enqueue(CLEANUP_TASK,
+                          {'files': sorted({size[1] for size in sizes})})
+
+
+@tasks.handler(CLEANUP_TASK)
+def cleanup(payloads):
+    """Удаляем файлы, на которые не ссылается ни один пост. Проверка
+    идет в транзакции записи, поэтому новый пост не сошлется на файл
+    между проверкой и удалением."""
+    names = sorted({name for payload in payloads
+                    for name in payload['files']})
+    unused = set(names)
+    for start in range(0, len(names), CLEANUP_CHUNK):
+        chunk = names[start:start + CLEANUP_CHUNK]
+        query = Q(image__in=chunk)
+        for name in chunk:
+            query |= Q(thumbnails__contains=name)
+        for model in (Post, ArchivedPost):
+            for image, thumbnails in model.objects.filter(
+                query
+            ).values_list('image', 'thumbnails'):
+                unused -= files(image, thumbnails)
+    for name in sorted(unused):
+        default_storage.delete(name)
+
+
+def image_html(post, size='feed'):
+    """Тег img с srcset миниатюр для карточки в ленте или на странице
+    поста; пустая строка, пока миниатюр нет."""
+    thumbnails = stored(post)
+    if not thumbnails:
+        return ''
+    config = settings.POST_IMAGE_SIZES[size]
+    chosen = {}
+    for width, name, *dimensions in thumbnails:
+        if width in config['widths']:
+            chosen[name] = dimensions
+    if not chosen:
+        return ''
+    srcset = ', '.join(f'{default_storage.url(name)} {dimensions[0]}w'
+                       for name, dimensions in chosen.items())
+    # Для браузеров без srcset — самая широкая миниатюра набора
+    name, (width, height) = max(chosen.items(), key=lambda item: item[1])
+    return IMG.format(
+        src=conditional_escape(default_storage.url(name)),
+        srcset=conditional_escape(srcset),
+        sizes=conditional_escape(config['sizes']),
+        width=width,
+        height=height,
+        # Картинка на странице поста видна сразу, в ленте — по прокрутке
+        loading=' loading="lazy"' if size == 'feed' else '',
+    )
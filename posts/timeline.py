@@ -0,0 +1,222 @@
+import heapq
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from . import counters, page_cache, tasks
+from .models import AuthorCounter, Follow, Post, TimelineEntry
+from .paginators import (NEXT, POSTS_PER_PAGE, CursorPage, decode_cursor,
+                         encode_cursor)
+
+
+def is_celebrity(author):
+    """Авторам с большим числом подписчиков ленты не рассылаются,
+    их посты подмешиваются при чтении."""
+    followers = AuthorCounter.objects.filter(author=author).values_list(
+        'followers_count', flat=True
+    ).first()
+    return (followers or 0) >= settings.TIMELINE_FANOUT_LIMIT
+
+
+FAN_OUT_TASK = 'timeline.fan_out'
+
+
+def fan_out(post):
+    """Ставим рассылку нового поста по лентам подписчиков в очередь."""
+    tasks.enqueue(FAN_OUT_TASK, {'post': post.pk},
+                  key=f'{FAN_OUT_TASK}:{post.pk}')
+
+
+@tasks.handler(FAN_OUT_TASK)
+def fan_out_posts(payloads):
+    """Раскладываем посты по лентам подписчиков авторов. Повтор
+    безопасен: уже разложенные записи пропускаются."""
+    posts = Post.objects.filter(
+        pk__in=[payload['post'] for payload in payloads]
+    ).values_list('pk', 'author_id', 'pub_date')
+    owners = set()
+    for pk, author_id, pub_date in posts:
+        if is_celebrity(author_id):
+            continue
+        followers = list(Follow.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True))
+        TimelineEntry.objects.bulk_create(
+            (TimelineEntry(owner_id=user_id, post_id=pk, pub_date=pub_date)
+             for user_id in followers),
+            batch_size=500, ignore_conflicts=True,
+        )
+        owners.update(followers)
+    # Ленты не растут между запусками trim_timelines
+    trim_owners(owners)
+
+
+TRIM_SQL = f"""
+    DELETE FROM {TimelineEntry._meta.db_table} WHERE id IN (
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY owner_id ORDER BY pub_date DESC, post_id DESC
+            ) AS position
+            FROM {TimelineEntry._meta.db_table}
+            WHERE owner_id IN ({{placeholders}})
+        ) WHERE position > %s
+    )
+"""
+# Сколько лент обрезать одним запросом
+TRIM_CHUNK = 500
+
+
+def trim_owners(owner_ids, length=None):
+    """Обрезаем ленты owner_ids до length записей, возвращаем число
+    удаленных. Один запрос на TRIM_CHUNK лент, каждая читается по
+    индексу (owner, pub_date, post) только до своей длины."""
+    length = length or settings.TIMELINE_LENGTH
+    owner_ids = sorted(owner_ids)
+    deleted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(owner_ids), TRIM_CHUNK):
+            chunk = owner_ids[start:start + TRIM_CHUNK]
+            cursor.execute(
+                TRIM_SQL.format(placeholders=', '.join(['%s'] * len(chunk))),
+                [*chunk, length],
+            )
+            deleted += cursor.rowcount
+    return deleted
+
+
+def backfill(owner_ids, author_id):
+    """Добавляем в ленты owner_ids свежие посты автора и обрезаем их."""
+    posts = list(Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    )[:settings.TIMELINE_LENGTH])
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(owner_id=owner_id, post_id=pk, pub_date=pub_date)
+         for owner_id in owner_ids for pk, pub_date in posts),
+        batch_size=500, ignore_conflicts=True,
+    )
+    trim_owners(owner_ids)
+
+
+BACKFILL_TASK = 'timeline.backfill'
+
+
+@tasks.handler(BACKFILL_TASK)
+def backfill_followers(payloads):
+    """Заполняем ленты подписчиков автора, который перестал быть
+    знаменитостью: его посты больше не подмешиваются при чтении, а
+    подписавшимся в то время и новым постам рассылки не было."""
+    for author_id in sorted({payload['author'] for payload in payloads}):
+        if is_celebrity(author_id):
+            continue
+        followers = list(Follow.objects.filter(
+            author_id=author_id
+        ).order_by('user_id').values_list('user_id', flat=True))
+        for start in range(0, len(followers), TRIM_CHUNK):
+            backfill(followers[start:start + TRIM_CHUNK], author_id)
+
+
+def follow(user, author):
+    """Подписываем user на author, возвращаем True, если подписка новая."""
+    if user == author:
+        return False
+    with transaction.atomic():
+        subscription, created = Follow.objects.get_or_create(
+            user=user, author=author
+        )
+        if not created:
+            return False
+        counters.follow_changed(subscription, 1)
+        if not is_celebrity(author):
+            backfill([user.pk], author.pk)
+        page_cache.bump_on_commit([
+            page_cache.AUTHOR_FEED.format(username=author.username),
+            page_cache.AUTHOR_FEED.format(username=user.username),
+        ])
+    return True
+
+
+def unfollow(user, author):
+    with transaction.atomic():
+        subscription = Follow.objects.filter(
+            user=user, author=author
+        ).first()
+        if subscription is None:
+            return False
+        subscription.delete()
+        counters.follow_changed(subscription, -1)
+        followers = AuthorCounter.objects.filter(author=author).values_list(
+            'followers_count', flat=True
+        ).first()
+        # Записи сериализованы, границу пересекает ровно одна отписка
+        if followers == settings.TIMELINE_FANOUT_LIMIT - 1:
+            tasks.enqueue(BACKFILL_TASK, {'author': author.pk},
+                          key=f'{BACKFILL_TASK}:{author.pk}')
+        TimelineEntry.objects.filter(
+            owner=user, post__author=author
+        ).delete()
+        page_cache.bump_on_commit([
+            page_cache.AUTHOR_FEED.format(username=author.username),
+            page_cache.AUTHOR_FEED.format(username=user.username),
+        ])
+    return True
+
+
+def trim(length=None):
+    """Обрезаем все ленты до length записей, возвращаем число удаленных.
+
+    Рассылка и подписка сами обрезают затронутые ленты; команда нужна
+    для лент, заполненных до этого, и после уменьшения TIMELINE_LENGTH.
+    """
+    owners = TimelineEntry.objects.order_by().values_list(
+        'owner_id', flat=True
+    ).distinct()
+    return trim_owners(owners, length)
+
+
+def _after(queryset, cursor, prefix=''):
+    if cursor is None:
+        return queryset
+    _, pub_date, pk = cursor
+    return queryset.filter(
+        Q(pub_date__lt=pub_date)
+        | Q(pub_date=pub_date, **{f'{prefix}pk__lt': pk})
+    )
+
+
+def get_page(user, token=None, per_page=POSTS_PER_PAGE):
+    """Страница ленты подписок: материализованные записи плюс посты
+    авторов-знаменитостей, слитые по (pub_date, id)."""
+    cursor = decode_cursor(token) if token else None
+    if cursor is not None and cursor[0] != NEXT:
+        cursor = None
+    entries = _after(
+        TimelineEntry.objects.filter(owner=user), cursor, 'post__'
+    ).select_related('post__author', 'post__group').order_by(
+        '-pub_date', '-post'
+    )[:per_page + 1]
+    streams = [[entry.post for entry in entries]]
+    celebrities = Follow.objects.filter(
+        user=user,
+        author__post_counter__followers_count__gte=(
+            settings.TIMELINE_FANOUT_LIMIT
+        ),
+    ).values_list('author_id', flat=True)
+    celebrities = list(celebrities)
+    if celebrities:
+        streams.append(list(_after(
+            Post.objects.filter(author_id__in=celebrities), cursor
+        ).select_related('author', 'group')[:per_page + 1]))
+    posts, seen = [], set()
+    for post in heapq.merge(*streams,
+                            key=lambda post: (post.pub_date, post.pk),
+                            reverse=True):
+        if post.pk not in seen:
+            seen.add(post.pk)
+            posts.append(post)
+    has_next = len(posts) > per_page
+    posts = posts[:per_page]
+    return CursorPage(
+        posts,
+        next_cursor=encode_cursor(posts[-1]) if has_next else None,
+    )
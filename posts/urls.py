@@ -1,11 +1,32 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('api/', api.index, name='api_index'),
+    path('api/group/<slug:slug>/', api.group_posts, name='api_group'),
+    path('api/<str:username>/', api.profile, name='api_profile'),
+    path('api/<str:username>/<int:post_id>/',
+         api.post_view,
+         name='api_post'
+         ),
     path('group/<slug:slug>/', views.group_posts, name='group'),
     path('new/', views.new_post, name='new_post'),
+    path('search/', views.search, name='search'),
+    path('follow/', views.follow_index, name='follow_index'),
     path('<str:username>/', views.profile, name='profile'),
+    path('<str:username>/follow/',
+         views.profile_follow,
+         name='profile_follow'
+         ),
+    path('<str:username>/unfollow/',
+         views.profile_unfollow,
+         name='profile_unfollow'
+         ),
+    path('<str:username>/export/',
+         views.profile_export,
+         name='profile_export'
+         ),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
     path('<str:username>/<int:post_id>/edit/',
          views.post_edit,
@@ -1,30 +1,61 @@
-from django.core.paginator import Paginator
-from django.shortcuts import redirect, render, get_object_or_404
+from django.db.models import BooleanField, Exists, OuterRef, Value
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import redirect, render
+from . import archive, exporter, lookups, timeline
+from .conditional import (author_state, conditional_feed, group_state,
+                          index_state, post_state)
 from .forms import PostForm
-from .models import Group, Post
-from django.contrib.auth import get_user_model
+from .models import AuthorCounter, Follow
+from .page_cache import (AUTHOR_FEED, GLOBAL_FEED, GROUP_FEED,
+                         cache_for_anonymous)
+from .paginators import cached_count, paginate
+from .search import search as search_posts
 from django.contrib.auth.decorators import login_required
+from yatube.replicas import primary
+from yatube.sqlite.retry import retry_on_lock
+from yatube.throttle import throttle_writes
 
-User = get_user_model()
 
+def author_posts_count(author):
+    """Число записей автора из денормализованного счетчика."""
+    try:
+        return author.post_counter.posts_count
+    except AuthorCounter.DoesNotExist:
+        return 0
 
+
+def is_following(user, author):
+    return (user.is_authenticated and user != author
+            and Follow.objects.filter(user=user, author=author).exists())
+
+
+@conditional_feed(index_state)
+@cache_for_anonymous(GLOBAL_FEED)
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = archive.chain(
+        lambda model: model.objects.select_related('author', 'group')
+    )
+    paginator, page = paginate(
+        request, post_list,
+        count=lambda: cached_count(GLOBAL_FEED, post_list),
+    )
     context = {'page': page,
                'paginator': paginator,
                }
     return render(request, 'index.html', context)
 
 
+@conditional_feed(group_state)
+@cache_for_anonymous(GROUP_FEED)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    group_list = group.groups.all()
-    paginator = Paginator(group_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    group = lookups.group_by_slug(slug)
+    group_list = archive.chain(
+        lambda model: model.objects.filter(group=group).select_related(
+            'author', 'group'
+        ),
+        total=group.posts_count,
+    )
+    paginator, page = paginate(request, group_list, count=group.posts_count)
     context = {'group': group,
                'page': page,
                'paginator': paginator,
@@ -32,45 +63,138 @@ def group_posts(request, slug):
     return render(request, 'group.html', context)
 
 
+@conditional_feed(author_state)
+@cache_for_anonymous(AUTHOR_FEED)
 def profile(request, username):
-    profile = get_object_or_404(User, username=username)
-    post_list = profile.posts.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number,)
+    profile = lookups.user_by_username(username)
+    posts_count = author_posts_count(profile)
+    post_list = archive.chain(
+        lambda model: model.objects.filter(author=profile).select_related(
+            'author', 'group'
+        ),
+        total=posts_count,
+    )
+    paginator, page = paginate(request, post_list, count=posts_count)
     context = {'page': page,
                'paginator': paginator,
                'author': profile,
+               'following': is_following(request.user, profile),
                }
     return render(request, 'profile.html', context)
 
 
+@conditional_feed(post_state)
+@cache_for_anonymous(AUTHOR_FEED)
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
-    return render(request, 'post.html', {'post': post,
-                                         'author': post.author}
-                  )
+    # Пост, автор со счетчиками, группа и подписка — одним запросом
+    user = request.user
+    following = Value(False, output_field=BooleanField())
+    if user.is_authenticated:
+        following = Exists(Follow.objects.filter(
+            user=user.pk, author=OuterRef('author')
+        ))
+    # Архивный пост ищется вторым запросом, только если его нет в
+    # горячей таблице
+    post = archive.find(lambda model: model.objects.select_related(
+        'author__post_counter', 'group'
+    ).annotate(following=following).filter(
+        id=post_id, author__username=username
+    ))
+    if post is None:
+        raise Http404('Запись не найдена')
+    return render(request, 'post.html', {
+        'post': post,
+        'author': post.author,
+        'following': post.following,
+    })
+
+
+@login_required
+def profile_export(request, username):
+    author = lookups.user_by_username(username)
+    if request.user != author and not request.user.is_staff:
+        return redirect('profile', username=username)
+    file_format = request.GET.get('format', 'ndjson')
+    if file_format not in exporter.FORMATTERS:
+        file_format = 'ndjson'
+    response = StreamingHttpResponse(
+        exporter.export(archive.chain(
+            lambda model: model.objects.filter(author=author)
+        ), file_format),
+        content_type=exporter.CONTENT_TYPES[file_format],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{author.username}.{file_format}"'
+    )
+    return response
+
+
+def search(request):
+    query = request.GET.get('q', '')
+    page = search_posts(query, request.GET.get('cursor'))
+    return render(request, 'search.html', {'query': query, 'page': page})
+
+
+@login_required
+def follow_index(request):
+    page = timeline.get_page(request.user, request.GET.get('cursor'))
+    return render(request, 'follow.html', {'page': page})
+
+
+@login_required
+@retry_on_lock
+def profile_follow(request, username):
+    author = lookups.user_by_username(username)
+    timeline.follow(request.user, author)
+    return redirect('profile', username=username)
+
+
+@login_required
+@retry_on_lock
+def profile_unfollow(request, username):
+    author = lookups.user_by_username(username)
+    timeline.unfollow(request.user, author)
+    return redirect('profile', username=username)
+
+
+@retry_on_lock
+def save_post(post):
+    """Сохраняем пост, повторяя только транзакцию: картинка попадает
+    в хранилище при первой попытке, и повтор ее не копирует."""
+    if post._state.adding:
+        # Откаченная вставка могла оставить посту id
+        post.pk = None
+    post.save()
 
 
 @login_required
+@throttle_writes
+@primary
 def new_post(request):
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        save_post(post)
         return redirect('index')
     return render(request, 'post_new.html', {'form': form})
 
 
 @login_required
+@throttle_writes
+@primary
 def post_edit(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
+    post = archive.find(lambda model: model.objects.select_related(
+        'author'
+    ).filter(id=post_id, author__username=username))
+    if post is None:
+        raise Http404('Запись не найдена')
     if request.user != post.author:
         return redirect('post', username=username, post_id=post_id)
-    form = PostForm(request.POST or None, instance=post)
+    form = PostForm(request.POST or None, files=request.FILES or None,
+                    instance=post)
     if form.is_valid():
-        form.save()
+        save_post(form.save(commit=False))
         return redirect('post',
                         username=post.author,
                         post_id=post_id
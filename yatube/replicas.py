@@ -0,0 +1,98 @@
+"""Чтение лент с реплик SQLite, запись — только в основную базу.
+
+Реплики включаются только внутри запроса, который ReplicaMiddleware
+признал читающим: безопасный метод, не админка и не auth, и без
+свежей записи этого же клиента. Сессии и пользователи всегда читаются
+из основной базы: отставшая реплика оживила бы сессию после выхода
+или не увидела бы новый вход. Вне запросов (команды, миграции) все
+идет в основную базу.
+"""
+import contextlib
+import functools
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'pin_primary'
+
+_state = threading.local()
+
+
+def use_replicas():
+    # После записи остаток запроса тоже читает из основной базы
+    return (getattr(_state, 'replicas', False)
+            and not getattr(_state, 'pinned', False)
+            and not getattr(_state, 'wrote', False))
+
+
+@contextlib.contextmanager
+def pin_to_primary():
+    """Внутри блока все чтения идут в основную базу."""
+    pinned = getattr(_state, 'pinned', False)
+    _state.pinned = True
+    try:
+        yield
+    finally:
+        _state.pinned = pinned
+
+
+def primary(view):
+    """Декоратор view, которое читает только из основной базы."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with pin_to_primary():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in settings.REPLICA_PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Связанные объекты читаем оттуда же, откуда сам объект
+            return instance._state.db
+        if use_replicas() and settings.REPLICA_DATABASES:
+            return random.choice(settings.REPLICA_DATABASES)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    """Решает, можно ли запросу читать с реплик, и закрепляет клиента
+    за основной базой на REPLICA_PIN_SECONDS после его записи, чтобы
+    автор сразу видел свой пост."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.replicas = not (
+            request.method not in ('GET', 'HEAD', 'OPTIONS')
+            or PIN_COOKIE in request.COOKIES
+            or request.path_info.startswith(settings.REPLICA_PRIMARY_PATHS)
+        )
+        _state.pinned = False
+        _state.wrote = False
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.replicas = False
+        if _state.wrote:
+            response.set_cookie(PIN_COOKIE, '1',
+                                max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True)
+        return response
@@ -16,7 +16,7 @@ ALLOWED_HOSTS = [
 
 INSTALLED_APPS = [
     'users',
-    'posts',
+    'posts.apps.PostsConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -29,6 +29,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Ответы API из кеша не зависят от пользователя и не ходят в базу
+    'posts.api.ApiCacheMiddleware',
+    'yatube.timing.ServerTimingMiddleware',
+    'yatube.replicas.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -60,13 +64,148 @@ TEMPLATES = [
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
+# Профиль SQLite: production — WAL, настроенные pragma, BEGIN IMMEDIATE
+# и постоянные соединения; stock — стандартный бэкенд Django
+SQLITE_PROFILE = os.environ.get('YATUBE_SQLITE_PROFILE', 'production')
+
+SQLITE_PROFILES = {
+    'stock': {
+        'ENGINE': 'django.db.backends.sqlite3',
+    },
+    'production': {
+        'ENGINE': 'yatube.sqlite',
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            'timeout': 5,
+            'transaction_mode': 'IMMEDIATE',
+            'pragmas': {
+                'journal_mode': 'wal',
+                'synchronous': 'normal',
+                # Отрицательное значение — размер в КиБ, здесь 64 МиБ
+                'cache_size': -64 * 1024,
+                'mmap_size': 256 * 1024 * 1024,
+                'busy_timeout': 5000,
+                'temp_store': 'memory',
+            },
+        },
+    },
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        **SQLITE_PROFILES[SQLITE_PROFILE],
     }
 }
 
+# Реплики для чтения лент: пути к копиям файла базы через запятую
+REPLICA_DATABASES = []
+for number, path in enumerate(filter(None, os.environ.get(
+        'YATUBE_SQLITE_REPLICAS', '').split(','))):
+    REPLICA_DATABASES.append(f'replica{number}')
+    DATABASES[f'replica{number}'] = {
+        **SQLITE_PROFILES[SQLITE_PROFILE],
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['yatube.replicas.ReplicaRouter']
+# Эти разделы всегда читают из основной базы
+REPLICA_PRIMARY_PATHS = ('/admin/', '/auth/')
+# Модели этих приложений всегда читаются из основной базы
+REPLICA_PRIMARY_APPS = ('sessions', 'auth')
+# Сколько секунд после своей записи клиент читает из основной базы
+REPLICA_PIN_SECONDS = 10
+
+# Доля запросов с заголовком Server-Timing, 0 выключает замеры
+SERVER_TIMING_SAMPLE_RATE = float(
+    os.environ.get('YATUBE_SERVER_TIMING_SAMPLE_RATE', 0.1)
+)
+# Писать ли замеры в лог yatube.timing одной JSON-строкой на запрос
+SERVER_TIMING_LOG = False
+# Шаблоны, время которых показывается отдельной метрикой
+SERVER_TIMING_TEMPLATES = ('post_main.html',)
+
+# Сколько раз повторять запись, упершуюся в блокировку, и базовая пауза
+SQLITE_LOCK_RETRIES = 3
+SQLITE_LOCK_BACKOFF = 0.05
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Сколько секунд хранить отрендеренные карточки постов
+POST_CARD_CACHE_TIMEOUT = 60 * 60
+# Предельное устаревание страниц лент, закешированных для анонимов
+FEED_PAGE_CACHE_TIMEOUT = 60
+# Сколько последних ответов API держать в памяти процесса
+API_LOCAL_CACHE_SIZE = 256
+# Предельное устаревание числа постов в общей ленте для номеров страниц
+POST_COUNT_CACHE_TIMEOUT = 5 * 60
+
+# Кеш групп по slug и пользователей по username в процессе: размер,
+# предельное устаревание в секундах и общий кеш Django вторым уровнем
+LOOKUP_CACHE_SIZE = 1024
+LOOKUP_CACHE_TIMEOUT = 60
+LOOKUP_CACHE_SHARED = False
+
+# Сколько записей хранить в ленте подписок читателя
+TIMELINE_LENGTH = 500
+# С этого числа подписчиков посты автора не рассылаются по лентам,
+# а подмешиваются при чтении
+TIMELINE_FANOUT_LIMIT = 1000
+
+# Очередь задач после записи (индексация поиска, рассылка по лентам).
+# Задачи выполняет воркер manage.py run_tasks; YATUBE_TASKS_EAGER=1
+# выполняет их сразу в запросе, как без очереди
+TASKS_EAGER = os.environ.get('YATUBE_TASKS_EAGER') == '1'
+# Сколько задач воркер захватывает за раз и на сколько секунд
+TASK_BATCH_SIZE = 100
+TASK_LEASE = 60
+# Попытки упавшей задачи и первая пауза перед повтором в секундах,
+# дальше пауза удваивается
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_BACKOFF = 2
+# Пауза воркера при пустой очереди в секундах
+TASK_POLL_INTERVAL = 1.0
+
+# Посты старше ARCHIVE_AFTER_DAYS дней manage.py archive_posts переносит
+# в архивную таблицу пачками по ARCHIVE_BATCH_SIZE
+ARCHIVE_AFTER_DAYS = 60
+ARCHIVE_BATCH_SIZE = 5000
+
+# Картинки постов: предельный размер файла и число пикселей исходника
+POST_IMAGE_MAX_BYTES = 5 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+# Миниатюры для ленты и страницы поста: ширины для srcset и ширина
+# картинки на экране для sizes. Их делает воркер run_tasks
+POST_IMAGE_SIZES = {
+    'feed': {
+        'widths': (320, 640),
+        'sizes': '(min-width: 768px) 640px, 100vw',
+    },
+    'detail': {
+        'widths': (640, 960, 1280),
+        'sizes': '(min-width: 992px) 825px, 100vw',
+    },
+}
+# Каталог миниатюр в MEDIA_ROOT и качество JPEG
+POST_THUMBNAIL_DIR = 'thumbs'
+POST_THUMBNAIL_QUALITY = 85
+
+# Ограничение записей (new_post, post_edit): ведро маркеров на
+# пользователя и общее, (маркеров в секунду, емкость ведра). Пустой
+# словарь снимает ограничение
+WRITE_THROTTLE_RATES = {
+    'user': (1 / 6, 10),
+    'global': (20, 50),
+}
+# Хранить ведра и счетчики срабатываний в общем кеше Django
+WRITE_THROTTLE_SHARED = False
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -102,6 +241,9 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, "static")
 
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
 
 LOGIN_URL = "/auth/login/"
 LOGIN_REDIRECT_URL = "index"
@@ -0,0 +1,36 @@
+"""SQLite для продакшена: WAL, настроенные pragma и BEGIN IMMEDIATE.
+
+Подключается как ENGINE 'yatube.sqlite'. Дополнительные ключи OPTIONS:
+pragmas — словарь PRAGMA, выполняемых на каждом новом соединении;
+transaction_mode — режим BEGIN для atomic() (DEFERRED или IMMEDIATE).
+"""
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pragmas', None)
+        params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        pragmas = self.settings_dict['OPTIONS'].get('pragmas', {})
+        for name, value in pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        # DEFERRED-транзакция, начавшая с чтения, получает SQLITE_BUSY
+        # при попытке записи без ожидания busy_timeout. IMMEDIATE берет
+        # блокировку записи сразу и честно ждет ее.
+        mode = self.settings_dict['OPTIONS'].get(
+            'transaction_mode', 'DEFERRED'
+        ).upper()
+        if mode not in TRANSACTION_MODES:
+            mode = 'DEFERRED'
+        self.cursor().execute(f'BEGIN {mode}')
@@ -0,0 +1,35 @@
+import functools
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection
+
+LOCK_ERRORS = ('database is locked', 'database table is locked')
+
+
+def is_locked(error):
+    return any(message in str(error) for message in LOCK_ERRORS)
+
+
+def retry_on_lock(func):
+    """Повторяем запись, упершуюся в блокировку SQLite.
+
+    Повтор безопасен только вне внешней транзакции: внутри нее
+    откатывать и повторять должен владелец транзакции.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        attempts = settings.SQLITE_LOCK_RETRIES
+        for attempt in range(attempts + 1):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as error:
+                if (attempt == attempts or not is_locked(error)
+                        or connection.in_atomic_block):
+                    raise
+            # Экспоненциальная пауза с разбросом, чтобы писатели
+            # не просыпались одновременно
+            time.sleep(settings.SQLITE_LOCK_BACKOFF * 2 ** attempt
+                       * random.uniform(0.5, 1.5))
+    return wrapper
@@ -0,0 +1,143 @@
+"""Ограничение частоты записей: ведро маркеров на пользователя и общее.
+
+SQLite пишет в один поток, поэтому шквал записей от одного клиента
+(спам, повторы после ошибок) тормозит чтение всем. POST пропускается,
+только если маркер есть и в ведре пользователя, и в общем ведре;
+иначе сразу отдаем 429 с Retry-After, не трогая базу. Ведра живут в
+памяти процесса, при WRITE_THROTTLE_SHARED — в общем кеше Django:
+там чтение и запись ведра не атомарны, и при гонке процессы могут
+пропустить чуть больше записей, чем разрешено.
+"""
+import collections
+import functools
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+logger = logging.getLogger('yatube.throttle')
+
+# Сверх этого числа ведер в памяти выбрасываются уже полные
+LOCAL_BUCKETS = 10000
+METRICS = ('admitted', 'throttled_user', 'throttled_global')
+
+_lock = threading.Lock()
+_buckets = {}
+_metrics = collections.Counter()
+
+
+def _take(states, scopes, now):
+    """Берем по маркеру из каждого ведра или ни одного.
+
+    states — {ключ: (маркеры, время обновления, время заполнения)}.
+    Возвращаем (0, None, новые состояния) или (секунд до маркера,
+    ключ пустого ведра, None).
+    """
+    tokens = {}
+    for key, (rate, burst) in scopes.items():
+        state = states.get(key)
+        if state is None:
+            tokens[key] = burst
+        else:
+            tokens[key] = min(burst, state[0] + (now - state[1]) * rate)
+    waits = {key: (1 - tokens[key]) / scopes[key][0]
+             for key in scopes if tokens[key] < 1}
+    if waits:
+        key = max(waits, key=waits.get)
+        return waits[key], key, None
+    updated = {}
+    for key, (rate, burst) in scopes.items():
+        left = tokens[key] - 1
+        updated[key] = (left, now, now + (burst - left) / rate)
+    return 0, None, updated
+
+
+def acquire(scopes, now=None):
+    """scopes — {ключ ведра: (маркеров в секунду, емкость)}."""
+    now = time.time() if now is None else now
+    if settings.WRITE_THROTTLE_SHARED:
+        keys = {key: f'throttle:{key}' for key in scopes}
+        cached = cache.get_many(keys.values())
+        states = {key: cached[name] for key, name in keys.items()
+                  if name in cached}
+        wait, key, updated = _take(states, scopes, now)
+        if updated:
+            cache.set_many({keys[key]: state
+                            for key, state in updated.items()},
+                           math.ceil(max(burst / rate for rate, burst
+                                         in scopes.values())) + 1)
+        return wait, key
+    with _lock:
+        wait, key, updated = _take(_buckets, scopes, now)
+        if updated:
+            _buckets.update(updated)
+            if len(_buckets) > LOCAL_BUCKETS:
+                # Полное ведро ничем не отличается от отсутствующего
+                for full in [name for name, state in _buckets.items()
+                             if state[2] <= now]:
+                    del _buckets[full]
+    return wait, key
+
+
+def _count(name):
+    with _lock:
+        _metrics[name] += 1
+    if settings.WRITE_THROTTLE_SHARED:
+        key = f'throttle:metrics:{name}'
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def stats():
+    """Сколько записей пропущено и отклонено: в этом процессе и, при
+    WRITE_THROTTLE_SHARED, во всех процессах с общим кешем."""
+    result = {'local': {name: _metrics[name] for name in METRICS}}
+    if settings.WRITE_THROTTLE_SHARED:
+        shared = cache.get_many([f'throttle:metrics:{name}'
+                                 for name in METRICS])
+        result['shared'] = {
+            name: shared.get(f'throttle:metrics:{name}', 0)
+            for name in METRICS
+        }
+    return result
+
+
+def reset():
+    with _lock:
+        _buckets.clear()
+        _metrics.clear()
+
+
+def throttle_writes(view):
+    """Отклоняем POST сверх WRITE_THROTTLE_RATES ответом 429."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        rates = settings.WRITE_THROTTLE_RATES
+        if request.method != 'POST' or not rates:
+            return view(request, *args, **kwargs)
+        scopes = {}
+        if 'user' in rates:
+            scopes[f'user:{request.user.pk}'] = rates['user']
+        if 'global' in rates:
+            scopes['global'] = rates['global']
+        wait, key = acquire(scopes)
+        if not wait:
+            _count('admitted')
+            return view(request, *args, **kwargs)
+        scope = key.split(':')[0]
+        _count(f'throttled_{scope}')
+        retry_after = max(1, math.ceil(wait))
+        logger.warning('Запись отклонена: %s, пользователь %s, '
+                       'повтор через %s с', scope, request.user.pk,
+                       retry_after)
+        response = HttpResponse(
+            f'Слишком много записей, повторите через {retry_after} с',
+            status=429, content_type='text/plain; charset=utf-8',
+        )
+        response['Retry-After'] = str(retry_after)
+        return response
+    return wrapper
@@ -0,0 +1,207 @@
+"""Замеры запроса: SQL, шаблоны, кеш и общее время в Server-Timing.
+
+Замер включается для доли запросов SERVER_TIMING_SAMPLE_RATE. Для
+остальных запросов обертки шаблонов и кеша сводятся к одной проверке
+thread-local, а обертка SQL не ставится вовсе.
+"""
+import contextlib
+import json
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template.base import Template
+
+logger = logging.getLogger('yatube.timing')
+
+# Сколько самых медленных SQL-запросов попадает в лог
+SLOWEST = 3
+
+_local = threading.local()
+_installed = False
+
+
+class Recorder:
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest = []
+        self.template_time = 0.0
+        self.templates = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_depth = 0
+        self.timed_templates = set()
+        self.in_get_many = False
+
+    def __call__(self, execute, sql, params, many, context):
+        """execute_wrapper: время каждого SQL-запроса."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db_time += elapsed
+            self.slowest.append((elapsed, sql))
+            self.slowest = sorted(self.slowest, reverse=True)[:SLOWEST]
+
+    def header(self, total):
+        metrics = [
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} SQL"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+        ]
+        for name, elapsed in self.templates.items():
+            label = name.rsplit('/', 1)[-1].split('.')[0].replace('_', '-')
+            metrics.append(f'tpl-{label};dur={elapsed * 1000:.1f}')
+        metrics += [
+            f'cache;desc="hit={self.cache_hits} miss={self.cache_misses}"',
+            f'total;dur={total * 1000:.1f}',
+        ]
+        return ', '.join(metrics)
+
+    def record(self, request, response, total):
+        return {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 2),
+            'slowest': [{'ms': round(elapsed * 1000, 2), 'sql': sql}
+                        for elapsed, sql in self.slowest],
+            'template_ms': round(self.template_time * 1000, 2),
+            'templates_ms': {name: round(elapsed * 1000, 2)
+                             for name, elapsed in self.templates.items()},
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
+
+
+def current():
+    return getattr(_local, 'recorder', None)
+
+
+@contextlib.contextmanager
+def timed_block(name):
+    """Время блока кода идет в отдельную метрику, как шаблон name."""
+    recorder = current()
+    if recorder is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.templates[name] = (recorder.templates.get(name, 0.0)
+                                    + time.perf_counter() - started)
+
+
+def _timed_render(render):
+    def wrapper(self, context):
+        recorder = current()
+        if recorder is None:
+            return render(self, context)
+        name = self.origin.template_name if self.origin else None
+        # Вложенные рендеры уже входят во время внешнего
+        timed = name in settings.SERVER_TIMING_TEMPLATES and (
+            name not in recorder.timed_templates
+        )
+        if timed:
+            recorder.timed_templates.add(name)
+        recorder.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            recorder.template_depth -= 1
+            if recorder.template_depth == 0:
+                recorder.template_time += elapsed
+            if timed:
+                recorder.timed_templates.discard(name)
+                recorder.templates[name] = (
+                    recorder.templates.get(name, 0.0) + elapsed
+                )
+    return wrapper
+
+
+def _counted_get(get):
+    def wrapper(self, key, default=None, version=None):
+        value = get(self, key, default=default, version=version)
+        recorder = current()
+        if recorder is not None and not recorder.in_get_many:
+            if value is default:
+                recorder.cache_misses += 1
+            else:
+                recorder.cache_hits += 1
+        return value
+    return wrapper
+
+
+def _counted_get_many(get_many):
+    def wrapper(self, keys, version=None):
+        recorder = current()
+        if recorder is None or recorder.in_get_many:
+            return get_many(self, keys, version=version)
+        keys = list(keys)
+        # Базовый get_many ходит через get, не считаем ключи дважды
+        recorder.in_get_many = True
+        try:
+            values = get_many(self, keys, version=version)
+        finally:
+            recorder.in_get_many = False
+        recorder.cache_hits += len(values)
+        recorder.cache_misses += len(keys) - len(values)
+        return values
+    return wrapper
+
+
+def install():
+    """Ставим обертки шаблонов и кеша один раз на процесс."""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    Template.render = _timed_render(Template.render)
+    patched = set()
+    for alias in settings.CACHES:
+        backend = type(caches[alias])
+        if backend in patched:
+            continue
+        patched.add(backend)
+        backend.get = _counted_get(backend.get)
+        backend.get_many = _counted_get_many(backend.get_many)
+
+
+class ServerTimingMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install()
+
+    def __call__(self, request):
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+        recorder = _local.recorder = Recorder()
+        started = time.perf_counter()
+        try:
+            with contextlib.ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(recorder)
+                    )
+                response = self.get_response(request)
+        finally:
+            _local.recorder = None
+        total = time.perf_counter() - started
+        response['Server-Timing'] = recorder.header(total)
+        if settings.SERVER_TIMING_LOG:
+            logger.info(json.dumps(recorder.record(request, response, total),
+                                   ensure_ascii=False))
+        return response